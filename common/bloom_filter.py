@@ -0,0 +1,49 @@
+import math
+
+MIN_BITS_AMOUNT = 64
+UINT64_MASK = 2**64 - 1
+UINT32_MASK = 2**32 - 1
+
+class BloomFilter:
+    """
+    Probabilistic set of ints. Looking up a key that was added always succeeds, while
+    a key that was not added is reported as present with a false positive rate chosen
+    when sizing the filter. The positions of a key are derived by double hashing the
+    two halves of its splitmix64 hash
+    """
+    def __init__(self, bits_amount, hashes_amount, bits=None):
+        self.bits_amount = bits_amount
+        self.hashes_amount = hashes_amount
+        self.bits = bytearray((bits_amount + 7) // 8) if bits is None else bytearray(bits)
+
+    def __repr__(self):
+        return f"BloomFilter(bits_amount={self.bits_amount}, hashes_amount={self.hashes_amount})"
+
+    @classmethod
+    def for_capacity(cls, capacity, false_positive_rate):
+        """
+        Create a filter sized to hold capacity keys with the given false positive rate
+        """
+        bits_amount = max(MIN_BITS_AMOUNT, math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        hashes_amount = max(1, round(-math.log2(false_positive_rate)))
+        return cls(bits_amount, hashes_amount)
+
+    def __positions(self, key):
+        z = (key + 0x9E3779B97F4A7C15) & UINT64_MASK
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & UINT64_MASK
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & UINT64_MASK
+        z ^= z >> 31
+        h1 = z & UINT32_MASK
+        h2 = (z >> 32) | 1
+        for i in range(self.hashes_amount):
+            yield (h1 + i * h2) % self.bits_amount
+
+    def add(self, key):
+        for position in self.__positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        for position in self.__positions(key):
+            if not self.bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
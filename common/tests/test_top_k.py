@@ -0,0 +1,44 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from common.top_k import TopK, SpaceSavingTopK
+
+def expected_top(counts, k):
+    return sorted(counts.items(), key=lambda x: (x[1], x[0]), reverse=True)[:k]
+
+class TestTopK(unittest.TestCase):
+    def test_ties_are_broken_by_key_regardless_of_arrival_order(self):
+        for keys in (["a", "b", "c", "d"], ["d", "c", "b", "a"], ["b", "d", "a", "c"]):
+            top_k = TopK(2)
+            for key in keys:
+                top_k.add(key, 1)
+            self.assertEqual(top_k.top(), [("d", 1), ("c", 1)])
+
+    def test_top_matches_sorting_all_counts(self):
+        rng = random.Random(7)
+        counts = {}
+        top_k = TopK(5)
+        for _ in range(5000):
+            key = f"key_{rng.randint(0, 50)}"
+            amount = rng.choice([1, 1, 1, 2, -1])
+            counts[key] = counts.get(key, 0) + amount
+            top_k.add(key, amount)
+        self.assertEqual(top_k.top(), expected_top(counts, 5))
+
+    def test_rebuilt_from_counts(self):
+        counts = {"x": 3, "y": 5, "z": 3, "w": 1}
+        self.assertEqual(TopK(3, dict(counts)).top(), [("y", 5), ("z", 3), ("x", 3)])
+
+class TestSpaceSavingTopK(unittest.TestCase):
+    def test_exact_within_capacity_with_ties_broken_by_key(self):
+        top_k = SpaceSavingTopK(3, 10)
+        for key, amount in [("a", 2), ("b", 5), ("c", 2), ("d", 2)]:
+            top_k.add(key, amount)
+        self.assertEqual(top_k.top(), [("b", 5), ("d", 2), ("c", 2)])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+import heapq
+
+HEAP_COMPACTION_FACTOR = 2
+MIN_HEAP_SIZE_TO_COMPACT = 64
+
+class TopK:
+    """
+    Exact top k of a map of counts updated incrementally. Besides the counts, the keys
+    with the k greatest counts are kept in a min-heap, so a key only has to be compared
+    with the smallest of them when its count grows, and the top k is sorted in
+    O(k log k). Heap entries of keys whose count changed are invalidated lazily. Ties are
+    broken by key, the greater key first, so the top k does not depend on the order the
+    keys arrived in. A count that decreases may let a key out of the top k outrank it, so
+    the top k is rebuilt from all the counts the next time it is requested
+    """
+    def __init__(self, k, counts=None):
+        self._k = k
+        self.counts = counts if counts is not None else {}
+        self.__rebuild()
+
+    def __repr__(self):
+        return f"TopK(k={self._k}, amount_counts={len(self.counts)})"
+
+    def __rebuild(self):
+        self._heap = heapq.nlargest(self._k, ((count, key) for key, count in self.counts.items()))
+        heapq.heapify(self._heap)
+        self._top_keys = {key for _, key in self._heap}
+        self._rebuild_needed = False
+
+    def __is_valid(self, entry):
+        count, key = entry
+        return key in self._top_keys and self.counts[key] == count
+
+    def __min_entry(self):
+        while not self.__is_valid(self._heap[0]):
+            heapq.heappop(self._heap)
+        return self._heap[0]
+
+    def __push(self, entry):
+        heapq.heappush(self._heap, entry)
+        if len(self._heap) > max(HEAP_COMPACTION_FACTOR * self._k, MIN_HEAP_SIZE_TO_COMPACT):
+            self._heap = [(self.counts[key], key) for key in self._top_keys]
+            heapq.heapify(self._heap)
+
+    def add(self, key, amount):
+        count = self.counts.get(key, 0) + amount
+        self.counts[key] = count
+        if amount < 0 and key in self._top_keys:
+            self._rebuild_needed = True
+        if self._rebuild_needed or self._k <= 0:
+            return
+        if key in self._top_keys:
+            self.__push((count, key))
+        elif len(self._top_keys) < self._k:
+            self._top_keys.add(key)
+            self.__push((count, key))
+        elif (count, key) > self.__min_entry():
+            _, evicted_key = heapq.heappop(self._heap)
+            self._top_keys.remove(evicted_key)
+            self._top_keys.add(key)
+            self.__push((count, key))
+
+    def top(self):
+        """
+        Return the (key, count) pairs of the top k, from the greatest count to the smallest
+        """
+        if self._rebuild_needed:
+            self.__rebuild()
+        return sorted(((key, self.counts[key]) for key in self._top_keys), key=lambda x: (x[1], x[0]), reverse=True)
+
+class SpaceSavingTopK:
+    """
+    Approximate top k that keeps at most capacity counters, using the space-saving
+    algorithm. When a key without counter arrives and all the counters are in use, the
+    counter with the smallest count is reassigned to it, keeping that count as the
+    overestimation error of the new key. Every key whose count is greater than the
+    total of the amounts added divided by capacity is guaranteed to have a counter.
+    Counters map every key to its [count, error]
+    """
+    def __init__(self, k, capacity, counters=None):
+        self._k = k
+        self._capacity = max(capacity, k)
+        self.counters = counters if counters is not None else {}
+        self._heap = [(counter[0], key) for key, counter in self.counters.items()]
+        heapq.heapify(self._heap)
+
+    def __repr__(self):
+        return f"SpaceSavingTopK(k={self._k}, capacity={self._capacity}, amount_counters={len(self.counters)})"
+
+    def __is_valid(self, entry):
+        count, key = entry
+        return key in self.counters and self.counters[key][0] == count
+
+    def __pop_min_entry(self):
+        while not self.__is_valid(self._heap[0]):
+            heapq.heappop(self._heap)
+        return heapq.heappop(self._heap)
+
+    def __push(self, entry):
+        heapq.heappush(self._heap, entry)
+        if len(self._heap) > max(HEAP_COMPACTION_FACTOR * self._capacity, MIN_HEAP_SIZE_TO_COMPACT):
+            self._heap = [(counter[0], key) for key, counter in self.counters.items()]
+            heapq.heapify(self._heap)
+
+    def add(self, key, amount):
+        if key in self.counters:
+            self.counters[key][0] += amount
+        elif len(self.counters) < self._capacity:
+            self.counters[key] = [amount, 0]
+        else:
+            min_count, min_key = self.__pop_min_entry()
+            del self.counters[min_key]
+            self.counters[key] = [min_count + amount, min_count]
+        self.__push((self.counters[key][0], key))
+
+    def top(self):
+        """
+        Return the (key, estimated count) pairs of the top k, from the greatest count to
+        the smallest and with ties broken by key like TopK
+        """
+        top_counters = heapq.nlargest(self._k, self.counters.items(), key=lambda x: (x[1][0], x[0]))
+        return [(key, counter[0]) for key, counter in top_counters]
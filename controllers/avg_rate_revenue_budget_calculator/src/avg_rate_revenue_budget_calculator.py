@@ -10,21 +10,24 @@ from messages.analyzed_movie import Sentiment
 from messages.avg_rate_revenue_budget import AvgRateRevenueBudget
 from common.monitorable import Monitorable
 from storage_adapter.storage_adapter import StorageAdapter
+from storage_adapter.wal_state import WalState, save_processed_message_id
 from common.failure_simulation import fail_with_probability
 
 STATE_FILE_KEY = "state"
 REVENUE_BUDGET_BY_SENTIMENT = "revenue_budget_by_sentiment"
 PROCESSED_MESSAGE_IDS= "processed_message_ids"
-MAX_PROCESSED_MESSAGE_IDS = 500
 
 class AvgRateRevenueBudgetCalculator(Monitorable):
-    def __init__(self, input_queues, output_exchange, failure_probability, storage_path):
+    def __init__(self, input_queues, output_exchange, failure_probability, storage_path, prefetch_count, ack_batch_size, ack_flush_interval_ms, wal_max_records, wal_max_bytes):
         self._input_queues = input_queues
         self._output_exchange = output_exchange
         self._failure_probability = failure_probability
         self._middleware = None
-        self._state = {}
-        self._storage_adapter = StorageAdapter(storage_path)
+        self._storage_adapter = StorageAdapter(storage_path, wal_max_records=wal_max_records, wal_max_bytes=wal_max_bytes)
+        self._state = WalState(self._storage_adapter, STATE_FILE_KEY, self.__apply_delta, self.__new_client_state)
+        self._prefetch_count = prefetch_count
+        self._ack_batch_size = ack_batch_size
+        self._ack_flush_interval_ms = ack_flush_interval_ms
         
         signal.signal(signal.SIGTERM, self.__handle_signal)
 
@@ -47,9 +50,7 @@ class AvgRateRevenueBudgetCalculator(Monitorable):
         """
         Load persisted state from storage
         """
-        state = self._storage_adapter.load_data(STATE_FILE_KEY)
-        if state:
-            self._state = state
+        if self._state.load():
             logging.debug(f"action: load_state_from_storage | result: success | state: {self._state}")
             
     def __generate_deterministic_uuid(self, message_id, sentiment_value):
@@ -58,27 +59,29 @@ class AvgRateRevenueBudgetCalculator(Monitorable):
         """
         return str(uuid.uuid5(uuid.UUID(message_id), str(sentiment_value)))
     
-    def __save_processed_message_id(self, client_id, message_id):
-        self._state[client_id][PROCESSED_MESSAGE_IDS][message_id] = time.time_ns()
-        if len(self._state[client_id][PROCESSED_MESSAGE_IDS]) > MAX_PROCESSED_MESSAGE_IDS:
-            oldest_message_id = min(self._state[client_id][PROCESSED_MESSAGE_IDS], key=self._state[client_id][PROCESSED_MESSAGE_IDS].get)
-            self._state[client_id][PROCESSED_MESSAGE_IDS].pop(oldest_message_id)
+    def __new_client_state(self):
+        return {REVENUE_BUDGET_BY_SENTIMENT: {}, PROCESSED_MESSAGE_IDS: {}}
+    
+    def __apply_delta(self, client_state, delta):
+        message_id, processed_time, revenue_budget_by_sentiment = delta
+        for sentiment_value, (revenue, budget) in revenue_budget_by_sentiment.items():
+            revenue_sum, budget_sum = client_state[REVENUE_BUDGET_BY_SENTIMENT].get(sentiment_value, (0, 0))
+            client_state[REVENUE_BUDGET_BY_SENTIMENT][sentiment_value] = (revenue_sum + revenue, budget_sum + budget)
+        save_processed_message_id(client_state[PROCESSED_MESSAGE_IDS], message_id, processed_time)
     
     def __update_revenues_budgets(self, analyzed_movies_batch):
         client_id = analyzed_movies_batch.client_id
-        self._state[client_id] = self._state.get(client_id, {REVENUE_BUDGET_BY_SENTIMENT: {}, PROCESSED_MESSAGE_IDS: {}})
-        if analyzed_movies_batch.message_id in self._state[client_id][PROCESSED_MESSAGE_IDS]:
+        if analyzed_movies_batch.message_id in self._state.client_state(client_id)[PROCESSED_MESSAGE_IDS]:
             return
+        revenue_budget_by_sentiment = {}
         for analyzed_movie in analyzed_movies_batch.get_items():
             revenue, budget, sentiment_value = analyzed_movie.revenue, analyzed_movie.budget, analyzed_movie.sentiment.value
             if revenue == 0 or budget == 0:
                 continue
-            revenue_sum, budget_sum = self._state[client_id][REVENUE_BUDGET_BY_SENTIMENT].get(sentiment_value, (0, 0))
-            revenue_sum += revenue
-            budget_sum += budget
-            self._state[client_id][REVENUE_BUDGET_BY_SENTIMENT][sentiment_value] = (revenue_sum, budget_sum)
-        self.__save_processed_message_id(client_id, analyzed_movies_batch.message_id)
-        self._storage_adapter.update(STATE_FILE_KEY, self._state[client_id], secondary_file_key=client_id)
+            revenue_sum, budget_sum = revenue_budget_by_sentiment.get(sentiment_value, (0, 0))
+            revenue_budget_by_sentiment[sentiment_value] = (revenue_sum + revenue, budget_sum + budget)
+        delta = (analyzed_movies_batch.message_id, time.time_ns(), revenue_budget_by_sentiment)
+        self._state.add_delta(client_id, delta)
     
     def __get_avgs_rate_revenue_budget_by_sentiment(self, eof):
         client_id = eof.client_id
@@ -91,11 +94,6 @@ class AvgRateRevenueBudgetCalculator(Monitorable):
             avgs_rate_revenue_budget.append(avg_rate_revenue_budget)
         return avgs_rate_revenue_budget
     
-    def __clean_client_state(self, client_id):
-        if client_id in self._state:
-            self._state.pop(client_id)
-            self._storage_adapter.delete(STATE_FILE_KEY, secondary_file_key=client_id)
-    
     def __handle_packet(self, packet):
         fail_with_probability(self._failure_probability, "before handling packet")
         msg = PacketSerde.deserialize(packet)
@@ -109,12 +107,14 @@ class AvgRateRevenueBudgetCalculator(Monitorable):
                 logging.debug(f"action: sent_avg_rate_revenue_budget | result: success | avg_rate_revenue_budget: {avg_rate_revenue_budget}")
             self._middleware.send_message(PacketSerde.serialize(EOF(eof.client_id, message_id=eof.message_id)))
             logging.info("action: sent_eof | result: success")
+            # The results must be published before the state needed to send them again is deleted
+            self._middleware.flush()
             fail_with_probability(self._failure_probability, "after sending results and eof, before cleaning client state")
-            self.__clean_client_state(eof.client_id)
+            self._state.delete(eof.client_id)
         elif msg.packet_type() == PacketType.CLIENT_DISCONNECTED:
             client_disconnected = msg
             logging.debug(f"action: client_disconnected | result: success | client_id: {client_disconnected.client_id}")
-            self.__clean_client_state(client_disconnected.client_id)
+            self._state.delete(client_disconnected.client_id)
             self._middleware.send_message(PacketSerde.serialize(client_disconnected))
         else:
             logging.error(f"action: unexpected_packet_type | result: fail | packet_type: {msg.packet_type()}")
@@ -126,5 +126,9 @@ class AvgRateRevenueBudgetCalculator(Monitorable):
         input_queues_and_callback_functions = [(input_queue[0], input_queue[1], self.__handle_packet) for input_queue in self._input_queues]
         self._middleware = Middleware(input_queues_and_callback_functions=input_queues_and_callback_functions,
                                       output_exchange=self._output_exchange,
+                                      prefetch_count=self._prefetch_count,
+                                      ack_batch_size=self._ack_batch_size,
+                                      ack_flush_interval_ms=self._ack_flush_interval_ms,
+                                      before_ack_function=self._state.save,
                                      )
         self._middleware.handle_messages()
@@ -30,6 +30,10 @@ def initialize_config():
         config_params["credits_exchange"] = os.getenv('CREDITS_EXCHANGE')
         config_params["max_concurrent_clients"] = int(os.getenv('MAX_CONCURRENT_CLIENTS', config["DEFAULT"]["MAX_CONCURRENT_CLIENTS"]))
         config_params["storage_path"] = os.getenv('STORAGE_PATH')
+        config_params["parser_processes_amount"] = int(os.getenv('PARSER_PROCESSES_AMOUNT', config["DEFAULT"]["PARSER_PROCESSES_AMOUNT"]))
+        config_params["max_pending_parsed_messages"] = int(os.getenv('MAX_PENDING_PARSED_MESSAGES', config["DEFAULT"]["MAX_PENDING_PARSED_MESSAGES"]))
+        config_params["messages_buffer_size"] = int(os.getenv('MESSAGES_BUFFER_SIZE', config["DEFAULT"]["MESSAGES_BUFFER_SIZE"]))
+        config_params["senders_amount"] = int(os.getenv('SENDERS_AMOUNT', config["DEFAULT"]["SENDERS_AMOUNT"]))
     except KeyError as e:
         raise KeyError("Key was not found. Error: {} .Aborting server".format(e))
     except ValueError as e:
@@ -60,15 +64,19 @@ def main():
     credits_exchange = config_params["credits_exchange"]
     max_concurrent_clients = config_params["max_concurrent_clients"]
     storage_path = config_params["storage_path"]
+    parser_processes_amount = config_params["parser_processes_amount"]
+    max_pending_parsed_messages = config_params["max_pending_parsed_messages"]
+    messages_buffer_size = config_params["messages_buffer_size"]
+    senders_amount = config_params["senders_amount"]
 
     initialize_log(logging_level)
 
     # Log config parameters at the beginning of the program to verify the configuration
     # of the component
     logging.debug(f"action: config | result: success | port: {port} | "
-                  f"listen_backlog: {listen_backlog} | logging_level: {logging_level} | movies_exchange: {movies_exchange} | ratings_exchange: {ratings_exchange} | credits_exchange: {credits_exchange} | max_concurrent_clients: {max_concurrent_clients} | storage_path: {storage_path}")
+                  f"listen_backlog: {listen_backlog} | logging_level: {logging_level} | movies_exchange: {movies_exchange} | ratings_exchange: {ratings_exchange} | credits_exchange: {credits_exchange} | max_concurrent_clients: {max_concurrent_clients} | storage_path: {storage_path} | parser_processes_amount: {parser_processes_amount} | max_pending_parsed_messages: {max_pending_parsed_messages} | messages_buffer_size: {messages_buffer_size} | senders_amount: {senders_amount}")
 
-    data_cleaner = DataCleaner(port, listen_backlog, movies_exchange, ratings_exchange, credits_exchange, max_concurrent_clients, storage_path)
+    data_cleaner = DataCleaner(port, listen_backlog, movies_exchange, ratings_exchange, credits_exchange, max_concurrent_clients, storage_path, parser_processes_amount, max_pending_parsed_messages, messages_buffer_size, senders_amount)
     data_cleaner.run()
 
 if __name__ == "__main__":
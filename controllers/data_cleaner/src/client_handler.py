@@ -1,6 +1,8 @@
 import socket
 import logging
 import signal
+import multiprocessing as mp
+from collections import deque
 import communication.communication as communication
 from utils.utils import close_socket
 from messages.movies_batch import MoviesBatch
@@ -8,22 +10,44 @@ from messages.ratings_batch import RatingsBatch
 from messages.credits_batch import CreditsBatch
 from messages.eof import EOF
 from messages.client_disconnected import ClientDisconnected
+from messages.packet_serde import PacketSerde
 from src.client_state import ClientState
+from src.messages_sender import encode_client_packet
 
 CLIENT_DISCONNECT_TIMEOUT = 1
 CONNECTED_CLIENTS_FILE_KEY = "connected_clients"
 
+def initialize_parser_process():
+    # The processes of the pool are forked from the client handler, so they inherit its
+    # SIGTERM handler, which must only run in the client handler
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+def parse_data_message(batch_class, client_id, msg):
+    """
+    Parse the lines of a message of a data file into a serialized batch in a process
+    of the pool. It is defined at module level so the processes of the pool can run it
+    """
+    csv_lines = communication.parse_lines_message(msg)
+    # Ratings and credits batches are indexed so the routers split them without deserializing them
+    return PacketSerde.serialize(batch_class.from_csv_lines(client_id, csv_lines), indexed=True)
+
 class ClientHandler:
-    def __init__(self, client_id, client_sock, messages_queue, receiver_pool_semaphore, connected_clients, connected_clients_update_lock, storage_adapter):
+    def __init__(self, client_id, client_sock, messages_buffer, receiver_pool_semaphore, connected_clients, connected_clients_update_lock, storage_adapter, parser_processes_amount, max_pending_parsed_messages):
         self._client_id = client_id
         self._client_sock = client_sock
-        self._messages_queue = messages_queue
+        self._messages_buffer = messages_buffer
         self._receiver_pool_semaphore = receiver_pool_semaphore
         self._client_state = ClientState()
         self._shutdown_requested = False
         self._connected_clients = connected_clients
         self._connected_clients_update_lock = connected_clients_update_lock
         self._storage_adapter = storage_adapter
+        # With 0 processes the messages are parsed by the client handler itself
+        self._parser_processes_amount = parser_processes_amount
+        self._max_pending_parsed_messages = max_pending_parsed_messages
+        self._parser_pool = None
+        # Results of the messages being parsed by the pool, in the order they were received
+        self._pending_parsed_messages = deque()
       
         signal.signal(signal.SIGTERM, self.__handle_signal)
 
@@ -35,7 +59,12 @@ class ClientHandler:
     def __cleanup(self):
         close_socket(self._client_sock, f"client_{self._client_id}_socket")
     
+    def __put_packet(self, packet):
+        self._messages_buffer.put(encode_client_packet(self._client_id, packet))
+    
     def handle_client(self):
+        if self._parser_processes_amount > 0:
+            self._parser_pool = mp.Pool(processes=self._parser_processes_amount, initializer=initialize_parser_process)
         communication.send_message(self._client_sock, self._client_id)
         
         self._client_sock.settimeout(CLIENT_DISCONNECT_TIMEOUT)
@@ -46,32 +75,48 @@ class ClientHandler:
             except (ConnectionError, socket.timeout):
                 logging.info(f"action: client_disconnected | client_id: {self._client_id}")
                 if not self._client_state.has_finished_sending():
-                    self._messages_queue.put(ClientDisconnected(self._client_id))
+                    self.__put_parsed_messages()
+                    self.__put_packet(PacketSerde.serialize(ClientDisconnected(self._client_id)))
                 break
             except OSError:
                 logging.info(f"action: terminating_client_handler | client_id: {self._client_id}")
                 break
         if not self._shutdown_requested:
             close_socket(self._client_sock, f"client_{self._client_id}_socket")
+        if self._parser_pool:
+            self._parser_pool.terminate()
+            self._parser_pool.join()
+        self._messages_buffer.close()
         with self._connected_clients_update_lock:
             self._connected_clients.pop(self._client_id)
-            self._storage_adapter.update(CONNECTED_CLIENTS_FILE_KEY, self._connected_clients)
+            self._storage_adapter.update(CONNECTED_CLIENTS_FILE_KEY, self._connected_clients.copy())
         self._receiver_pool_semaphore.release()
         
+    def __put_parsed_messages(self, max_pending=0):
+        """
+        Put the batches parsed by the pool in the messages buffer, in the order their
+        messages were received, until at most max_pending messages are being parsed.
+        Batches already parsed are put even if there are less pending messages
+        """
+        while self._pending_parsed_messages and (len(self._pending_parsed_messages) > max_pending or self._pending_parsed_messages[0].ready()):
+            self.__put_packet(self._pending_parsed_messages.popleft().get())
+    
+    def __parse_data_message(self, batch_class, msg):
+        if not self._parser_pool:
+            self.__put_packet(parse_data_message(batch_class, self._client_id, msg))
+            return
+        self._pending_parsed_messages.append(self._parser_pool.apply_async(parse_data_message, (batch_class, self._client_id, msg)))
+        self.__put_parsed_messages(self._max_pending_parsed_messages)
+    
     def __handle_client_message(self, msg):
         if msg == communication.EOF:
-            self._messages_queue.put(EOF(self._client_id))
+            self.__put_parsed_messages()
+            self.__put_packet(PacketSerde.serialize(EOF(self._client_id)))
             self._client_state.finished_sending_file()
             return
         if self._client_state.is_sending_movies():
-            movies_csv_lines = communication.parse_lines_message(msg)
-            movies_batch = MoviesBatch.from_csv_lines(self._client_id, movies_csv_lines)
-            self._messages_queue.put(movies_batch)
+            self.__parse_data_message(MoviesBatch, msg)
         elif self._client_state.is_sending_ratings():
-            ratings_csv_lines = communication.parse_lines_message(msg)
-            ratings_batch = RatingsBatch.from_csv_lines(self._client_id, ratings_csv_lines)
-            self._messages_queue.put(ratings_batch)
+            self.__parse_data_message(RatingsBatch, msg)
         elif self._client_state.is_sending_credits():
-            credits_csv_lines = communication.parse_lines_message(msg)
-            credits_batch = CreditsBatch.from_csv_lines(self._client_id, credits_csv_lines)
-            self._messages_queue.put(credits_batch)
+            self.__parse_data_message(CreditsBatch, msg)
@@ -3,17 +3,21 @@ import logging
 import signal
 import multiprocessing as mp
 import uuid
+import zlib
 from utils.utils import close_socket
-from src.messages_sender import MessagesSender
+from src.messages_sender import MessagesSender, encode_client_packet
+from src.ring_buffer import RingBuffer
 from src.client_handler import ClientHandler, CONNECTED_CLIENTS_FILE_KEY
 from common.monitorable import Monitorable
 from storage_adapter.storage_adapter import StorageAdapter
 from messages.client_disconnected import ClientDisconnected
+from messages.packet_serde import PacketSerde
 
-MESSAGES_QUEUE_SIZE = 10000
+# Record that stops a sender
+STOP_SENDING_RECORD = b''
 
 class DataCleaner(Monitorable):
-    def __init__(self, port, listen_backlog, movies_exchange, ratings_exchange, credits_exchange, max_concurrent_clients, storage_path):
+    def __init__(self, port, listen_backlog, movies_exchange, ratings_exchange, credits_exchange, max_concurrent_clients, storage_path, parser_processes_amount, max_pending_parsed_messages, messages_buffer_size, senders_amount):
         self._server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self._server_socket.bind(('', port))
         self._server_socket.listen(listen_backlog)
@@ -23,13 +27,18 @@ class DataCleaner(Monitorable):
         self._max_concurrent_clients = max_concurrent_clients
         self._shutdown_requested = False
         self._manager = mp.Manager()
-        self._messages_queue = self._manager.Queue(maxsize=MESSAGES_QUEUE_SIZE)
-        self._sender_process = None
+        # Every sender has its own ring buffer in shared memory, where the client handlers
+        # of the clients assigned to it put their serialized packets, which the sender
+        # publishes without serializing them again
+        self._messages_buffers = [RingBuffer(messages_buffer_size) for _ in range(senders_amount)]
+        self._sender_processes = []
         self._receiver_processes = []
         self._receiver_pool_semaphore = self._manager.BoundedSemaphore(max_concurrent_clients)
         self._connected_clients = self._manager.dict()
         self._connected_clients_update_lock = self._manager.Lock()
         self._storage_adapter = StorageAdapter(storage_path)
+        self._parser_processes_amount = parser_processes_amount
+        self._max_pending_parsed_messages = max_pending_parsed_messages
         
         signal.signal(signal.SIGTERM, self.__handle_signal)
 
@@ -55,11 +64,15 @@ class DataCleaner(Monitorable):
             receiver_process.join()
             logging.info("action: receiver_process_terminated | result: success")
             
-        self._messages_queue.put(None)
-        if self._sender_process:
-            self._sender_process.terminate()
-            self._sender_process.join()
+        for messages_buffer in self._messages_buffers:
+            messages_buffer.put(STOP_SENDING_RECORD)
+        for sender_process in self._sender_processes:
+            sender_process.terminate()
+            sender_process.join()
             logging.info("action: sender_process_terminated | result: success")
+        for messages_buffer in self._messages_buffers:
+            messages_buffer.close()
+            messages_buffer.unlink()
             
         self.stop_receiving_health_checks()
         
@@ -67,10 +80,19 @@ class DataCleaner(Monitorable):
         previous_connected_clients = self._storage_adapter.load_data(CONNECTED_CLIENTS_FILE_KEY)
         if previous_connected_clients:
             for client_id in previous_connected_clients:
-                self._messages_queue.put(ClientDisconnected(client_id))
+                self.__messages_buffer_of(client_id).put(encode_client_packet(client_id, PacketSerde.serialize(ClientDisconnected(client_id))))
                 logging.info(f"action: notify_disconnection_of_previous_client | client_id: {client_id}")
             self._storage_adapter.delete(CONNECTED_CLIENTS_FILE_KEY)
 
+    def __messages_buffer_of(self, client_id):
+        """
+        Return the messages buffer of the sender assigned to a client. All the packets of
+        a client are published by the same sender, so they keep their order
+        """
+        # The built-in hash of a str changes between processes, so it is not used to
+        # assign a client to a sender
+        return self._messages_buffers[zlib.crc32(client_id.encode('utf-8')) % len(self._messages_buffers)]
+
     def __accept_new_connection(self):
         """
         Accept new connections
@@ -84,24 +106,26 @@ class DataCleaner(Monitorable):
         client_id = str(uuid.uuid4())
         with self._connected_clients_update_lock:
             self._connected_clients[client_id] = True
-            self._storage_adapter.update(CONNECTED_CLIENTS_FILE_KEY, self._connected_clients)
+            self._storage_adapter.update(CONNECTED_CLIENTS_FILE_KEY, self._connected_clients.copy())
         logging.info(f'action: accept_connections | result: success | ip: {addr[0]}')
         return client_id, client_sock
 
-    def __handle_client(self, client_id, client_sock, messages_queue, receiver_pool_semaphore, connected_clients, connected_clients_update_lock, storage_adapter):
-        client_handler = ClientHandler(client_id, client_sock, messages_queue, receiver_pool_semaphore, connected_clients, connected_clients_update_lock, storage_adapter)
+    def __handle_client(self, client_id, client_sock, messages_buffer, receiver_pool_semaphore, connected_clients, connected_clients_update_lock, storage_adapter):
+        client_handler = ClientHandler(client_id, client_sock, messages_buffer, receiver_pool_semaphore, connected_clients, connected_clients_update_lock, storage_adapter, self._parser_processes_amount, self._max_pending_parsed_messages)
         client_handler.handle_client()
 
-    def __send_messages(self, messages_queue, data_exchanges):
-        messages_sender = MessagesSender(messages_queue, data_exchanges)
+    def __send_messages(self, messages_buffer, data_exchanges):
+        messages_sender = MessagesSender(messages_buffer, data_exchanges)
         messages_sender.send_messages()
     
     def run(self):
         self.start_receiving_health_checks()
         self.__notify_disconnection_of_previous_clients()
         data_exchanges = [self._movies_exchange, self._ratings_exchange, self._credits_exchange]
-        self._sender_process = mp.Process(target=self.__send_messages, args=(self._messages_queue, data_exchanges))
-        self._sender_process.start()
+        for messages_buffer in self._messages_buffers:
+            sender_process = mp.Process(target=self.__send_messages, args=(messages_buffer, data_exchanges))
+            self._sender_processes.append(sender_process)
+            sender_process.start()
         while not self._shutdown_requested:
             self._receiver_pool_semaphore.acquire()
             try:
@@ -111,7 +135,7 @@ class DataCleaner(Monitorable):
                     break
                 logging.error(f"action: accept_connection | result: fail | error: {e}")
             
-            client_handler = mp.Process(target=self.__handle_client, args=(client_id, client_sock, self._messages_queue, self._receiver_pool_semaphore, self._connected_clients, self._connected_clients_update_lock, self._storage_adapter))
+            client_handler = mp.Process(target=self.__handle_client, args=(client_id, client_sock, self.__messages_buffer_of(client_id), self._receiver_pool_semaphore, self._connected_clients, self._connected_clients_update_lock, self._storage_adapter))
             self._receiver_processes.append(client_handler)
             client_handler.start()
 
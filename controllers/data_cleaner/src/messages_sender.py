@@ -3,11 +3,23 @@ import logging
 from middleware.middleware import Middleware
 from messages.packet_type import PacketType
 from messages.packet_serde import PacketSerde
-import logging
+from messages.serialization import LENGTH_FIELD, encode_string, decode_string
+
+def encode_client_packet(client_id, packet):
+    """
+    Encode a serialized packet of a client as a record of the messages buffer. The
+    client id goes before the packet so the sender does not decode the packet
+    """
+    return encode_string(client_id) + packet
+
+def decode_client_packet(record):
+    client_id_length = int.from_bytes(record[:LENGTH_FIELD], 'big')
+    client_id = decode_string(record[LENGTH_FIELD:LENGTH_FIELD + client_id_length])
+    return client_id, record[LENGTH_FIELD + client_id_length:]
 
 class MessagesSender:
-    def __init__(self, messages_queue, exchanges):
-        self._messages_queue = messages_queue
+    def __init__(self, messages_buffer, exchanges):
+        self._messages_buffer = messages_buffer
         self._exchanges = exchanges
         self._current_exchange_i = {}
         self._middleware = Middleware()
@@ -21,19 +33,23 @@ class MessagesSender:
     
     def send_messages(self):
         while not self._shutdown_requested:
-            msg = self._messages_queue.get()
-            if not msg:
+            record = self._messages_buffer.get()
+            if not record:
                 logging.info("action: stop_sending | result: success")
                 break
-            if msg.packet_type() == PacketType.CLIENT_DISCONNECTED:
+            # Packets are published as they were serialized by the client handlers
+            client_id, packet = decode_client_packet(record)
+            packet_type = PacketSerde.packet_type(packet)
+            if packet_type == PacketType.CLIENT_DISCONNECTED:
                 for exchange in self._exchanges:
-                    self._middleware.send_message(PacketSerde.serialize(msg), exchange=exchange)
+                    self._middleware.send_message(packet, exchange=exchange)
                 continue
-            self._current_exchange_i[msg.client_id] = self._current_exchange_i.get(msg.client_id, 0)
-            self._middleware.send_message(PacketSerde.serialize(msg), exchange=self._exchanges[self._current_exchange_i[msg.client_id]])
-            if msg.packet_type() == PacketType.EOF:
-                self._current_exchange_i[msg.client_id] += 1
-                if self._current_exchange_i[msg.client_id] >= len(self._exchanges):
-                    logging.info(f"action: stop_sending | result: success | client_id: {msg.client_id}")
-                    self._current_exchange_i.pop(msg.client_id)
+            self._current_exchange_i[client_id] = self._current_exchange_i.get(client_id, 0)
+            self._middleware.send_message(packet, exchange=self._exchanges[self._current_exchange_i[client_id]])
+            if packet_type == PacketType.EOF:
+                self._current_exchange_i[client_id] += 1
+                if self._current_exchange_i[client_id] >= len(self._exchanges):
+                    logging.info(f"action: stop_sending | result: success | client_id: {client_id}")
+                    self._current_exchange_i.pop(client_id)
+        self._messages_buffer.close()
         self._middleware.stop()
@@ -0,0 +1,80 @@
+import struct
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+# Total amount of bytes ever written and read, so the free space is their difference
+# even after they wrap around the buffer
+POSITIONS = struct.Struct('QQ')
+RECORD_LENGTH = struct.Struct('I')
+
+class RingBuffer:
+    """
+    Queue of byte records shared by processes through shared memory. Every record is
+    prefixed by its length and may wrap around the end of the buffer. Writers wait for
+    enough free space and readers for a record, on a condition shared by all of them.
+    The buffer is created by the parent process, and the processes it starts use it
+    through the same shared memory block
+    """
+    def __init__(self, capacity):
+        self._capacity = capacity
+        self._shared_memory = shared_memory.SharedMemory(create=True, size=POSITIONS.size + capacity)
+        POSITIONS.pack_into(self._shared_memory.buf, 0, 0, 0)
+        self._condition = mp.Condition()
+
+    def __repr__(self):
+        return f"RingBuffer(name={self._shared_memory.name}, capacity={self._capacity})"
+
+    def __write(self, position, data):
+        data = memoryview(data)
+        start = position % self._capacity
+        first_part_length = min(len(data), self._capacity - start)
+        buf = self._shared_memory.buf[POSITIONS.size:]
+        buf[start:start + first_part_length] = data[:first_part_length]
+        buf[:len(data) - first_part_length] = data[first_part_length:]
+        buf.release()
+
+    def __read(self, position, length):
+        start = position % self._capacity
+        first_part_length = min(length, self._capacity - start)
+        buf = self._shared_memory.buf[POSITIONS.size:]
+        data = bytes(buf[start:start + first_part_length]) + bytes(buf[:length - first_part_length])
+        buf.release()
+        return data
+
+    def put(self, record):
+        record_size = RECORD_LENGTH.size + len(record)
+        if record_size > self._capacity:
+            raise ValueError(f"Record of {len(record)} bytes does not fit in a ring buffer of {self._capacity} bytes")
+        with self._condition:
+            read_position, write_position = POSITIONS.unpack_from(self._shared_memory.buf, 0)
+            while self._capacity - (write_position - read_position) < record_size:
+                self._condition.wait()
+                read_position, write_position = POSITIONS.unpack_from(self._shared_memory.buf, 0)
+            self.__write(write_position, RECORD_LENGTH.pack(len(record)))
+            self.__write(write_position + RECORD_LENGTH.size, record)
+            POSITIONS.pack_into(self._shared_memory.buf, 0, read_position, write_position + record_size)
+            self._condition.notify_all()
+
+    def get(self):
+        """
+        Remove and return the oldest record, waiting for one if the buffer is empty
+        """
+        with self._condition:
+            read_position, write_position = POSITIONS.unpack_from(self._shared_memory.buf, 0)
+            while read_position == write_position:
+                self._condition.wait()
+                read_position, write_position = POSITIONS.unpack_from(self._shared_memory.buf, 0)
+            record_length, = RECORD_LENGTH.unpack(self.__read(read_position, RECORD_LENGTH.size))
+            record = self.__read(read_position + RECORD_LENGTH.size, record_length)
+            POSITIONS.pack_into(self._shared_memory.buf, 0, read_position + RECORD_LENGTH.size + record_length, write_position)
+            self._condition.notify_all()
+            return record
+
+    def close(self):
+        self._shared_memory.close()
+
+    def unlink(self):
+        """
+        Free the shared memory block. Only the process that created the buffer does it
+        """
+        self._shared_memory.unlink()
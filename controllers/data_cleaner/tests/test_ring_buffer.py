@@ -0,0 +1,154 @@
+import multiprocessing as mp
+import os
+import sys
+import threading
+import unittest
+from multiprocessing import shared_memory
+
+CONTROLLER_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(CONTROLLER_PATH)))
+sys.path.insert(0, CONTROLLER_PATH)
+
+from src.ring_buffer import RingBuffer, RECORD_LENGTH
+
+STOP_RECORD = b''
+TIMEOUT = 10
+
+def put_records(ring_buffer, records):
+    for record in records:
+        ring_buffer.put(record)
+    ring_buffer.close()
+
+def get_records_until_stop(ring_buffer, records_queue):
+    while True:
+        record = ring_buffer.get()
+        if not record:
+            break
+        records_queue.put(record)
+    ring_buffer.close()
+    records_queue.put(STOP_RECORD)
+
+def record(i):
+    # Records of up to 70 bytes
+    return f"record {i}".encode('utf-8') * (i % 7 + 1)
+
+class TestRingBuffer(unittest.TestCase):
+    def setUp(self):
+        self.ring_buffers = []
+
+    def tearDown(self):
+        for ring_buffer in self.ring_buffers:
+            ring_buffer.close()
+            ring_buffer.unlink()
+
+    def new_ring_buffer(self, capacity):
+        ring_buffer = RingBuffer(capacity)
+        self.ring_buffers.append(ring_buffer)
+        return ring_buffer
+
+    def test_records_are_read_in_order(self):
+        ring_buffer = self.new_ring_buffer(1024)
+        for i in range(10):
+            ring_buffer.put(record(i))
+        self.assertEqual([ring_buffer.get() for _ in range(10)], [record(i) for i in range(10)])
+
+    def test_records_wrap_around(self):
+        # 13 bytes records in a 32 bytes buffer start at every offset, so some of them
+        # and some of their lengths are split between the end and the start of the buffer
+        ring_buffer = self.new_ring_buffer(32)
+        for i in range(100):
+            data = i.to_bytes(1, 'big') * (13 - RECORD_LENGTH.size)
+            ring_buffer.put(data)
+            if i % 2:
+                ring_buffer.put(data[::-1] + b'!')
+                self.assertEqual(ring_buffer.get(), data)
+                self.assertEqual(ring_buffer.get(), data[::-1] + b'!')
+            else:
+                self.assertEqual(ring_buffer.get(), data)
+
+    def test_record_filling_the_buffer(self):
+        ring_buffer = self.new_ring_buffer(16)
+        data = b'x' * (16 - RECORD_LENGTH.size)
+        for _ in range(3):
+            ring_buffer.put(data)
+            self.assertEqual(ring_buffer.get(), data)
+
+    def test_record_bigger_than_buffer(self):
+        ring_buffer = self.new_ring_buffer(16)
+        with self.assertRaises(ValueError):
+            ring_buffer.put(b'x' * (16 - RECORD_LENGTH.size + 1))
+        # The buffer is still usable
+        ring_buffer.put(b'y')
+        self.assertEqual(ring_buffer.get(), b'y')
+
+    def test_full_buffer_blocks_writer_until_read(self):
+        ring_buffer = self.new_ring_buffer(16)
+        ring_buffer.put(b'a' * 8)
+        written = threading.Event()
+        def put_record():
+            ring_buffer.put(b'b' * 8)
+            written.set()
+        writer = threading.Thread(target=put_record)
+        writer.start()
+        self.assertFalse(written.wait(0.2))
+        self.assertEqual(ring_buffer.get(), b'a' * 8)
+        self.assertTrue(written.wait(TIMEOUT))
+        writer.join(TIMEOUT)
+        self.assertEqual(ring_buffer.get(), b'b' * 8)
+
+    def test_empty_buffer_blocks_reader_until_written(self):
+        ring_buffer = self.new_ring_buffer(16)
+        records = []
+        reader = threading.Thread(target=lambda: records.append(ring_buffer.get()))
+        reader.start()
+        reader.join(0.2)
+        self.assertTrue(reader.is_alive())
+        ring_buffer.put(b'a')
+        reader.join(TIMEOUT)
+        self.assertFalse(reader.is_alive())
+        self.assertEqual(records, [b'a'])
+
+    def test_writers_in_other_processes(self):
+        # The buffer is smaller than the records of one writer, so they wait for the reader
+        ring_buffer = self.new_ring_buffer(128)
+        writers_records = [[record(i) + bytes([writer]) for i in range(200)] for writer in range(3)]
+        writers = [mp.Process(target=put_records, args=(ring_buffer, records)) for records in writers_records]
+        for writer in writers:
+            writer.start()
+        records = [ring_buffer.get() for _ in range(sum(len(records) for records in writers_records))]
+        for writer in writers:
+            writer.join(TIMEOUT)
+            self.assertEqual(writer.exitcode, 0)
+        # Records of every writer are read in the order they were written
+        for writer, writer_records in enumerate(writers_records):
+            self.assertEqual([r for r in records if r[-1] == writer], writer_records)
+
+    def test_stop_record_shuts_reader_down(self):
+        ring_buffer = self.new_ring_buffer(128)
+        records_queue = mp.Queue()
+        reader = mp.Process(target=get_records_until_stop, args=(ring_buffer, records_queue))
+        reader.start()
+        records = [record(i) for i in range(50)]
+        put_records_thread = threading.Thread(target=lambda: [ring_buffer.put(r) for r in records + [STOP_RECORD]])
+        put_records_thread.start()
+        read_records = []
+        while True:
+            read_record = records_queue.get(timeout=TIMEOUT)
+            if not read_record:
+                break
+            read_records.append(read_record)
+        put_records_thread.join(TIMEOUT)
+        reader.join(TIMEOUT)
+        self.assertEqual(reader.exitcode, 0)
+        self.assertEqual(read_records, records)
+
+    def test_unlink_frees_shared_memory(self):
+        ring_buffer = RingBuffer(16)
+        name = ring_buffer._shared_memory.name
+        ring_buffer.close()
+        ring_buffer.unlink()
+        with self.assertRaises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
+
+if __name__ == "__main__":
+    unittest.main()
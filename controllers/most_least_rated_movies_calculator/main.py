@@ -28,6 +28,11 @@ def initialize_config():
         config_params["output_exchange"] = os.getenv('OUTPUT_EXCHANGE')
         config_params["failure_probability"] = float(os.getenv('FAILURE_PROBABILITY'))
         config_params["storage_path"] = os.getenv('STORAGE_PATH')
+        config_params["prefetch_count"] = int(os.getenv('PREFETCH_COUNT', config["DEFAULT"]["PREFETCH_COUNT"]))
+        config_params["ack_batch_size"] = int(os.getenv('ACK_BATCH_SIZE', config["DEFAULT"]["ACK_BATCH_SIZE"]))
+        config_params["ack_flush_interval_ms"] = int(os.getenv('ACK_FLUSH_INTERVAL_MS', config["DEFAULT"]["ACK_FLUSH_INTERVAL_MS"]))
+        config_params["wal_max_records"] = int(os.getenv('WAL_MAX_RECORDS', config["DEFAULT"]["WAL_MAX_RECORDS"]))
+        config_params["wal_max_bytes"] = int(os.getenv('WAL_MAX_BYTES', config["DEFAULT"]["WAL_MAX_BYTES"]))
     except KeyError as e:
         raise KeyError("Key was not found. Error: {} .Aborting server".format(e))
     except ValueError as e:
@@ -55,14 +60,19 @@ def main():
     output_exchange = config_params["output_exchange"]
     failure_probability = config_params["failure_probability"]
     storage_path = config_params["storage_path"]
+    prefetch_count = config_params["prefetch_count"]
+    ack_batch_size = config_params["ack_batch_size"]
+    ack_flush_interval_ms = config_params["ack_flush_interval_ms"]
+    wal_max_records = config_params["wal_max_records"]
+    wal_max_bytes = config_params["wal_max_bytes"]
     
     initialize_log(logging_level)
 
     # Log config parameters at the beginning of the program to verify the configuration
     # of the component
-    logging.debug(f"action: config | result: success | logging_level: {logging_level} | input_queues: {input_queues} | output_exchange: {output_exchange} | failure_probability: {failure_probability} | storage_path: {storage_path}")
+    logging.debug(f"action: config | result: success | logging_level: {logging_level} | input_queues: {input_queues} | output_exchange: {output_exchange} | failure_probability: {failure_probability} | storage_path: {storage_path} | prefetch_count: {prefetch_count} | ack_batch_size: {ack_batch_size} | ack_flush_interval_ms: {ack_flush_interval_ms} | wal_max_records: {wal_max_records} | wal_max_bytes: {wal_max_bytes}")
 
-    most_least_rated_movies_calculator = MostLeastRatedMoviesCalculator(input_queues, output_exchange, failure_probability, storage_path)
+    most_least_rated_movies_calculator = MostLeastRatedMoviesCalculator(input_queues, output_exchange, failure_probability, storage_path, prefetch_count, ack_batch_size, ack_flush_interval_ms, wal_max_records, wal_max_bytes)
     most_least_rated_movies_calculator.run()
 
 if __name__ == "__main__":
@@ -10,21 +10,24 @@ from messages.movie_rating import MovieRating
 from messages.movie_ratings_batch import MovieRatingsBatch
 from common.monitorable import Monitorable
 from storage_adapter.storage_adapter import StorageAdapter
+from storage_adapter.wal_state import WalState, save_processed_message_id
 from common.failure_simulation import fail_with_probability
 
 STATE_FILE_KEY = "state"
 MOVIE_RATINGS = "movie_ratings"
 PROCESSED_MESSAGE_IDS= "processed_message_ids"
-MAX_PROCESSED_MESSAGE_IDS = 500
 
 class MostLeastRatedMoviesCalculator(Monitorable):
-    def __init__(self, input_queues, output_exchange, failure_probability, storage_path):
+    def __init__(self, input_queues, output_exchange, failure_probability, storage_path, prefetch_count, ack_batch_size, ack_flush_interval_ms, wal_max_records, wal_max_bytes):
         self._input_queues = input_queues
         self._output_exchange = output_exchange
         self._failure_probability = failure_probability
         self._middleware = None
-        self._state = {}
-        self._storage_adapter = StorageAdapter(storage_path)
+        self._storage_adapter = StorageAdapter(storage_path, wal_max_records=wal_max_records, wal_max_bytes=wal_max_bytes)
+        self._state = WalState(self._storage_adapter, STATE_FILE_KEY, self.__apply_delta, self.__new_client_state)
+        self._prefetch_count = prefetch_count
+        self._ack_batch_size = ack_batch_size
+        self._ack_flush_interval_ms = ack_flush_interval_ms
         
         signal.signal(signal.SIGTERM, self.__handle_signal)
 
@@ -47,9 +50,7 @@ class MostLeastRatedMoviesCalculator(Monitorable):
         """
         Load persisted state from storage
         """
-        state = self._storage_adapter.load_data(STATE_FILE_KEY)
-        if state:
-            self._state = state
+        if self._state.load():
             logging.debug(f"action: load_state_from_storage | result: success | state: {self._state}")
             
     def __generate_deterministic_uuid(self, message_id):
@@ -58,24 +59,32 @@ class MostLeastRatedMoviesCalculator(Monitorable):
         """
         return str(uuid.uuid5(uuid.UUID(message_id), "most_least_rated_movies_calculator"))
     
-    def __save_processed_message_id(self, client_id, message_id):
-        self._state[client_id][PROCESSED_MESSAGE_IDS][message_id] = time.time_ns()
-        if len(self._state[client_id][PROCESSED_MESSAGE_IDS]) > MAX_PROCESSED_MESSAGE_IDS:
-            oldest_message_id = min(self._state[client_id][PROCESSED_MESSAGE_IDS], key=self._state[client_id][PROCESSED_MESSAGE_IDS].get)
-            self._state[client_id][PROCESSED_MESSAGE_IDS].pop(oldest_message_id)
+    def __new_client_state(self):
+        return {MOVIE_RATINGS: {}, PROCESSED_MESSAGE_IDS: {}}
+    
+    def __apply_delta(self, client_state, delta):
+        message_id, processed_time, movie_ratings = delta
+        for movie_id, (title, delta_sum_ratings, delta_cant_ratings) in movie_ratings.items():
+            title, sum_ratings, cant_ratings = client_state[MOVIE_RATINGS].get(movie_id, (title, 0, 0))
+            client_state[MOVIE_RATINGS][movie_id] = (title, sum_ratings + delta_sum_ratings, cant_ratings + delta_cant_ratings)
+        save_processed_message_id(client_state[PROCESSED_MESSAGE_IDS], message_id, processed_time)
     
     def __update_movie_ratings(self, movie_ratings_batch):
         client_id = movie_ratings_batch.client_id
-        self._state[client_id] = self._state.get(client_id, {MOVIE_RATINGS: {}, PROCESSED_MESSAGE_IDS: {}})
-        if movie_ratings_batch.message_id in self._state[client_id][PROCESSED_MESSAGE_IDS]:
+        if movie_ratings_batch.message_id in self._state.client_state(client_id)[PROCESSED_MESSAGE_IDS]:
             return
-        for movie_rating in movie_ratings_batch.get_items():
-            title, sum_ratings, cant_ratings = self._state[client_id][MOVIE_RATINGS].get(movie_rating.id, (movie_rating.title, 0, 0))
-            sum_ratings += movie_rating.rating
-            cant_ratings += 1
-            self._state[client_id][MOVIE_RATINGS][movie_rating.id] = (title, sum_ratings, cant_ratings)
-        self.__save_processed_message_id(client_id, movie_ratings_batch.message_id)
-        self._storage_adapter.update(STATE_FILE_KEY, self._state[client_id], secondary_file_key=client_id)
+        movie_ratings = {}
+        if movie_ratings_batch.packet_type() == PacketType.MOVIE_RATING_PARTIALS_BATCH:
+            # Ratings already summed by a joiner
+            for movie_rating_partial in movie_ratings_batch.get_items():
+                title, sum_ratings, cant_ratings = movie_ratings.get(movie_rating_partial.id, (movie_rating_partial.title, 0, 0))
+                movie_ratings[movie_rating_partial.id] = (title, sum_ratings + movie_rating_partial.sum_ratings, cant_ratings + movie_rating_partial.amount_ratings)
+        else:
+            for movie_rating in movie_ratings_batch.get_items():
+                title, sum_ratings, cant_ratings = movie_ratings.get(movie_rating.id, (movie_rating.title, 0, 0))
+                movie_ratings[movie_rating.id] = (title, sum_ratings + movie_rating.rating, cant_ratings + 1)
+        delta = (movie_ratings_batch.message_id, time.time_ns(), movie_ratings)
+        self._state.add_delta(client_id, delta)
     
     def __get_most_least_rated_movies(self, eof):
         client_id = eof.client_id
@@ -98,15 +107,10 @@ class MostLeastRatedMoviesCalculator(Monitorable):
         new_message_id = self.__generate_deterministic_uuid(eof.message_id)
         return MovieRatingsBatch(client_id, [most_rated_movie, least_rated_movie], message_id=new_message_id)
     
-    def __clean_client_state(self, client_id):
-        if client_id in self._state:
-            self._state.pop(client_id)
-            self._storage_adapter.delete(STATE_FILE_KEY, secondary_file_key=client_id)
-    
     def __handle_packet(self, packet):
         fail_with_probability(self._failure_probability, "before handling packet")
         msg = PacketSerde.deserialize(packet)
-        if msg.packet_type() == PacketType.MOVIE_RATINGS_BATCH:
+        if msg.packet_type() in (PacketType.MOVIE_RATINGS_BATCH, PacketType.MOVIE_RATING_PARTIALS_BATCH):
             movie_ratings_batch = msg
             self.__update_movie_ratings(movie_ratings_batch)
         elif msg.packet_type() == PacketType.EOF:
@@ -117,12 +121,14 @@ class MostLeastRatedMoviesCalculator(Monitorable):
                 logging.debug(f"action: sent_movie_ratings_batch | result: success | movie_ratings_batch: {movie_ratings_batch_result}")
             self._middleware.send_message(PacketSerde.serialize(EOF(eof.client_id, message_id=eof.message_id)))
             logging.info("action: sent_eof | result: success")
+            # The results must be published before the state needed to send them again is deleted
+            self._middleware.flush()
             fail_with_probability(self._failure_probability, "after sending results and eof, before cleaning client state")
-            self.__clean_client_state(eof.client_id)
+            self._state.delete(eof.client_id)
         elif msg.packet_type() == PacketType.CLIENT_DISCONNECTED:
             client_disconnected = msg
             logging.debug(f"action: client_disconnected | result: success | client_id: {client_disconnected.client_id}")
-            self.__clean_client_state(client_disconnected.client_id)
+            self._state.delete(client_disconnected.client_id)
             self._middleware.send_message(PacketSerde.serialize(client_disconnected))
         else:
             logging.error(f"action: unexpected_packet_type | result: fail | packet_type: {msg.packet_type()}")
@@ -134,5 +140,9 @@ class MostLeastRatedMoviesCalculator(Monitorable):
         input_queues_and_callback_functions = [(input_queue[0], input_queue[1], self.__handle_packet) for input_queue in self._input_queues]
         self._middleware = Middleware(input_queues_and_callback_functions=input_queues_and_callback_functions,
                                       output_exchange=self._output_exchange,
+                                      prefetch_count=self._prefetch_count,
+                                      ack_batch_size=self._ack_batch_size,
+                                      ack_flush_interval_ms=self._ack_flush_interval_ms,
+                                      before_ack_function=self._state.save,
                                      )
         self._middleware.handle_messages()
@@ -32,6 +32,10 @@ def initialize_config():
         config_params["failure_probability"] = float(os.getenv('FAILURE_PROBABILITY'))
         config_params["cluster_size"] = int(os.getenv('CLUSTER_SIZE'))
         config_params["id"] = os.getenv('ID')
+        config_params["prefetch_count"] = int(os.getenv('PREFETCH_COUNT', config["DEFAULT"]["PREFETCH_COUNT"]))
+        config_params["ack_batch_size"] = int(os.getenv('ACK_BATCH_SIZE', config["DEFAULT"]["ACK_BATCH_SIZE"]))
+        config_params["ack_flush_interval_ms"] = int(os.getenv('ACK_FLUSH_INTERVAL_MS', config["DEFAULT"]["ACK_FLUSH_INTERVAL_MS"]))
+        config_params["columnar_filtering"] = os.getenv('COLUMNAR_FILTERING', config["DEFAULT"]["COLUMNAR_FILTERING"]).lower() == "true"
     except KeyError as e:
         raise KeyError("Key was not found. Error: {} .Aborting server".format(e))
     except ValueError as e:
@@ -63,14 +67,18 @@ def main():
     failure_probability = config_params["failure_probability"]
     cluster_size = config_params["cluster_size"]
     id = config_params["id"]
+    prefetch_count = config_params["prefetch_count"]
+    ack_batch_size = config_params["ack_batch_size"]
+    ack_flush_interval_ms = config_params["ack_flush_interval_ms"]
+    columnar_filtering = config_params["columnar_filtering"]
     
     initialize_log(logging_level)
 
     # Log config parameters at the beginning of the program to verify the configuration
     # of the component
-    logging.debug(f"action: config | result: success | logging_level: {logging_level} | filter_field: {filter_field} | filter_values: {filter_values} | output_fields_subset: {output_fields_subset} | input_queues: {input_queues} | output_exchange: {output_exchange} | failure_probability: {failure_probability} | cluster_size: {cluster_size} | id: {id}")
+    logging.debug(f"action: config | result: success | logging_level: {logging_level} | filter_field: {filter_field} | filter_values: {filter_values} | output_fields_subset: {output_fields_subset} | input_queues: {input_queues} | output_exchange: {output_exchange} | failure_probability: {failure_probability} | cluster_size: {cluster_size} | id: {id} | prefetch_count: {prefetch_count} | ack_batch_size: {ack_batch_size} | ack_flush_interval_ms: {ack_flush_interval_ms} | columnar_filtering: {columnar_filtering}")
 
-    movies_filter = MoviesFilter(filter_field, filter_values, output_fields_subset, input_queues, output_exchange, failure_probability, cluster_size, id)
+    movies_filter = MoviesFilter(filter_field, filter_values, output_fields_subset, input_queues, output_exchange, failure_probability, cluster_size, id, prefetch_count, ack_batch_size, ack_flush_interval_ms, columnar_filtering)
     movies_filter.run()
 
 if __name__ == "__main__":
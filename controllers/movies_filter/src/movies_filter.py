@@ -1,10 +1,12 @@
 import signal
 import logging
+import numpy as np
 from middleware.middleware import Middleware
 from messages.eof import EOF
 from messages.packet_serde import PacketSerde
 from messages.packet_type import PacketType
 from messages.movies_batch import MoviesBatch
+from messages.movies_batch_columns import MoviesBatchColumns
 from common.monitorable import Monitorable
 from common.failure_simulation import fail_with_probability
 
@@ -12,7 +14,7 @@ PRODUCTION_COUNTRIES_FIELD = 'production_countries'
 RELEASE_DATE_FIELD = 'release_date'
 
 class MoviesFilter(Monitorable):
-    def __init__(self, filter_field, filter_values, output_fields_subset, input_queues, output_exchange, failure_probability, cluster_size, id):
+    def __init__(self, filter_field, filter_values, output_fields_subset, input_queues, output_exchange, failure_probability, cluster_size, id, prefetch_count, ack_batch_size, ack_flush_interval_ms, columnar_filtering):
         self._filter_field = filter_field
         self._filter_values = filter_values
         self._output_fields_subset = output_fields_subset
@@ -22,6 +24,10 @@ class MoviesFilter(Monitorable):
         self._cluster_size = cluster_size
         self._id = id
         self._middleware = None
+        self._prefetch_count = prefetch_count
+        self._ack_batch_size = ack_batch_size
+        self._ack_flush_interval_ms = ack_flush_interval_ms
+        self._columnar_filtering = columnar_filtering
         
         signal.signal(signal.SIGTERM, self.__handle_signal)
 
@@ -83,12 +89,58 @@ class MoviesFilter(Monitorable):
             self._middleware.send_message(PacketSerde.serialize(filtered_movies_batch, fields_subset=self._output_fields_subset))
             logging.debug(f"action: movies_batch_filtered | result: success | filtered_movies_batch: {filtered_movies_batch}")
     
+    def __production_countries_mask(self, movies_columns):
+        countries, movies_indexes = movies_columns.string_lists(PRODUCTION_COUNTRIES_FIELD)
+        if isinstance(self._filter_values, int):
+            expected_amount_of_countries = self._filter_values
+            return np.bincount(movies_indexes, minlength=len(movies_columns)) == expected_amount_of_countries
+        movie_prod_countries = np.array([country.lower() for country in countries], dtype=object)
+        mask = np.ones(len(movies_columns), dtype=bool)
+        for country in self._filter_values:
+            mask &= np.bincount(movies_indexes[movie_prod_countries == country.lower()], minlength=len(movies_columns)) > 0
+        return mask
+    
+    def __release_date_mask(self, movies_columns):
+        years = movies_columns.release_years
+        if len(self._filter_values) == 2:
+            min_year, max_year = self._filter_values
+            return ((years >= min_year) & (years <= max_year)).filled(False)
+        elif len(self._filter_values) == 1:
+            min_year = self._filter_values[0]
+            return (years >= min_year).filled(False)
+        return np.zeros(len(movies_columns), dtype=bool)
+    
+    def __filter_movies_columns(self, movies_columns):
+        """
+        Vectorized version of __filter_movies that evaluates the filter on the whole batch at once
+        """
+        if self._filter_field == PRODUCTION_COUNTRIES_FIELD:
+            mask = self.__production_countries_mask(movies_columns)
+        elif self._filter_field == RELEASE_DATE_FIELD:
+            mask = self.__release_date_mask(movies_columns)
+        else:
+            return
+        
+        if mask.any():
+            filtered_movies_columns = movies_columns.take(mask)
+            self._middleware.send_message(PacketSerde.serialize(filtered_movies_columns, fields_subset=self._output_fields_subset))
+            logging.debug(f"action: movies_batch_filtered | result: success | filtered_movies_batch: {filtered_movies_columns}")
+    
+    def __deserialize(self, packet):
+        packet_type, version, payload = PacketSerde.deserialize_header(packet)
+        if self._columnar_filtering and packet_type == PacketType.MOVIES_BATCH:
+            return MoviesBatchColumns.deserialize(payload, version)
+        return PacketSerde.deserialize(packet)
+    
     def __handle_packet(self, packet):
         fail_with_probability(self._failure_probability, "before sending message")
-        msg = PacketSerde.deserialize(packet)
+        msg = self.__deserialize(packet)
         if msg.packet_type() == PacketType.MOVIES_BATCH:
             movies_batch = msg
-            self.__filter_movies(movies_batch)
+            if self._columnar_filtering:
+                self.__filter_movies_columns(movies_batch)
+            else:
+                self.__filter_movies(movies_batch)
         elif msg.packet_type() == PacketType.EOF:
             eof = msg
             eof.add_seen_id(self._id)
@@ -110,5 +162,8 @@ class MoviesFilter(Monitorable):
         input_queues_and_callback_functions = [(input_queue[0], input_queue[1], self.__handle_packet) for input_queue in self._input_queues]
         self._middleware = Middleware(input_queues_and_callback_functions=input_queues_and_callback_functions,
                                       output_exchange=self._output_exchange,
+                                      prefetch_count=self._prefetch_count,
+                                      ack_batch_size=self._ack_batch_size,
+                                      ack_flush_interval_ms=self._ack_flush_interval_ms,
                                      )
         self._middleware.handle_messages()
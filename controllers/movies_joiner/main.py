@@ -30,6 +30,20 @@ def initialize_config():
         config_params["cluster_size"] = int(os.getenv('CLUSTER_SIZE'))
         config_params["id"] = os.getenv('ID')
         config_params["storage_path"] = os.getenv('STORAGE_PATH')
+        config_params["publish_batch_size"] = int(os.getenv('PUBLISH_BATCH_SIZE', config["DEFAULT"]["PUBLISH_BATCH_SIZE"]))
+        config_params["publish_flush_interval_ms"] = int(os.getenv('PUBLISH_FLUSH_INTERVAL_MS', config["DEFAULT"]["PUBLISH_FLUSH_INTERVAL_MS"]))
+        config_params["reliable_publishes"] = os.getenv('RELIABLE_PUBLISHES', config["DEFAULT"]["RELIABLE_PUBLISHES"]).lower() == "true"
+        config_params["prefetch_count"] = int(os.getenv('PREFETCH_COUNT', config["DEFAULT"]["PREFETCH_COUNT"]))
+        config_params["ack_batch_size"] = int(os.getenv('ACK_BATCH_SIZE', config["DEFAULT"]["ACK_BATCH_SIZE"]))
+        config_params["ack_flush_interval_ms"] = int(os.getenv('ACK_FLUSH_INTERVAL_MS', config["DEFAULT"]["ACK_FLUSH_INTERVAL_MS"]))
+        config_params["middleware_type"] = os.getenv('MIDDLEWARE_TYPE', config["DEFAULT"]["MIDDLEWARE_TYPE"])
+        config_params["storage_durability_policy"] = os.getenv('STORAGE_DURABILITY_POLICY', config["DEFAULT"]["STORAGE_DURABILITY_POLICY"])
+        config_params["storage_fsync_interval_ms"] = int(os.getenv('STORAGE_FSYNC_INTERVAL_MS', config["DEFAULT"]["STORAGE_FSYNC_INTERVAL_MS"]))
+        config_params["movies_store_type"] = os.getenv('MOVIES_STORE_TYPE', config["DEFAULT"]["MOVIES_STORE_TYPE"])
+        config_params["movie_ids_filter_exchange"] = os.getenv('MOVIE_IDS_FILTER_EXCHANGE', config["DEFAULT"]["MOVIE_IDS_FILTER_EXCHANGE"])
+        config_params["movie_ids_filter_false_positive_rate"] = float(os.getenv('MOVIE_IDS_FILTER_FALSE_POSITIVE_RATE', config["DEFAULT"]["MOVIE_IDS_FILTER_FALSE_POSITIVE_RATE"]))
+        config_params["combiner_enabled"] = os.getenv('COMBINER_ENABLED', config["DEFAULT"]["COMBINER_ENABLED"]).lower() == "true"
+        config_params["combiner_max_keys"] = int(os.getenv('COMBINER_MAX_KEYS', config["DEFAULT"]["COMBINER_MAX_KEYS"]))
     except KeyError as e:
         raise KeyError("Key was not found. Error: {} .Aborting server".format(e))
     except ValueError as e:
@@ -59,14 +73,28 @@ def main():
     cluster_size = config_params["cluster_size"]
     id = config_params["id"]
     storage_path = config_params["storage_path"]
+    publish_batch_size = config_params["publish_batch_size"]
+    publish_flush_interval_ms = config_params["publish_flush_interval_ms"]
+    reliable_publishes = config_params["reliable_publishes"]
+    prefetch_count = config_params["prefetch_count"]
+    ack_batch_size = config_params["ack_batch_size"]
+    ack_flush_interval_ms = config_params["ack_flush_interval_ms"]
+    middleware_type = config_params["middleware_type"]
+    storage_durability_policy = config_params["storage_durability_policy"]
+    storage_fsync_interval_ms = config_params["storage_fsync_interval_ms"]
+    movies_store_type = config_params["movies_store_type"]
+    movie_ids_filter_exchange = config_params["movie_ids_filter_exchange"]
+    movie_ids_filter_false_positive_rate = config_params["movie_ids_filter_false_positive_rate"]
+    combiner_enabled = config_params["combiner_enabled"]
+    combiner_max_keys = config_params["combiner_max_keys"]
     
     initialize_log(logging_level)
 
     # Log config parameters at the beginning of the program to verify the configuration
     # of the component
-    logging.debug(f"action: config | result: success | logging_level: {logging_level} | input_queues: {input_queues} | output_exchange: {output_exchange} | failure_probability: {failure_probability} | cluster_size: {cluster_size} | id: {id} | storage_path: {storage_path}")
+    logging.debug(f"action: config | result: success | logging_level: {logging_level} | input_queues: {input_queues} | output_exchange: {output_exchange} | failure_probability: {failure_probability} | cluster_size: {cluster_size} | id: {id} | storage_path: {storage_path} | publish_batch_size: {publish_batch_size} | publish_flush_interval_ms: {publish_flush_interval_ms} | reliable_publishes: {reliable_publishes} | prefetch_count: {prefetch_count} | ack_batch_size: {ack_batch_size} | ack_flush_interval_ms: {ack_flush_interval_ms} | middleware_type: {middleware_type} | storage_durability_policy: {storage_durability_policy} | storage_fsync_interval_ms: {storage_fsync_interval_ms} | movies_store_type: {movies_store_type} | movie_ids_filter_exchange: {movie_ids_filter_exchange} | movie_ids_filter_false_positive_rate: {movie_ids_filter_false_positive_rate} | combiner_enabled: {combiner_enabled} | combiner_max_keys: {combiner_max_keys}")
 
-    movies_joiner = MoviesJoiner(input_queues, output_exchange, failure_probability, cluster_size, id, storage_path)
+    movies_joiner = MoviesJoiner(input_queues, output_exchange, failure_probability, cluster_size, id, storage_path, publish_batch_size, publish_flush_interval_ms, reliable_publishes, prefetch_count, ack_batch_size, ack_flush_interval_ms, middleware_type, storage_durability_policy, storage_fsync_interval_ms, movies_store_type, movie_ids_filter_exchange, movie_ids_filter_false_positive_rate, combiner_enabled, combiner_max_keys)
     movies_joiner.run()
 
 if __name__ == "__main__":
@@ -1,23 +1,44 @@
 import signal
 import logging
+import uuid
+import time
 from middleware.middleware import Middleware
+from middleware.async_middleware import AsyncMiddleware
 from messages.eof import EOF
 from messages.movie_rating import MovieRating
 from messages.movie_ratings_batch import MovieRatingsBatch
 from messages.movie_credit import MovieCredit
 from messages.movie_credits_batch import MovieCreditsBatch
+from messages.movie_ids_filter import MovieIdsFilter
+from messages.movie_rating_partial import MovieRatingPartial
+from messages.movie_rating_partials_batch import MovieRatingPartialsBatch
+from messages.actor_participation_partials_batch import ActorParticipationPartialsBatch
 from messages.packet_serde import PacketSerde
 from messages.packet_type import PacketType
 from common.monitorable import Monitorable
+from common.bloom_filter import BloomFilter
 from storage_adapter.storage_adapter import StorageAdapter
+from storage_adapter.wal_state import WalState, save_processed_message_id
 from common.failure_simulation import fail_with_probability
 
 MOVIES_FILE_KEY = "movies"
 ALL_MOVIES_RECEIVED_FILE_KEY = "all_movies_received"
-SHOULD_REENQUEUE_EOF_FILE_KEY = "should_reenqueue_eof"
+PENDING_PACKETS_FILE_KEY = "pending_packets"
+COMBINER_FILE_KEY = "combiner"
+COMBINED_MOVIE_RATINGS = "combined_movie_ratings"
+COMBINED_ACTORS_PARTICIPATION = "combined_actors_participation"
+PROCESSED_MESSAGE_IDS = "processed_message_ids"
+PENDING_FLUSH_PACKETS = "pending_flush_packets"
+
+COMBINE_DELTA = "combine"
+FLUSH_DELTA = "flush"
+FLUSH_SENT_DELTA = "flush_sent"
+
+ASYNC_MIDDLEWARE_TYPE = "async"
+MMAP_MOVIES_STORE_TYPE = "mmap"
 
 class MoviesJoiner(Monitorable):
-    def __init__(self, input_queues, output_exchange, failure_probability, cluster_size, id, storage_path):
+    def __init__(self, input_queues, output_exchange, failure_probability, cluster_size, id, storage_path, publish_batch_size, publish_flush_interval_ms, reliable_publishes, prefetch_count, ack_batch_size, ack_flush_interval_ms, middleware_type, storage_durability_policy, storage_fsync_interval_ms, movies_store_type, movie_ids_filter_exchange, movie_ids_filter_false_positive_rate, combiner_enabled, combiner_max_keys):
         self._input_queue_movies = input_queues[0]
         self._input_queue_to_join = input_queues[1]
         self._output_exchange = output_exchange
@@ -27,8 +48,26 @@ class MoviesJoiner(Monitorable):
         self._middleware = None
         self._movies = {}
         self._all_movies_received_of_clients = set()
-        self._should_reenqueue_eof_of_clients = set()
-        self._storage_adapter = StorageAdapter(storage_path)
+        # client_id -> message ids of the packets to join spilled until all the movies of the client are received
+        self._pending_packets_ids_of_clients = {}
+        # Clients whose pending packets were drained, whose pending packets files are deleted
+        # once the batches joined from them are published and the combiner state is saved
+        self._drained_clients = set()
+        self._storage_adapter = StorageAdapter(storage_path, durability_policy=storage_durability_policy, fsync_interval_ms=storage_fsync_interval_ms)
+        self._publish_batch_size = publish_batch_size
+        self._publish_flush_interval_ms = publish_flush_interval_ms
+        self._reliable_publishes = reliable_publishes
+        self._prefetch_count = prefetch_count
+        self._ack_batch_size = ack_batch_size
+        self._ack_flush_interval_ms = ack_flush_interval_ms
+        self._middleware_type = middleware_type
+        self._movies_store_type = movies_store_type
+        self._movie_ids_filter_exchange = movie_ids_filter_exchange
+        self._movie_ids_filter_false_positive_rate = movie_ids_filter_false_positive_rate
+        self._combiner_enabled = combiner_enabled
+        self._combiner_max_keys = combiner_max_keys
+        # client_id -> items joined and combined since the last flush, processed message ids and packets of the last flush not sent yet
+        self._combiner_state = WalState(self._storage_adapter, COMBINER_FILE_KEY, self.__apply_combiner_delta, self.__new_combiner_client_state)
         
         signal.signal(signal.SIGTERM, self.__handle_signal)
 
@@ -57,7 +96,10 @@ class MoviesJoiner(Monitorable):
         """
         Load persisted state from storage
         """
-        movies = self._storage_adapter.load_key_values(MOVIES_FILE_KEY)
+        if self._movies_store_type == MMAP_MOVIES_STORE_TYPE:
+            movies = self._storage_adapter.load_hash_indexes(MOVIES_FILE_KEY)
+        else:
+            movies = self._storage_adapter.load_key_values(MOVIES_FILE_KEY)
         if movies:
             self._movies = movies
             logging.debug(f"action: load_state_from_storage | result: success | movies: {self._movies}")
@@ -67,19 +109,53 @@ class MoviesJoiner(Monitorable):
             self._all_movies_received_of_clients = all_movies_received_of_clients
             logging.debug(f"action: load_state_from_storage | result: success | all_movies_received_of_clients: {self._all_movies_received_of_clients}")
             
-        should_reenqueue_eof_of_clients = self._storage_adapter.load_data(SHOULD_REENQUEUE_EOF_FILE_KEY)
-        if should_reenqueue_eof_of_clients:
-            self._should_reenqueue_eof_of_clients = should_reenqueue_eof_of_clients
-            logging.debug(f"action: load_state_from_storage | result: success | should_reenqueue_eof_of_clients: {self._should_reenqueue_eof_of_clients}")
+        pending_packets_of_clients = self._storage_adapter.load_key_values(PENDING_PACKETS_FILE_KEY)
+        if pending_packets_of_clients:
+            self._pending_packets_ids_of_clients = {client_id: set(pending_packets.keys()) for client_id, pending_packets in pending_packets_of_clients.items()}
+            logging.debug(f"action: load_state_from_storage | result: success | pending_packets_of_clients: {list(self._pending_packets_ids_of_clients.keys())}")
+            
+        if self._combiner_state.load():
+            logging.debug(f"action: load_state_from_storage | result: success | combiner_state: {self._combiner_state}")
     
     def __store_movies(self, movies_batch):
+        """
+        Store the movies of the batch not stored yet. With the mmap store the movies of
+        each client are kept in an on-disk hash index queried directly when joining,
+        otherwise they are kept in memory and appended to storage
+        """
         client_id = movies_batch.client_id
-        self._movies[client_id] = self._movies.get(client_id, {})
+        if client_id not in self._movies:
+            if self._movies_store_type == MMAP_MOVIES_STORE_TYPE:
+                self._movies[client_id] = self._storage_adapter.open_hash_index(MOVIES_FILE_KEY, secondary_file_key=client_id)
+            else:
+                self._movies[client_id] = {}
+        new_movies = {}
         for movie in movies_batch.get_items():
-            if movie.id not in self._movies[client_id]:
-                self._movies[client_id][movie.id] = movie.title
-                self._storage_adapter.append(MOVIES_FILE_KEY, movie.id, value=movie.title, secondary_file_key=client_id)
+            if movie.id not in self._movies[client_id] and movie.id not in new_movies:
+                new_movies[movie.id] = movie.title
+        if not new_movies:
+            return
+        if self._movies_store_type == MMAP_MOVIES_STORE_TYPE:
+            self._movies[client_id].put_many(new_movies.items())
+        else:
+            self._movies[client_id].update(new_movies)
+            self._storage_adapter.append_many(MOVIES_FILE_KEY, list(new_movies.items()), secondary_file_key=client_id)
             
+    def __publish_movie_ids_filter(self, client_id):
+        """
+        Publish a Bloom filter with the ids of the movies of the client, so the routers
+        drop the items that can not be joined instead of sending them to this joiner
+        """
+        if not self._movie_ids_filter_exchange:
+            return
+        movie_ids = list(self._movies[client_id].keys()) if client_id in self._movies else []
+        bloom_filter = BloomFilter.for_capacity(len(movie_ids), self._movie_ids_filter_false_positive_rate)
+        for movie_id in movie_ids:
+            bloom_filter.add(movie_id)
+        movie_ids_filter = MovieIdsFilter(client_id, self._input_queue_to_join[1], bloom_filter)
+        self._middleware.send_message(PacketSerde.serialize(movie_ids_filter), exchange=self._movie_ids_filter_exchange)
+        logging.info(f"action: movie_ids_filter_published | result: success | client_id: {client_id} | amount_movies: {len(movie_ids)}")
+    
     def __handle_client_disconnected(self, client_disconnected):
         logging.debug(f"action: client_disconnected | result: success | client_id: {client_disconnected.client_id}")
         self.__clean_client_state(client_disconnected.client_id)
@@ -96,6 +172,8 @@ class MoviesJoiner(Monitorable):
             if eof.client_id not in self._all_movies_received_of_clients:
                 self._all_movies_received_of_clients.add(eof.client_id)
                 self._storage_adapter.update(ALL_MOVIES_RECEIVED_FILE_KEY, self._all_movies_received_of_clients)
+                self.__publish_movie_ids_filter(eof.client_id)
+                self.__drain_pending_packets(eof.client_id)
         elif msg.packet_type() == PacketType.CLIENT_DISCONNECTED:
             client_disconnected = msg
             self.__handle_client_disconnected(client_disconnected)
@@ -103,11 +181,36 @@ class MoviesJoiner(Monitorable):
             logging.error(f"action: unexpected_packet_type | result: fail | packet_type: {msg.packet_type()}")
         fail_with_probability(self._failure_probability, f"after handling movies batch packet: {msg.packet_type()}")
 
-    def __reenqueue_batch_to_join(self, batch):
-        self._middleware.reenqueue_message(PacketSerde.serialize(batch), queue=self._input_queue_to_join[0])
-        if batch.client_id not in self._should_reenqueue_eof_of_clients:
-            self._should_reenqueue_eof_of_clients.add(batch.client_id)
-            self._storage_adapter.update(SHOULD_REENQUEUE_EOF_FILE_KEY, self._should_reenqueue_eof_of_clients)
+    def __spill_packet_to_join(self, msg):
+        """
+        Append a message that can not be handled until all the movies of its client are
+        received to the pending packets file of the client. Packets are keyed by their
+        message id, so a redelivered message is only spilled once
+        """
+        pending_packets_ids = self._pending_packets_ids_of_clients.setdefault(msg.client_id, set())
+        if msg.message_id in pending_packets_ids:
+            return
+        self._storage_adapter.append(PENDING_PACKETS_FILE_KEY, msg.message_id, PacketSerde.serialize(msg), secondary_file_key=msg.client_id)
+        pending_packets_ids.add(msg.message_id)
+
+    def __drain_pending_packets(self, client_id):
+        """
+        Handle the packets spilled for the client in the order they were received. The
+        pending packets file is only deleted when the state is saved, so if the process
+        crashes before that it is still there and it is drained again on restart,
+        producing batches with the same message ids
+        """
+        if client_id not in self._pending_packets_ids_of_clients:
+            return
+        pending_packets = self._storage_adapter.load_key_values(PENDING_PACKETS_FILE_KEY, secondary_file_key=client_id) or {}
+        logging.info(f"action: drain_pending_packets | result: in_progress | client_id: {client_id} | amount: {len(pending_packets)}")
+        del self._pending_packets_ids_of_clients[client_id]
+        for packet in pending_packets.values():
+            self.__handle_message_to_join(PacketSerde.deserialize(packet))
+        # The client state, with its pending packets file, is already cleaned if they had its last EOF
+        if client_id in self._all_movies_received_of_clients:
+            self._drained_clients.add(client_id)
+        logging.info(f"action: drain_pending_packets | result: success | client_id: {client_id}")
 
     def __join_batch(self, batch, get_movie_id, create_joined_item, joined_batch_class, log_action_prefix):
         """
@@ -122,7 +225,7 @@ class MoviesJoiner(Monitorable):
         """
         client_id = batch.client_id
         if client_id not in self._movies:
-            self.__reenqueue_batch_to_join(batch)
+            self.__spill_packet_to_join(batch)
             return
         
         joined_batch = joined_batch_class(client_id, [], message_id=batch.message_id)
@@ -136,13 +239,115 @@ class MoviesJoiner(Monitorable):
             else:
                 if client_id in self._all_movies_received_of_clients:
                     continue
-                self.__reenqueue_batch_to_join(batch)
+                self.__spill_packet_to_join(batch)
                 return
             
         if len(joined_batch.get_items()) > 0:
+            if self._combiner_enabled:
+                self.__combine(joined_batch)
+                return
             self._middleware.send_message(PacketSerde.serialize(joined_batch))
             logging.debug(f"action: {log_action_prefix}_joined | result: success | movie_{log_action_prefix}: {joined_batch}")
             
+    def __generate_deterministic_uuid(self, message_id, packet_type):
+        """
+        Generate a deterministic UUID based on the message ID, the joiner ID and the packet
+        type, as every joiner of the cluster may flush when handling the same EOF
+        """
+        return str(uuid.uuid5(uuid.UUID(message_id), f"movies_joiner_{self._id}_{packet_type}"))
+    
+    def __new_combiner_client_state(self):
+        return {COMBINED_MOVIE_RATINGS: {}, COMBINED_ACTORS_PARTICIPATION: {}, PROCESSED_MESSAGE_IDS: {}, PENDING_FLUSH_PACKETS: []}
+    
+    def __apply_combiner_delta(self, client_state, delta):
+        delta_type, message_id, processed_time, data = delta
+        if delta_type == COMBINE_DELTA:
+            movie_ratings, actors_participation = data
+            for movie_id, (title, delta_sum_ratings, delta_amount_ratings) in movie_ratings.items():
+                title, sum_ratings, amount_ratings = client_state[COMBINED_MOVIE_RATINGS].get(movie_id, (title, 0, 0))
+                client_state[COMBINED_MOVIE_RATINGS][movie_id] = (title, sum_ratings + delta_sum_ratings, amount_ratings + delta_amount_ratings)
+            for actor, participation in actors_participation.items():
+                client_state[COMBINED_ACTORS_PARTICIPATION][actor] = client_state[COMBINED_ACTORS_PARTICIPATION].get(actor, 0) + participation
+            save_processed_message_id(client_state[PROCESSED_MESSAGE_IDS], message_id, processed_time)
+        elif delta_type == FLUSH_DELTA:
+            client_state[COMBINED_MOVIE_RATINGS] = {}
+            client_state[COMBINED_ACTORS_PARTICIPATION] = {}
+            client_state[PENDING_FLUSH_PACKETS] = data
+        elif delta_type == FLUSH_SENT_DELTA:
+            client_state[PENDING_FLUSH_PACKETS] = []
+    
+    def __save_state(self):
+        """
+        Save the combiner state and delete the pending packets files of the clients
+        drained since the last save. It is called by the middleware after publishing the
+        batches handled since the last ack and right before acking them
+        """
+        self._combiner_state.save()
+        for client_id in self._drained_clients:
+            self._storage_adapter.delete(PENDING_PACKETS_FILE_KEY, secondary_file_key=client_id)
+        self._drained_clients.clear()
+    
+    def __combine(self, joined_batch):
+        """
+        Pre-aggregate the items of a joined batch into the combiner state of its client
+        instead of sending them: the sum and amount of the ratings of every movie, or
+        the participations of every actor. Batches are deduplicated by message id, since
+        a redelivered batch can not be told apart once it was flushed
+        """
+        client_id = joined_batch.client_id
+        client_state = self._combiner_state.client_state(client_id)
+        if joined_batch.message_id in client_state[PROCESSED_MESSAGE_IDS]:
+            return
+        movie_ratings = {}
+        actors_participation = {}
+        if joined_batch.packet_type() == PacketType.MOVIE_RATINGS_BATCH:
+            for movie_rating in joined_batch.get_items():
+                title, sum_ratings, amount_ratings = movie_ratings.get(movie_rating.id, (movie_rating.title, 0, 0))
+                movie_ratings[movie_rating.id] = (title, sum_ratings + movie_rating.rating, amount_ratings + 1)
+        else:
+            for movie_credit in joined_batch.get_items():
+                for actor in movie_credit.cast:
+                    actors_participation[actor] = actors_participation.get(actor, 0) + 1
+        self._combiner_state.add_delta(client_id, (COMBINE_DELTA, joined_batch.message_id, time.time_ns(), (movie_ratings, actors_participation)))
+        if len(client_state[COMBINED_MOVIE_RATINGS]) + len(client_state[COMBINED_ACTORS_PARTICIPATION]) >= self._combiner_max_keys:
+            self.__flush_combined(client_id, joined_batch.message_id)
+    
+    def __flush_combined(self, client_id, message_id):
+        """
+        Send the items combined for the client as partial aggregates, with message ids
+        derived from the message that triggered the flush. The flush is appended to the
+        write-ahead log before sending them, so if the process crashes before they are
+        sent they are sent again on restart
+        """
+        if client_id not in self._combiner_state:
+            return
+        client_state = self._combiner_state[client_id]
+        if not (client_state[COMBINED_MOVIE_RATINGS] or client_state[COMBINED_ACTORS_PARTICIPATION]):
+            return
+        packets = []
+        if client_state[COMBINED_MOVIE_RATINGS]:
+            movie_rating_partials = [MovieRatingPartial(movie_id, title, sum_ratings, amount_ratings) for movie_id, (title, sum_ratings, amount_ratings) in client_state[COMBINED_MOVIE_RATINGS].items()]
+            new_message_id = self.__generate_deterministic_uuid(message_id, PacketType.MOVIE_RATING_PARTIALS_BATCH)
+            packets.append(PacketSerde.serialize(MovieRatingPartialsBatch(client_id, movie_rating_partials, message_id=new_message_id)))
+        if client_state[COMBINED_ACTORS_PARTICIPATION]:
+            new_message_id = self.__generate_deterministic_uuid(message_id, PacketType.ACTOR_PARTICIPATION_PARTIALS_BATCH)
+            packets.append(PacketSerde.serialize(ActorParticipationPartialsBatch(client_id, list(client_state[COMBINED_ACTORS_PARTICIPATION].items()), message_id=new_message_id)))
+        # The flush is saved right away, after the combine deltas it clears
+        self._combiner_state.add_delta(client_id, (FLUSH_DELTA, message_id, time.time_ns(), packets))
+        self._combiner_state.save()
+        self.__send_pending_flush_packets(client_id)
+    
+    def __send_pending_flush_packets(self, client_id):
+        client_state = self._combiner_state[client_id]
+        if not client_state[PENDING_FLUSH_PACKETS]:
+            return
+        for packet in client_state[PENDING_FLUSH_PACKETS]:
+            self._middleware.send_message(packet)
+        # They are only marked as sent once they are published
+        self._middleware.flush()
+        logging.debug(f"action: combined_partials_sent | result: success | client_id: {client_id} | amount_batches: {len(client_state[PENDING_FLUSH_PACKETS])}")
+        self._combiner_state.add_delta(client_id, (FLUSH_SENT_DELTA, None, time.time_ns(), None))
+    
     def __join_ratings(self, ratings_batch):
         self.__join_batch(
             batch=ratings_batch,
@@ -162,23 +367,32 @@ class MoviesJoiner(Monitorable):
         )
         
     def __clean_client_state(self, client_id):
+        # The partial aggregates and the EOF sent before must be published before their
+        # write-ahead log is deleted
+        self._middleware.flush()
         if client_id in self._all_movies_received_of_clients:
             self._all_movies_received_of_clients.remove(client_id)
             self._storage_adapter.update(ALL_MOVIES_RECEIVED_FILE_KEY, self._all_movies_received_of_clients)
         if client_id in self._movies:
-            self._movies.pop(client_id)
-            self._storage_adapter.delete(MOVIES_FILE_KEY, secondary_file_key=client_id)
-        if client_id in self._should_reenqueue_eof_of_clients:
-            self._should_reenqueue_eof_of_clients.remove(client_id)
-            self._storage_adapter.update(SHOULD_REENQUEUE_EOF_FILE_KEY, self._should_reenqueue_eof_of_clients)
+            movies = self._movies.pop(client_id)
+            if self._movies_store_type == MMAP_MOVIES_STORE_TYPE:
+                movies.delete()
+            else:
+                self._storage_adapter.delete(MOVIES_FILE_KEY, secondary_file_key=client_id)
+        if client_id in self._pending_packets_ids_of_clients or client_id in self._drained_clients:
+            self._pending_packets_ids_of_clients.pop(client_id, None)
+            self._drained_clients.discard(client_id)
+            self._storage_adapter.delete(PENDING_PACKETS_FILE_KEY, secondary_file_key=client_id)
+        self._combiner_state.delete(client_id)
         
     def __handle_eof(self, eof):
         client_id = eof.client_id
-        if client_id in self._should_reenqueue_eof_of_clients:
-            self._middleware.reenqueue_message(PacketSerde.serialize(eof), queue=self._input_queue_to_join[0])
-            self._should_reenqueue_eof_of_clients.remove(client_id)
-            self._storage_adapter.update(SHOULD_REENQUEUE_EOF_FILE_KEY, self._should_reenqueue_eof_of_clients)
+        if client_id in self._pending_packets_ids_of_clients:
+            # The EOF is handled after the batches spilled before it
+            self.__spill_packet_to_join(eof)
             return
+        # Every batch of the client sent to this joiner was received before any of its EOFs
+        self.__flush_combined(client_id, eof.message_id)
         
         eof.add_seen_id(self._id)
         if len(eof.seen_ids) == self._cluster_size:
@@ -193,6 +407,10 @@ class MoviesJoiner(Monitorable):
     def __handle_batch_packet_to_join(self, packet):
         fail_with_probability(self._failure_probability, "before handling batch packet to join")
         msg = PacketSerde.deserialize(packet)
+        self.__handle_message_to_join(msg)
+        fail_with_probability(self._failure_probability, f"after handling batch packet to join: {msg.packet_type()}")
+
+    def __handle_message_to_join(self, msg):
         if msg.packet_type() == PacketType.RATINGS_BATCH:
             ratings_batch = msg
             self.__join_ratings(ratings_batch)
@@ -207,7 +425,6 @@ class MoviesJoiner(Monitorable):
             self.__handle_client_disconnected(client_disconnected)
         else:
             logging.error(f"action: unexpected_packet_type | result: fail | packet_type: {msg.packet_type()}")
-        fail_with_probability(self._failure_probability, f"after handling batch packet to join: {msg.packet_type()}")
 
     def run(self):
         self.start_receiving_health_checks()
@@ -216,7 +433,29 @@ class MoviesJoiner(Monitorable):
             (self._input_queue_movies[0], self._input_queue_movies[1], self.__handle_movies_batch_packet),
             (self._input_queue_to_join[0], self._input_queue_to_join[1], self.__handle_batch_packet_to_join)
             ]
-        self._middleware = Middleware(input_queues_and_callback_functions=input_queues_and_callback_functions,
-                                      output_exchange=self._output_exchange,
-                                     )
+        middleware_class = AsyncMiddleware if self._middleware_type == ASYNC_MIDDLEWARE_TYPE else Middleware
+        self._middleware = middleware_class(input_queues_and_callback_functions=input_queues_and_callback_functions,
+                                            output_exchange=self._output_exchange,
+                                            publish_batch_size=self._publish_batch_size,
+                                            publish_flush_interval_ms=self._publish_flush_interval_ms,
+                                            reliable_publishes=self._reliable_publishes,
+                                            prefetch_count=self._prefetch_count,
+                                            ack_batch_size=self._ack_batch_size,
+                                            ack_flush_interval_ms=self._ack_flush_interval_ms,
+                                            before_ack_function=self.__save_state,
+                                           )
+        # Filters are published again after a restart, in case they were lost, and the
+        # pending packets of the clients whose movies were all received are drained
+        for client_id in list(self._all_movies_received_of_clients):
+            self.__publish_movie_ids_filter(client_id)
+            self.__drain_pending_packets(client_id)
+        # Partial aggregates flushed right before a crash may have not been sent
+        for client_id in self._combiner_state:
+            self.__send_pending_flush_packets(client_id)
+        self._middleware.flush()
+        self.__save_state()
         self._middleware.handle_messages()
+        if self._movies_store_type == MMAP_MOVIES_STORE_TYPE:
+            for movies in self._movies.values():
+                movies.close()
+        self._storage_adapter.close()
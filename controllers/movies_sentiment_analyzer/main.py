@@ -30,6 +30,14 @@ def initialize_config():
         config_params["failure_probability"] = float(os.getenv('FAILURE_PROBABILITY')) 
         config_params["cluster_size"] = int(os.getenv('CLUSTER_SIZE'))
         config_params["id"] = os.getenv('ID')
+        config_params["prefetch_count"] = int(os.getenv('PREFETCH_COUNT', config["DEFAULT"]["PREFETCH_COUNT"]))
+        config_params["ack_batch_size"] = int(os.getenv('ACK_BATCH_SIZE', config["DEFAULT"]["ACK_BATCH_SIZE"]))
+        config_params["ack_flush_interval_ms"] = int(os.getenv('ACK_FLUSH_INTERVAL_MS', config["DEFAULT"]["ACK_FLUSH_INTERVAL_MS"]))
+        config_params["processes_amount"] = int(os.getenv('PROCESSES_AMOUNT', config["DEFAULT"]["PROCESSES_AMOUNT"]))
+        config_params["chunk_size"] = int(os.getenv('CHUNK_SIZE', config["DEFAULT"]["CHUNK_SIZE"]))
+        config_params["storage_path"] = os.getenv('STORAGE_PATH')
+        config_params["sentiment_cache_capacity"] = int(os.getenv('SENTIMENT_CACHE_CAPACITY', config["DEFAULT"]["SENTIMENT_CACHE_CAPACITY"]))
+        config_params["scorer_type"] = os.getenv('SCORER_TYPE', config["DEFAULT"]["SCORER_TYPE"])
     except KeyError as e:
         raise KeyError("Key was not found. Error: {} .Aborting server".format(e))
     except ValueError as e:
@@ -59,14 +67,22 @@ def main():
     failure_probability = config_params["failure_probability"]
     cluster_size = config_params["cluster_size"]
     id = config_params["id"]
+    prefetch_count = config_params["prefetch_count"]
+    ack_batch_size = config_params["ack_batch_size"]
+    ack_flush_interval_ms = config_params["ack_flush_interval_ms"]
+    processes_amount = config_params["processes_amount"]
+    chunk_size = config_params["chunk_size"]
+    storage_path = config_params["storage_path"]
+    sentiment_cache_capacity = config_params["sentiment_cache_capacity"]
+    scorer_type = config_params["scorer_type"]
     
     initialize_log(logging_level)
 
     # Log config parameters at the beginning of the program to verify the configuration
     # of the component
-    logging.debug(f"action: config | result: success | logging_level: {logging_level} | field_to_analyze: {field_to_analyze} | input_queues: {input_queues} | output_exchange: {output_exchange} | failure_probability: {failure_probability} | cluster_size: {cluster_size} | id: {id}")
+    logging.debug(f"action: config | result: success | logging_level: {logging_level} | field_to_analyze: {field_to_analyze} | input_queues: {input_queues} | output_exchange: {output_exchange} | failure_probability: {failure_probability} | cluster_size: {cluster_size} | id: {id} | prefetch_count: {prefetch_count} | ack_batch_size: {ack_batch_size} | ack_flush_interval_ms: {ack_flush_interval_ms} | processes_amount: {processes_amount} | chunk_size: {chunk_size} | storage_path: {storage_path} | sentiment_cache_capacity: {sentiment_cache_capacity} | scorer_type: {scorer_type}")
 
-    movies_sentiment_analyzer = MoviesSentimentAnalyzer(field_to_analyze, input_queues, output_exchange, failure_probability, cluster_size, id)
+    movies_sentiment_analyzer = MoviesSentimentAnalyzer(field_to_analyze, input_queues, output_exchange, failure_probability, cluster_size, id, prefetch_count, ack_batch_size, ack_flush_interval_ms, processes_amount, chunk_size, storage_path, sentiment_cache_capacity, scorer_type)
     movies_sentiment_analyzer.run()
 
 if __name__ == "__main__":
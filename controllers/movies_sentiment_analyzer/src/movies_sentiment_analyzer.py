@@ -1,6 +1,7 @@
 import signal
 import logging
-from textblob import TextBlob
+import multiprocessing as mp
+import numpy as np
 from middleware.middleware import Middleware
 from messages.eof import EOF
 from messages.packet_serde import PacketSerde
@@ -8,13 +9,33 @@ from messages.packet_type import PacketType
 from messages.analyzed_movie import Sentiment, AnalyzedMovie
 from messages.analyzed_movies_batch import AnalyzedMoviesBatch
 from common.monitorable import Monitorable
+from storage_adapter.storage_adapter import StorageAdapter
 from common.failure_simulation import fail_with_probability
+from src.sentiment_cache import SentimentCache
+from src.scorers import create_scorer
 
 ANALYSIS_TYPE = "sentiment-analysis"
 OVERVIEW_FIELD = 'overview'
 
+# Scorer of every process of the pool
+pool_process_scorer = None
+
+def initialize_pool_process(scorer_type):
+    global pool_process_scorer
+    # The processes of the pool are forked from the analyzer, so they inherit its
+    # SIGTERM handler, which must only run in the analyzer
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    pool_process_scorer = create_scorer(scorer_type)
+
+def score_texts(texts):
+    """
+    Score the polarity of a chunk of texts in a process of the pool. It is defined at
+    module level so the processes of the pool can run it
+    """
+    return pool_process_scorer.score_many(texts)
+
 class MoviesSentimentAnalyzer(Monitorable):
-    def __init__(self, field_to_analyze, input_queues, output_exchange, failure_probability, cluster_size, id):
+    def __init__(self, field_to_analyze, input_queues, output_exchange, failure_probability, cluster_size, id, prefetch_count, ack_batch_size, ack_flush_interval_ms, processes_amount, chunk_size, storage_path, sentiment_cache_capacity, scorer_type):
         self._field_to_analyze = field_to_analyze
         self._input_queues = input_queues
         self._output_exchange = output_exchange
@@ -23,6 +44,17 @@ class MoviesSentimentAnalyzer(Monitorable):
         self._id = id
         self._analyzer = None
         self._middleware = None
+        self._prefetch_count = prefetch_count
+        self._ack_batch_size = ack_batch_size
+        self._ack_flush_interval_ms = ack_flush_interval_ms
+        self._processes_amount = processes_amount
+        self._chunk_size = chunk_size
+        self._pool = None
+        self._storage_path = storage_path
+        self._sentiment_cache_capacity = sentiment_cache_capacity
+        self._sentiment_cache = None
+        self._scorer_type = scorer_type
+        self._scorer = create_scorer(scorer_type)
         
         signal.signal(signal.SIGTERM, self.__handle_signal)
 
@@ -42,15 +74,38 @@ class MoviesSentimentAnalyzer(Monitorable):
         self.stop_receiving_health_checks()
     
     def __analyze_movies(self, movies_batch):
+        """
+        Analyze the sentiment of the movies of the batch. Texts whose polarity is cached
+        are not scored again. With a pool, the texts are scored by its processes in
+        chunks of chunk_size texts, and the results are collected in the order of the movies
+        """
         analyzed_movies = []
         if self._field_to_analyze == OVERVIEW_FIELD:
             get_text = lambda movie: movie.overview
         else:
             raise ValueError(f"Unknown field to analyze: {self._field_to_analyze}")
         
-        for movie in movies_batch.get_items():
-            text = get_text(movie)
-            polarity = TextBlob(text).sentiment.polarity
+        movies = movies_batch.get_items()
+        texts = [get_text(movie) for movie in movies]
+        polarities = [None] * len(texts)
+        texts_hashes = None
+        if self._sentiment_cache:
+            texts_hashes = [self._sentiment_cache.hash_text(text) for text in texts]
+            polarities = [self._sentiment_cache.get(text_hash) for text_hash in texts_hashes]
+        
+        missing_indexes = [i for i, polarity in enumerate(polarities) if polarity is None]
+        missing_texts = [texts[i] for i in missing_indexes]
+        if self._pool and len(missing_texts) > self._chunk_size:
+            chunks = [missing_texts[i:i+self._chunk_size] for i in range(0, len(missing_texts), self._chunk_size)]
+            missing_polarities = np.concatenate(self._pool.map(score_texts, chunks))
+        else:
+            missing_polarities = self._scorer.score_many(missing_texts)
+        for i, polarity in zip(missing_indexes, missing_polarities.tolist()):
+            polarities[i] = polarity
+            if self._sentiment_cache:
+                self._sentiment_cache.put(texts_hashes[i], polarity)
+        
+        for movie, polarity in zip(movies, polarities):
             sentiment = Sentiment.from_polarity(polarity)
             analyzed_movie = AnalyzedMovie(movie.revenue, movie.budget, sentiment)
             analyzed_movies.append(analyzed_movie)
@@ -63,6 +118,14 @@ class MoviesSentimentAnalyzer(Monitorable):
         self._middleware.send_message(PacketSerde.serialize(analyzed_movies_batch))
         logging.debug(f"action: movies_batch_analyzed | result: success | analyzed_movies_batch: {analyzed_movies_batch}")
     
+    def __save_sentiment_cache(self):
+        """
+        Persist the polarities cached since the last save. It is called by the middleware
+        right before acking
+        """
+        if self._sentiment_cache:
+            self._sentiment_cache.save()
+    
     def __handle_packet(self, packet):
         fail_with_probability(self._failure_probability, "before sending message")
         msg = PacketSerde.deserialize(packet)
@@ -87,8 +150,23 @@ class MoviesSentimentAnalyzer(Monitorable):
 
     def run(self):
         self.start_receiving_health_checks()
+        if self._processes_amount > 1:
+            # The pool is created before connecting to the middleware so its processes
+            # do not inherit the connection
+            self._pool = mp.Pool(processes=self._processes_amount, initializer=initialize_pool_process, initargs=(self._scorer_type,))
+        if self._sentiment_cache_capacity > 0:
+            # Polarities are cached by scorer, as every scorer may give a different one
+            self._sentiment_cache = SentimentCache(self._sentiment_cache_capacity, StorageAdapter(self._storage_path), f"{self._field_to_analyze}_{self._scorer_type}")
+            self._sentiment_cache.load()
         input_queues_and_callback_functions = [(input_queue[0], input_queue[1], self.__handle_packet) for input_queue in self._input_queues]
         self._middleware = Middleware(input_queues_and_callback_functions=input_queues_and_callback_functions,
                                       output_exchange=self._output_exchange,
+                                      prefetch_count=self._prefetch_count,
+                                      ack_batch_size=self._ack_batch_size,
+                                      ack_flush_interval_ms=self._ack_flush_interval_ms,
+                                      before_ack_function=self.__save_sentiment_cache,
                                      )
         self._middleware.handle_messages()
+        if self._pool:
+            self._pool.close()
+            self._pool.join()
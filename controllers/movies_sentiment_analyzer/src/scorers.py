@@ -0,0 +1,117 @@
+import re
+import string
+from itertools import chain, repeat
+import numpy as np
+from textblob import TextBlob
+from textblob.en import sentiment as textblob_lexicon
+
+TEXTBLOB_SCORER_TYPE = "textblob"
+LEXICON_SCORER_TYPE = "lexicon"
+
+TOKEN_REGEX = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)*|!")
+EXCLAMATION_MARK = "!"
+# TextBlob splits contractions like "isn't" into "is n ' t", so they are not negations
+NEGATIONS = ("no", "not", "never")
+MODIFIER_POS_TAG = 'RB'
+NEGATED_POLARITY_FACTOR = -0.5
+EXCLAMATION_MARK_POLARITY_FACTOR = 1.25
+# A negation still applies across words of at most this length ("not a good")
+MAX_SKIPPED_WORD_LENGTH = 1
+
+class TextBlobScorer:
+    """
+    Scores every text with the pattern analyzer of TextBlob
+    """
+    def __repr__(self):
+        return "TextBlobScorer()"
+
+    def score_many(self, texts):
+        return np.array([TextBlob(text).sentiment.polarity for text in texts], dtype=np.float64)
+
+class LexiconScorer:
+    """
+    Vectorized approximation of the pattern analyzer of TextBlob, built on its same
+    lexicon. The tokens of all the texts of a batch are looked up at once in tables
+    with the polarity and intensity of every word, and the polarity of a text is the
+    average polarity of its known words, where a word preceded by a known adverb is
+    multiplied by the intensity of the adverb, or divided by it if the adverb is
+    negated, and the adverb is not counted on its own, every exclamation mark
+    multiplies the last known word before it by 1.25, and a word preceded by a
+    negation counts as -0.5 times its polarity. Unlike TextBlob, adverbs and negations
+    only apply to the word right after them, or after a one letter word for negations,
+    and emoticons are not taken into account, so the magnitude of the polarity of a
+    text using them may differ from the one of TextBlob
+    """
+    def __init__(self):
+        lexicon_words = list(textblob_lexicon.keys())
+        # Negations, exclamation marks and one letter words are in the vocabulary to look
+        # them up in the same tables, even if they are not in the lexicon
+        other_words = [word for word in NEGATIONS + (EXCLAMATION_MARK,) + tuple(string.ascii_lowercase + string.digits) if word not in textblob_lexicon]
+        words = lexicon_words + other_words
+        self._words_indexes = {word: i for i, word in enumerate(words)}
+        # The last row of every table is for the words out of the vocabulary
+        self._polarities = np.array([textblob_lexicon[word][None][0] for word in lexicon_words] + [0.0] * (len(other_words) + 1), dtype=np.float64)
+        self._intensities = np.array([textblob_lexicon[word][None][2] for word in lexicon_words] + [1.0] * (len(other_words) + 1), dtype=np.float64)
+        self._known = np.array([True] * len(lexicon_words) + [False] * (len(other_words) + 1))
+        self._modifiers = np.array([MODIFIER_POS_TAG in textblob_lexicon[word] for word in lexicon_words] + [False] * (len(other_words) + 1))
+        self._negations = np.array([word in NEGATIONS for word in words] + [False])
+        self._exclamation_marks = np.array([word == EXCLAMATION_MARK for word in words] + [False])
+        self._short_words = np.array([len(word) <= MAX_SKIPPED_WORD_LENGTH for word in words] + [False])
+
+    def __repr__(self):
+        return f"LexiconScorer(amount_words={len(self._words_indexes)})"
+
+    def score_many(self, texts):
+        texts_tokens = [TOKEN_REGEX.findall(text.lower()) for text in texts]
+        texts_amount_tokens = [len(text_tokens) for text_tokens in texts_tokens]
+        amount_tokens = sum(texts_amount_tokens)
+        if not amount_tokens:
+            return np.zeros(len(texts), dtype=np.float64)
+        texts_indexes = np.repeat(np.arange(len(texts)), texts_amount_tokens)
+        out_of_vocabulary_index = len(self._words_indexes)
+        tokens_indexes = np.fromiter(map(self._words_indexes.get, chain.from_iterable(texts_tokens), repeat(out_of_vocabulary_index)), dtype=np.intp, count=amount_tokens)
+
+        polarities = self._polarities[tokens_indexes]
+        known = self._known[tokens_indexes]
+        same_text_as_previous = np.zeros(amount_tokens, dtype=bool)
+        same_text_as_previous[1:] = texts_indexes[1:] == texts_indexes[:-1]
+
+        is_negation = self._negations[tokens_indexes]
+        is_short = self._short_words[tokens_indexes]
+        negated = np.zeros(amount_tokens, dtype=bool)
+        negated[1:] = is_negation[:-1] & same_text_as_previous[1:]
+        negated[2:] |= is_negation[:-2] & is_short[1:-1] & same_text_as_previous[1:-1] & same_text_as_previous[2:]
+
+        # A known word preceded by a known adverb is merged with it. A negated adverb
+        # divides the word by its intensity instead ("not very good" is weaker than "not good")
+        modified = np.zeros(amount_tokens, dtype=bool)
+        modified[1:] = self._modifiers[tokens_indexes[:-1]] & known[1:] & same_text_as_previous[1:]
+        modifiers_positions = np.flatnonzero(modified) - 1
+        intensities = self._intensities[tokens_indexes[modifiers_positions]]
+        intensities = np.where(negated[modifiers_positions], 1.0 / intensities, intensities)
+        polarities[modified] = np.clip(polarities[modified] * intensities, -1.0, 1.0)
+        counted = known.copy()
+        counted[:-1] &= ~modified[1:]
+
+        exclamation_marks_positions = np.flatnonzero(self._exclamation_marks[tokens_indexes])
+        if len(exclamation_marks_positions):
+            last_counted_positions = np.maximum.accumulate(np.where(counted, np.arange(amount_tokens), -1))[exclamation_marks_positions]
+            boosted = (last_counted_positions >= 0) & (texts_indexes[np.maximum(last_counted_positions, 0)] == texts_indexes[exclamation_marks_positions])
+            factors = np.ones(amount_tokens)
+            np.multiply.at(factors, last_counted_positions[boosted], EXCLAMATION_MARK_POLARITY_FACTOR)
+            polarities = np.clip(polarities * factors, -1.0, 1.0)
+
+        # The negation of an adverb applies to the word merged with it ("not very good")
+        negated[1:] |= modified[1:] & negated[:-1]
+        polarities[negated] *= NEGATED_POLARITY_FACTOR
+
+        sum_polarities = np.bincount(texts_indexes[counted], weights=polarities[counted], minlength=len(texts))
+        amount_polarities = np.bincount(texts_indexes[counted], minlength=len(texts))
+        return sum_polarities / np.maximum(amount_polarities, 1)
+
+def create_scorer(scorer_type):
+    if scorer_type == TEXTBLOB_SCORER_TYPE:
+        return TextBlobScorer()
+    elif scorer_type == LEXICON_SCORER_TYPE:
+        return LexiconScorer()
+    raise ValueError(f"Unknown scorer type: {scorer_type}")
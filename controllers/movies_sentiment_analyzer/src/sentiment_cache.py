@@ -0,0 +1,76 @@
+import hashlib
+import logging
+from collections import OrderedDict
+
+SENTIMENT_CACHE_FILE_KEY = "sentiment_cache"
+HASH_DIGEST_SIZE = 8
+
+class SentimentCache:
+    """
+    LRU cache of the polarity of texts, keyed by a hash of the text so the memory used
+    does not depend on the length of the texts. The entries added are appended to a
+    write-ahead log of the storage adapter, which is compacted into a snapshot of the
+    entries from the least to the most recently used, so the cache survives restarts.
+    The order in which the entries were used since the last snapshot is not persisted
+    """
+    def __init__(self, capacity, storage_adapter, secondary_file_key):
+        self._capacity = capacity
+        self._storage_adapter = storage_adapter
+        self._secondary_file_key = secondary_file_key
+        # text hash -> polarity, from the least to the most recently used
+        self._polarities = OrderedDict()
+        self._unsaved_polarities = {}
+
+    def __repr__(self):
+        return f"SentimentCache(capacity={self._capacity}, amount_entries={len(self._polarities)})"
+
+    def __apply_delta(self, polarities, delta):
+        """
+        Add entries as the most recently used ones, evicting the least recently used
+        entries over capacity. Snapshots are loaded as plain dicts, which keep the order
+        they were saved in, so it only relies on the insertion order of the entries
+        """
+        for text_hash, polarity in delta.items():
+            polarities.pop(text_hash, None)
+            polarities[text_hash] = polarity
+        while len(polarities) > self._capacity:
+            del polarities[next(iter(polarities))]
+
+    def load(self):
+        """
+        Load the entries persisted by a previous run
+        """
+        polarities = self._storage_adapter.load_wal(SENTIMENT_CACHE_FILE_KEY, self.__apply_delta, OrderedDict)
+        if polarities and self._secondary_file_key in polarities:
+            self._polarities = OrderedDict(polarities[self._secondary_file_key])
+            # The capacity may have been reduced since the entries were saved
+            self.__apply_delta(self._polarities, {})
+            logging.info(f"action: load_sentiment_cache | result: success | amount_entries: {len(self._polarities)}")
+
+    def hash_text(self, text):
+        return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=HASH_DIGEST_SIZE).digest(), 'big', signed=True)
+
+    def get(self, text_hash):
+        """
+        Return the polarity of the text with the hash, or None if it is not cached
+        """
+        polarity = self._polarities.get(text_hash)
+        if polarity is not None:
+            self._polarities.move_to_end(text_hash)
+        return polarity
+
+    def put(self, text_hash, polarity):
+        self._unsaved_polarities[text_hash] = polarity
+        self.__apply_delta(self._polarities, {text_hash: polarity})
+
+    def save(self):
+        """
+        Append the entries added since the last save to the write-ahead log, compacting it
+        into a snapshot when it grew too much
+        """
+        if not self._unsaved_polarities:
+            return
+        should_compact = self._storage_adapter.append_to_wal(SENTIMENT_CACHE_FILE_KEY, self._unsaved_polarities, secondary_file_key=self._secondary_file_key)
+        self._unsaved_polarities = {}
+        if should_compact:
+            self._storage_adapter.compact_wal(SENTIMENT_CACHE_FILE_KEY, dict(self._polarities), secondary_file_key=self._secondary_file_key)
@@ -0,0 +1,73 @@
+import importlib.util
+import os
+import sys
+import unittest
+
+CONTROLLER_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(CONTROLLER_PATH)))
+sys.path.insert(0, CONTROLLER_PATH)
+
+TEXTBLOB_INSTALLED = importlib.util.find_spec("textblob") is not None
+if TEXTBLOB_INSTALLED:
+    from src.scorers import LexiconScorer, TextBlobScorer
+
+OVERVIEWS = [
+    "He is not very happy",
+    "A wonderful, heartwarming story about a family that never gives up.",
+    "A terrible, boring film.",
+    "Not bad at all",
+    "Not a good idea",
+    "The plot was never interesting",
+    "An awful mess with a great cast",
+    "It is not the worst",
+    "A really funny comedy!",
+    "A brutal and violent war drama!!",
+    "The movie is not very good, but the actors are really good.",
+    "An ordinary man discovers an extraordinary secret.",
+    "A young woman falls in love with a mysterious stranger in Paris.",
+    "Two friends on a desperate road trip across a dangerous country.",
+    "A lonely robot finds a beautiful plant on an abandoned Earth.",
+    "The evil queen tries to kill the innocent princess.",
+    "A hilarious, absolutely brilliant and unforgettable adventure",
+    "No hope is left for the sad little town.",
+    "Nothing happens.",
+    "",
+    "Toy Story",
+    "A documentary about the history of jazz in New Orleans during the 1920s.",
+    "An extremely dull and slightly confusing sequel that is not really scary.",
+    "She is not a bad person, just a very unlucky one.",
+]
+
+def sign(polarity):
+    return 0 if abs(polarity) < 1e-9 else (1 if polarity > 0 else -1)
+
+@unittest.skipUnless(TEXTBLOB_INSTALLED, "textblob is not installed")
+class TestLexiconScorer(unittest.TestCase):
+    def test_sign_agrees_with_textblob(self):
+        lexicon_polarities = LexiconScorer().score_many(OVERVIEWS)
+        textblob_polarities = TextBlobScorer().score_many(OVERVIEWS)
+        for overview, lexicon_polarity, textblob_polarity in zip(OVERVIEWS, lexicon_polarities, textblob_polarities):
+            with self.subTest(overview=overview):
+                self.assertEqual(sign(lexicon_polarity), sign(textblob_polarity))
+
+    def test_negated_adverb_weakens_word(self):
+        texts = ["He is not very happy", "He is not happy", "not very good!"]
+        lexicon_polarities = LexiconScorer().score_many(texts)
+        textblob_polarities = TextBlobScorer().score_many(texts)
+        for text, lexicon_polarity, textblob_polarity in zip(texts, lexicon_polarities, textblob_polarities):
+            with self.subTest(text=text):
+                self.assertAlmostEqual(lexicon_polarity, textblob_polarity)
+        self.assertGreater(lexicon_polarities[0], lexicon_polarities[1])
+
+    def test_batch_scores_match_texts_scored_alone(self):
+        scorer = LexiconScorer()
+        polarities = scorer.score_many(OVERVIEWS)
+        for overview, polarity in zip(OVERVIEWS, polarities):
+            with self.subTest(overview=overview):
+                self.assertAlmostEqual(scorer.score_many([overview])[0], polarity)
+
+    def test_no_texts(self):
+        self.assertEqual(len(LexiconScorer().score_many([])), 0)
+
+if __name__ == "__main__":
+    unittest.main()
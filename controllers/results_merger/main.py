@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+from configparser import ConfigParser
+from src.results_merger import ResultsMerger
+import logging
+import os
+import ast
+
+def initialize_config():
+    """ Parse env variables or config file to find program config params
+
+    Function that search and parse program configuration parameters in the
+    program environment variables first and the in a config file. 
+    If at least one of the config parameters is not found a KeyError exception 
+    is thrown. If a parameter could not be parsed, a ValueError is thrown. 
+    If parsing succeeded, the function returns a ConfigParser object 
+    with config parameters
+    """
+
+    config = ConfigParser(os.environ)
+    # If config.ini does not exists original config object is not modified
+    config.read("config.ini")
+
+    config_params = {}
+    try:
+        config_params["logging_level"] = os.getenv('LOGGING_LEVEL', config["DEFAULT"]["LOGGING_LEVEL"])
+        config_params["input_queues"] = ast.literal_eval(os.getenv('INPUT_QUEUES'))
+        config_params["output_exchange"] = os.getenv('OUTPUT_EXCHANGE')
+        config_params["failure_probability"] = float(os.getenv('FAILURE_PROBABILITY'))
+        config_params["storage_path"] = os.getenv('STORAGE_PATH')
+        config_params["prefetch_count"] = int(os.getenv('PREFETCH_COUNT', config["DEFAULT"]["PREFETCH_COUNT"]))
+        config_params["ack_batch_size"] = int(os.getenv('ACK_BATCH_SIZE', config["DEFAULT"]["ACK_BATCH_SIZE"]))
+        config_params["ack_flush_interval_ms"] = int(os.getenv('ACK_FLUSH_INTERVAL_MS', config["DEFAULT"]["ACK_FLUSH_INTERVAL_MS"]))
+        config_params["partials_amount"] = int(os.getenv('PARTIALS_AMOUNT'))
+        config_params["top_n"] = int(os.getenv('TOP_N', config["DEFAULT"]["TOP_N"]))
+    except KeyError as e:
+        raise KeyError("Key was not found. Error: {} .Aborting server".format(e))
+    except ValueError as e:
+        raise ValueError("Key could not be parsed. Error: {}. Aborting server".format(e))
+
+    return config_params
+
+def initialize_log(logging_level):
+    """
+    Python custom logging initialization
+
+    Current timestamp is added to be able to identify in docker
+    compose logs the date when the log has arrived
+    """
+    logging.basicConfig(
+        format='%(asctime)s %(levelname)-8s %(message)s',
+        level=logging_level,
+        datefmt='%Y-%m-%d %H:%M:%S',
+    )
+
+def main():
+    config_params = initialize_config()
+    logging_level = config_params["logging_level"]
+    input_queues = config_params["input_queues"]
+    output_exchange = config_params["output_exchange"]
+    failure_probability = config_params["failure_probability"]
+    storage_path = config_params["storage_path"]
+    prefetch_count = config_params["prefetch_count"]
+    ack_batch_size = config_params["ack_batch_size"]
+    ack_flush_interval_ms = config_params["ack_flush_interval_ms"]
+    partials_amount = config_params["partials_amount"]
+    top_n = config_params["top_n"]
+    
+    initialize_log(logging_level)
+
+    # Log config parameters at the beginning of the program to verify the configuration
+    # of the component
+    logging.debug(f"action: config | result: success | logging_level: {logging_level} | input_queues: {input_queues} | output_exchange: {output_exchange} | failure_probability: {failure_probability} | storage_path: {storage_path} | prefetch_count: {prefetch_count} | ack_batch_size: {ack_batch_size} | ack_flush_interval_ms: {ack_flush_interval_ms} | partials_amount: {partials_amount} | top_n: {top_n}")
+
+    results_merger = ResultsMerger(input_queues, output_exchange, failure_probability, storage_path, prefetch_count, ack_batch_size, ack_flush_interval_ms, partials_amount, top_n)
+    results_merger.run()
+
+if __name__ == "__main__":
+    main()
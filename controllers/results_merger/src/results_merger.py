@@ -0,0 +1,208 @@
+import signal
+import logging
+import time
+import uuid
+from middleware.middleware import Middleware
+from messages.eof import EOF
+from messages.packet_serde import PacketSerde
+from messages.packet_type import PacketType
+from messages.movie_ratings_batch import MovieRatingsBatch
+from common.monitorable import Monitorable
+from common.top_k import TopK
+from storage_adapter.storage_adapter import StorageAdapter
+from common.failure_simulation import fail_with_probability
+
+PARTIALS_FILE_KEY = "partials"
+FINISHED_CLIENTS_FILE_KEY = "finished_clients"
+DISCONNECTED_CLIENTS_FILE_KEY = "disconnected_clients"
+MAX_FINISHED_CLIENTS = 500
+
+class ResultsMerger(Monitorable):
+    """
+    Merge the partial results that every shard of an aggregator sends for a client once
+    all the shards sent their EOF. Shards aggregate disjoint sets of keys, so the results
+    are merged according to their packet type: the most and least rated movies of the
+    shards are reduced to the global ones, the top N actors and investor countries of
+    the shards are reduced to the global top N, and any other result is forwarded as is
+    """
+    def __init__(self, input_queues, output_exchange, failure_probability, storage_path, prefetch_count, ack_batch_size, ack_flush_interval_ms, partials_amount, top_n):
+        self._input_queues = input_queues
+        self._output_exchange = output_exchange
+        self._failure_probability = failure_probability
+        self._middleware = None
+        # client_id -> message_id -> packet of every partial result and EOF received from the shards
+        self._partials = {}
+        self._storage_adapter = StorageAdapter(storage_path)
+        self._prefetch_count = prefetch_count
+        self._ack_batch_size = ack_batch_size
+        self._ack_flush_interval_ms = ack_flush_interval_ms
+        self._partials_amount = partials_amount
+        # With 0 all the partial results of a top N are kept
+        self._top_n = top_n
+        # client_id -> time the client was finished, of the last clients whose results were
+        # sent or that disconnected, so partial results redelivered after their state was
+        # cleaned are dropped instead of starting a state that is never merged
+        self._finished_clients = {}
+        # client_id -> time the disconnection was forwarded, as every shard forwards it
+        self._disconnected_clients = {}
+        
+        signal.signal(signal.SIGTERM, self.__handle_signal)
+    
+    def __handle_signal(self, signalnum, frame):
+        """
+        Signal handler for graceful shutdown
+        """
+        if signalnum == signal.SIGTERM:
+            logging.info('action: signal_received | result: success | signal: SIGTERM')
+            self.__cleanup()
+    
+    def __cleanup(self):
+        """
+        Cleanup resources during shutdown
+        """
+        self._middleware.stop()
+        self.stop_receiving_health_checks()
+    
+    def __load_state_from_storage(self):
+        """
+        Load persisted state from storage
+        """
+        partials = self._storage_adapter.load_key_values(PARTIALS_FILE_KEY)
+        if partials:
+            self._partials = partials
+            logging.debug(f"action: load_state_from_storage | result: success | clients: {list(self._partials.keys())}")
+        finished_clients = self._storage_adapter.load_data(FINISHED_CLIENTS_FILE_KEY)
+        if finished_clients:
+            self._finished_clients = finished_clients
+            logging.debug(f"action: load_state_from_storage | result: success | finished_clients: {list(self._finished_clients.keys())}")
+        disconnected_clients = self._storage_adapter.load_data(DISCONNECTED_CLIENTS_FILE_KEY)
+        if disconnected_clients:
+            self._disconnected_clients = disconnected_clients
+    
+    def __save_client(self, clients, file_key, client_id):
+        """
+        Store a client in a map of finished or disconnected clients, keeping only the
+        MAX_FINISHED_CLIENTS most recent ones
+        """
+        clients[client_id] = time.time_ns()
+        if len(clients) > MAX_FINISHED_CLIENTS:
+            oldest_client_id = min(clients, key=clients.get)
+            clients.pop(oldest_client_id)
+        self._storage_adapter.update(file_key, clients)
+    
+    def __generate_deterministic_uuid(self, message_id):
+        """
+        Generate a deterministic UUID based on the message ID.
+        """
+        return str(uuid.uuid5(uuid.UUID(message_id), "results_merger"))
+    
+    def __store_partial(self, msg, packet):
+        """
+        Store a partial result or EOF of a shard. Messages are keyed by their message id,
+        so a redelivered message is only stored once
+        """
+        client_partials = self._partials.setdefault(msg.client_id, {})
+        if msg.message_id in client_partials:
+            return
+        self._storage_adapter.append(PARTIALS_FILE_KEY, msg.message_id, packet, secondary_file_key=msg.client_id)
+        client_partials[msg.message_id] = packet
+    
+    def __merge_most_least_rated_movies(self, movie_ratings_batches, eof_message_id):
+        movie_ratings = [movie_rating for movie_ratings_batch in movie_ratings_batches for movie_rating in movie_ratings_batch.get_items()]
+        most_rated_movie = max(movie_ratings, key=lambda movie_rating: movie_rating.rating)
+        least_rated_movie = min(movie_ratings, key=lambda movie_rating: movie_rating.rating)
+        new_message_id = self.__generate_deterministic_uuid(eof_message_id)
+        return [MovieRatingsBatch(movie_ratings_batches[0].client_id, [most_rated_movie, least_rated_movie], message_id=new_message_id)]
+    
+    def __merge_top_n(self, results, get_key_and_value):
+        """
+        Keep the results with the top N values, with the same TopK the shards use, so ties
+        are broken like they are by a single aggregator. Shards aggregate disjoint keys,
+        so every key comes from a single result
+        """
+        results_by_key = {}
+        top_k = TopK(self._top_n if self._top_n > 0 else len(results))
+        for result in results:
+            key, value = get_key_and_value(result)
+            if key in results_by_key:
+                continue
+            results_by_key[key] = result
+            top_k.add(key, value)
+        return [results_by_key[key] for key, _ in top_k.top()]
+    
+    def __merge_results(self, results, eof_message_id):
+        results_by_packet_type = {}
+        for result in results:
+            results_by_packet_type.setdefault(result.packet_type(), []).append(result)
+        merged_results = []
+        for packet_type, packet_type_results in results_by_packet_type.items():
+            if packet_type == PacketType.MOVIE_RATINGS_BATCH:
+                merged_results += self.__merge_most_least_rated_movies(packet_type_results, eof_message_id)
+            elif packet_type == PacketType.ACTOR_PARTICIPATION:
+                merged_results += self.__merge_top_n(packet_type_results, lambda actor_participation: (actor_participation.actor, actor_participation.participation))
+            elif packet_type == PacketType.INVESTOR_COUNTRY:
+                merged_results += self.__merge_top_n(packet_type_results, lambda investor_country: (investor_country.country, investor_country.investment))
+            else:
+                merged_results += packet_type_results
+        return merged_results
+    
+    def __send_merged_results(self, client_id):
+        """
+        Merge and send the results of a client once the EOFs of all the shards were
+        received, followed by a single EOF
+        """
+        msgs = [PacketSerde.deserialize(packet) for packet in self._partials[client_id].values()]
+        eofs_message_ids = sorted(msg.message_id for msg in msgs if msg.packet_type() == PacketType.EOF)
+        if len(eofs_message_ids) < self._partials_amount:
+            return
+        # Every shard sends its EOF with a different message id, the smallest one identifies the merged EOF
+        eof_message_id = eofs_message_ids[0]
+        results = [msg for msg in msgs if msg.packet_type() != PacketType.EOF]
+        for result in self.__merge_results(results, eof_message_id):
+            self._middleware.send_message(PacketSerde.serialize(result))
+            logging.debug(f"action: sent_merged_result | result: success | merged_result: {result}")
+        self._middleware.send_message(PacketSerde.serialize(EOF(client_id, message_id=eof_message_id)))
+        logging.info(f"action: sent_eof | result: success | client_id: {client_id} | partial_results: {len(results)}")
+        # The results must be published before the state needed to send them again is deleted
+        self._middleware.flush()
+        fail_with_probability(self._failure_probability, "after sending merged results and eof, before cleaning client state")
+        self.__save_client(self._finished_clients, FINISHED_CLIENTS_FILE_KEY, client_id)
+        self.__clean_client_state(client_id)
+    
+    def __clean_client_state(self, client_id):
+        if client_id in self._partials:
+            self._partials.pop(client_id)
+            self._storage_adapter.delete(PARTIALS_FILE_KEY, secondary_file_key=client_id)
+    
+    def __handle_packet(self, packet):
+        fail_with_probability(self._failure_probability, "before handling packet")
+        msg = PacketSerde.deserialize(packet)
+        if msg.packet_type() != PacketType.CLIENT_DISCONNECTED and msg.client_id in self._finished_clients:
+            logging.debug(f"action: drop_late_partial | result: success | client_id: {msg.client_id} | packet_type: {msg.packet_type()}")
+        elif msg.packet_type() == PacketType.EOF:
+            eof = msg
+            self.__store_partial(eof, packet)
+            self.__send_merged_results(eof.client_id)
+        elif msg.packet_type() == PacketType.CLIENT_DISCONNECTED:
+            client_disconnected = msg
+            logging.debug(f"action: client_disconnected | result: success | client_id: {client_disconnected.client_id}")
+            self.__clean_client_state(client_disconnected.client_id)
+            if client_disconnected.client_id not in self._disconnected_clients:
+                self._middleware.send_message(PacketSerde.serialize(client_disconnected))
+                self.__save_client(self._disconnected_clients, DISCONNECTED_CLIENTS_FILE_KEY, client_disconnected.client_id)
+                self.__save_client(self._finished_clients, FINISHED_CLIENTS_FILE_KEY, client_disconnected.client_id)
+        else:
+            self.__store_partial(msg, packet)
+        fail_with_probability(self._failure_probability, f"after handling packet: {msg.packet_type()}")
+    
+    def run(self):
+        self.start_receiving_health_checks()
+        self.__load_state_from_storage()
+        input_queues_and_callback_functions = [(input_queue[0], input_queue[1], self.__handle_packet) for input_queue in self._input_queues]
+        self._middleware = Middleware(input_queues_and_callback_functions=input_queues_and_callback_functions,
+                                      output_exchange=self._output_exchange,
+                                      prefetch_count=self._prefetch_count,
+                                      ack_batch_size=self._ack_batch_size,
+                                      ack_flush_interval_ms=self._ack_flush_interval_ms,
+                                     )
+        self._middleware.handle_messages()
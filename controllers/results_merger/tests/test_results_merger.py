@@ -0,0 +1,108 @@
+import os
+import random
+import sys
+import tempfile
+import unittest
+import zlib
+
+CONTROLLERS_PATH = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(CONTROLLERS_PATH))
+sys.path.insert(0, os.path.join(CONTROLLERS_PATH, "results_merger"))
+sys.path.insert(0, os.path.join(CONTROLLERS_PATH, "top_actors_participation_calculator"))
+
+from src.results_merger import ResultsMerger
+from src.top_actors_participation_calculator import TopActorsParticipationCalculator
+from messages.eof import EOF
+from messages.movie_credit import MovieCredit
+from messages.movie_credits_batch import MovieCreditsBatch
+from messages.packet_serde import PacketSerde
+from messages.packet_type import PacketType
+
+CLIENT_ID = "client"
+TOP_N = 10
+SHARDS_AMOUNT = 3
+
+class FakeMiddleware:
+    def __init__(self):
+        self.sent = []
+
+    def send_message(self, msg, exchange=None):
+        self.sent.append(msg)
+
+    def flush(self):
+        pass
+
+class TestResultsMergerTopN(unittest.TestCase):
+    def setUp(self):
+        self._storage = tempfile.TemporaryDirectory()
+        self.addCleanup(self._storage.cleanup)
+
+    def __storage_path(self, name):
+        path = os.path.join(self._storage.name, name)
+        os.makedirs(path)
+        return path + "/"
+
+    def __calculator(self, name):
+        calculator = TopActorsParticipationCalculator(TOP_N, [], None, 0, self.__storage_path(name), 1, 1, 0, 1000, 4194304, "exact", 0)
+        calculator._middleware = FakeMiddleware()
+        return calculator
+
+    def __top_actors(self, calculator, batches):
+        for batch in batches:
+            calculator._TopActorsParticipationCalculator__handle_packet(PacketSerde.serialize(batch))
+        calculator._TopActorsParticipationCalculator__handle_packet(PacketSerde.serialize(EOF(CLIENT_ID)))
+        return calculator._middleware.sent
+
+    def __credits_batches(self):
+        """
+        Batches where many actors have the same participation, so there are ties at the
+        cutoff of the top N
+        """
+        rng = random.Random(3)
+        actors = [f"actor_{i}" for i in range(40)]
+        batches = []
+        for i in range(20):
+            movie_credits = [MovieCredit(i * 10 + j, "title", rng.sample(actors, 3)) for j in range(5)]
+            batches.append(MovieCreditsBatch(CLIENT_ID, movie_credits))
+        return batches
+
+    def __shard_batches(self, batches, shard_id):
+        """
+        Keep the actors routed to a shard, like the routers do
+        """
+        shard_batches = []
+        for batch in batches:
+            movie_credits = []
+            for movie_credit in batch.get_items():
+                cast = [actor for actor in movie_credit.cast if zlib.crc32(actor.encode('utf-8')) % SHARDS_AMOUNT + 1 == shard_id]
+                movie_credits.append(MovieCredit(movie_credit.id, movie_credit.title, cast))
+            shard_batches.append(MovieCreditsBatch(CLIENT_ID, movie_credits, message_id=batch.message_id))
+        return shard_batches
+
+    def __actors_participation(self, packets):
+        msgs = [PacketSerde.deserialize(packet) for packet in packets]
+        return [(msg.actor, msg.participation) for msg in msgs if msg.packet_type() == PacketType.ACTOR_PARTICIPATION]
+
+    def test_sharded_top_n_equals_unsharded_top_n(self):
+        batches = self.__credits_batches()
+        unsharded = self.__actors_participation(self.__top_actors(self.__calculator("unsharded"), batches))
+
+        merger = ResultsMerger([], None, 0, self.__storage_path("merger"), 1, 1, 0, SHARDS_AMOUNT, TOP_N)
+        merger._middleware = FakeMiddleware()
+        for shard_id in range(1, SHARDS_AMOUNT + 1):
+            for packet in self.__top_actors(self.__calculator(f"shard_{shard_id}"), self.__shard_batches(batches, shard_id)):
+                merger._ResultsMerger__handle_packet(packet)
+        merged = self.__actors_participation(merger._middleware.sent)
+
+        participations = {}
+        for batch in batches:
+            for movie_credit in batch.get_items():
+                for actor in movie_credit.cast:
+                    participations[actor] = participations.get(actor, 0) + 1
+        sorted_participations = sorted(participations.values(), reverse=True)
+        self.assertEqual(sorted_participations[TOP_N - 1], sorted_participations[TOP_N], "the top N has no ties at its cutoff")
+        self.assertEqual(len(unsharded), TOP_N)
+        self.assertEqual(merged, unsharded)
+
+if __name__ == "__main__":
+    unittest.main()
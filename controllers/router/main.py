@@ -29,6 +29,15 @@ def initialize_config():
         config_params["failure_probability"] = float(os.getenv('FAILURE_PROBABILITY'))
         config_params["cluster_size"] = int(os.getenv('CLUSTER_SIZE'))
         config_params["id"] = os.getenv('ID')
+        config_params["publish_batch_size"] = int(os.getenv('PUBLISH_BATCH_SIZE', config["DEFAULT"]["PUBLISH_BATCH_SIZE"]))
+        config_params["publish_flush_interval_ms"] = int(os.getenv('PUBLISH_FLUSH_INTERVAL_MS', config["DEFAULT"]["PUBLISH_FLUSH_INTERVAL_MS"]))
+        config_params["reliable_publishes"] = os.getenv('RELIABLE_PUBLISHES', config["DEFAULT"]["RELIABLE_PUBLISHES"]).lower() == "true"
+        config_params["prefetch_count"] = int(os.getenv('PREFETCH_COUNT', config["DEFAULT"]["PREFETCH_COUNT"]))
+        config_params["ack_batch_size"] = int(os.getenv('ACK_BATCH_SIZE', config["DEFAULT"]["ACK_BATCH_SIZE"]))
+        config_params["ack_flush_interval_ms"] = int(os.getenv('ACK_FLUSH_INTERVAL_MS', config["DEFAULT"]["ACK_FLUSH_INTERVAL_MS"]))
+        config_params["middleware_type"] = os.getenv('MIDDLEWARE_TYPE', config["DEFAULT"]["MIDDLEWARE_TYPE"])
+        config_params["movie_ids_filter_input_exchange"] = os.getenv('MOVIE_IDS_FILTER_INPUT_EXCHANGE', config["DEFAULT"]["MOVIE_IDS_FILTER_INPUT_EXCHANGE"])
+        config_params["movies_routing_field"] = os.getenv('MOVIES_ROUTING_FIELD', config["DEFAULT"]["MOVIES_ROUTING_FIELD"])
     except KeyError as e:
         raise KeyError("Key was not found. Error: {} .Aborting server".format(e))
     except ValueError as e:
@@ -57,14 +66,23 @@ def main():
     failure_probability = config_params["failure_probability"]
     cluster_size = config_params["cluster_size"]
     id = config_params["id"]
+    publish_batch_size = config_params["publish_batch_size"]
+    publish_flush_interval_ms = config_params["publish_flush_interval_ms"]
+    reliable_publishes = config_params["reliable_publishes"]
+    prefetch_count = config_params["prefetch_count"]
+    ack_batch_size = config_params["ack_batch_size"]
+    ack_flush_interval_ms = config_params["ack_flush_interval_ms"]
+    middleware_type = config_params["middleware_type"]
+    movie_ids_filter_input_exchange = config_params["movie_ids_filter_input_exchange"]
+    movies_routing_field = config_params["movies_routing_field"]
     
     initialize_log(logging_level)
 
     # Log config parameters at the beginning of the program to verify the configuration
     # of the component
-    logging.debug(f"action: config | result: success | logging_level: {logging_level} | input_queues: {input_queues} | output_exchange_prefixes_and_dest_nodes_amount: {output_exchange_prefixes_and_dest_nodes_amount} | failure_probability: {failure_probability} | cluster_size: {cluster_size} | id: {id}")
+    logging.debug(f"action: config | result: success | logging_level: {logging_level} | input_queues: {input_queues} | output_exchange_prefixes_and_dest_nodes_amount: {output_exchange_prefixes_and_dest_nodes_amount} | failure_probability: {failure_probability} | cluster_size: {cluster_size} | id: {id} | publish_batch_size: {publish_batch_size} | publish_flush_interval_ms: {publish_flush_interval_ms} | reliable_publishes: {reliable_publishes} | prefetch_count: {prefetch_count} | ack_batch_size: {ack_batch_size} | ack_flush_interval_ms: {ack_flush_interval_ms} | middleware_type: {middleware_type} | movie_ids_filter_input_exchange: {movie_ids_filter_input_exchange} | movies_routing_field: {movies_routing_field}")
 
-    router = Router(input_queues, output_exchange_prefixes_and_dest_nodes_amount, failure_probability, cluster_size, id)
+    router = Router(input_queues, output_exchange_prefixes_and_dest_nodes_amount, failure_probability, cluster_size, id, publish_batch_size, publish_flush_interval_ms, reliable_publishes, prefetch_count, ack_batch_size, ack_flush_interval_ms, middleware_type, movie_ids_filter_input_exchange, movies_routing_field)
     router.run()
 
 if __name__ == "__main__":
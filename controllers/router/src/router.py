@@ -1,24 +1,47 @@
 import signal
 import logging
 import uuid
+import zlib
 from middleware.middleware import Middleware
+from middleware.async_middleware import AsyncMiddleware
 from messages.eof import EOF
 from messages.packet_serde import PacketSerde
 from messages.packet_type import PacketType
 from messages.movies_batch import MoviesBatch
 from messages.ratings_batch import RatingsBatch
 from messages.credits_batch import CreditsBatch
+from messages.movie_ratings_batch import MovieRatingsBatch
+from messages.movie_credit import MovieCredit
+from messages.movie_credits_batch import MovieCreditsBatch
+from messages.movie_rating_partials_batch import MovieRatingPartialsBatch
+from messages.actor_participation_partials_batch import ActorParticipationPartialsBatch
+from messages.analyzed_movies_batch import AnalyzedMoviesBatch
+from messages.indexed_batch import IndexedBatch
 from common.monitorable import Monitorable
 from common.failure_simulation import fail_with_probability
 
+ASYNC_MIDDLEWARE_TYPE = "async"
+PRODUCTION_COUNTRIES_ROUTING_FIELD = "production_countries"
+
 class Router(Monitorable):
-    def __init__(self, input_queues, output_exchange_prefixes_and_dest_nodes_amount, failure_probability, cluster_size, id):
+    def __init__(self, input_queues, output_exchange_prefixes_and_dest_nodes_amount, failure_probability, cluster_size, id, publish_batch_size, publish_flush_interval_ms, reliable_publishes, prefetch_count, ack_batch_size, ack_flush_interval_ms, middleware_type, movie_ids_filter_input_exchange, movies_routing_field):
         self._input_queues = input_queues
         self._output_exchange_prefixes_and_dest_nodes_amount = output_exchange_prefixes_and_dest_nodes_amount
         self._failure_probability = failure_probability
         self._cluster_size = cluster_size
         self._id = id
+        self._publish_batch_size = publish_batch_size
+        self._publish_flush_interval_ms = publish_flush_interval_ms
+        self._reliable_publishes = reliable_publishes
         self._middleware = None
+        self._prefetch_count = prefetch_count
+        self._ack_batch_size = ack_batch_size
+        self._ack_flush_interval_ms = ack_flush_interval_ms
+        self._middleware_type = middleware_type
+        self._movie_ids_filter_input_exchange = movie_ids_filter_input_exchange
+        # client_id -> destination exchange -> Bloom filter of the movie ids the destination joiner holds
+        self._movie_ids_filters = {}
+        self._movies_routing_field = movies_routing_field
         
         signal.signal(signal.SIGTERM, self.__handle_signal)
 
@@ -38,6 +61,10 @@ class Router(Monitorable):
         self.stop_receiving_health_checks()
     
     def __hash_id(self, id, dest_nodes_amount):
+        if isinstance(id, str):
+            # The built-in hash of a str changes between processes, so every router
+            # of the cluster would send the same key to a different node
+            id = zlib.crc32(id.encode('utf-8'))
         return (id % dest_nodes_amount) + 1
     
     def __generate_deterministic_uuid(self, message_id, destination_id):
@@ -46,6 +73,18 @@ class Router(Monitorable):
         """
         return str(uuid.uuid5(uuid.UUID(message_id), str(destination_id)))
     
+    def __may_be_joined(self, client_id, output_exchange, movie_id):
+        """
+        Check if an item could be joined by its destination joiner. Items are only
+        dropped once the joiner published the filter of its movies for the client
+        """
+        movie_ids_filter = self._movie_ids_filters.get(client_id, {}).get(output_exchange)
+        return movie_ids_filter is None or movie_id in movie_ids_filter
+    
+    def __store_movie_ids_filter(self, movie_ids_filter):
+        self._movie_ids_filters.setdefault(movie_ids_filter.client_id, {})[movie_ids_filter.input_exchange] = movie_ids_filter.bloom_filter
+        logging.info(f"action: movie_ids_filter_received | result: success | client_id: {movie_ids_filter.client_id} | input_exchange: {movie_ids_filter.input_exchange}")
+    
     def __route_batch(self, batch, get_hash_id, batch_class, log_action_prefix):
         """
         Generic method to route any type of batch to its destination nodes
@@ -59,7 +98,10 @@ class Router(Monitorable):
         for output_exchange_prefix, dest_nodes_amount in self._output_exchange_prefixes_and_dest_nodes_amount:
             batches = {}
             for item in batch.get_items():
-                destination_id = self.__hash_id(get_hash_id(item), dest_nodes_amount)
+                hash_id = get_hash_id(item)
+                destination_id = self.__hash_id(hash_id, dest_nodes_amount)
+                if not self.__may_be_joined(batch.client_id, f"{output_exchange_prefix}_{destination_id}", hash_id):
+                    continue
                 new_message_id = self.__generate_deterministic_uuid(batch.message_id, destination_id)
                 destination_batch = batches.get(destination_id, batch_class(batch.client_id, [], message_id=new_message_id))
                 destination_batch.add_item(item)
@@ -70,15 +112,66 @@ class Router(Monitorable):
                 self._middleware.send_message(PacketSerde.serialize(dest_batch), exchange=output_exchange)
                 logging.debug(f"action: {log_action_prefix}_routed | result: success | {log_action_prefix}: {dest_batch} | destination_id: {destination_id}")
     
+    def __route_indexed_batch(self, batch, log_action_prefix):
+        """
+        Route a batch written with an items index by copying the encoded items of every
+        destination node, without deserializing them
+        """
+        for output_exchange_prefix, dest_nodes_amount in self._output_exchange_prefixes_and_dest_nodes_amount:
+            items_indexes = {}
+            for i, key in enumerate(batch.keys):
+                destination_id = self.__hash_id(key, dest_nodes_amount)
+                if not self.__may_be_joined(batch.client_id, f"{output_exchange_prefix}_{destination_id}", key):
+                    continue
+                items_indexes.setdefault(destination_id, []).append(i)
+            
+            for destination_id, indexes in items_indexes.items():
+                new_message_id = self.__generate_deterministic_uuid(batch.message_id, destination_id)
+                dest_batch = batch.take(indexes, message_id=new_message_id)
+                output_exchange = f"{output_exchange_prefix}_{destination_id}"
+                self._middleware.send_message(PacketSerde.serialize(dest_batch), exchange=output_exchange)
+                logging.debug(f"action: {log_action_prefix}_routed | result: success | {log_action_prefix}: {dest_batch} | destination_id: {destination_id}")
+    
+    def __route_movie_credits_by_actor(self, movie_credits_batch):
+        """
+        Route every actor of the cast of the movie credits to its destination node, so
+        every node counts the participations of all the movies of its actors. A movie
+        credit is split into one movie credit per destination node of its cast
+        """
+        for output_exchange_prefix, dest_nodes_amount in self._output_exchange_prefixes_and_dest_nodes_amount:
+            batches = {}
+            for movie_credit in movie_credits_batch.get_items():
+                casts = {}
+                for actor in movie_credit.cast:
+                    casts.setdefault(self.__hash_id(actor, dest_nodes_amount), []).append(actor)
+                for destination_id, cast in casts.items():
+                    new_message_id = self.__generate_deterministic_uuid(movie_credits_batch.message_id, destination_id)
+                    destination_batch = batches.setdefault(destination_id, MovieCreditsBatch(movie_credits_batch.client_id, [], message_id=new_message_id))
+                    destination_batch.add_item(MovieCredit(movie_credit.id, movie_credit.title, cast))
+            
+            for destination_id, dest_batch in batches.items():
+                output_exchange = f"{output_exchange_prefix}_{destination_id}"
+                self._middleware.send_message(PacketSerde.serialize(dest_batch), exchange=output_exchange)
+                logging.debug(f"action: movie_credits_batch_routed | result: success | movie_credits_batch: {dest_batch} | destination_id: {destination_id}")
+    
     def __route_movies(self, movies_batch):
+        if self._movies_routing_field == PRODUCTION_COUNTRIES_ROUTING_FIELD:
+            # Movies are expected to have a single production country, as the ones
+            # aggregated by country are filtered by it
+            get_hash_id = lambda movie: movie.production_countries[0] if movie.production_countries else ''
+        else:
+            get_hash_id = lambda movie: movie.id
         self.__route_batch(
             batch=movies_batch,
-            get_hash_id=lambda movie: movie.id,
+            get_hash_id=get_hash_id,
             batch_class=MoviesBatch,
             log_action_prefix="movies_batch"
         )
         
     def __route_ratings(self, ratings_batch):
+        if isinstance(ratings_batch, IndexedBatch):
+            self.__route_indexed_batch(ratings_batch, log_action_prefix="ratings_batch")
+            return
         self.__route_batch(
             batch=ratings_batch,
             get_hash_id=lambda rating: rating.movie_id,
@@ -87,6 +180,9 @@ class Router(Monitorable):
         )
             
     def __route_credits(self, credits_batch):
+        if isinstance(credits_batch, IndexedBatch):
+            self.__route_indexed_batch(credits_batch, log_action_prefix="credits_batch")
+            return
         self.__route_batch(
             batch=credits_batch,
             get_hash_id=lambda credit: credit.movie_id,
@@ -94,6 +190,38 @@ class Router(Monitorable):
             log_action_prefix="credits_batch"
         )
         
+    def __route_movie_ratings(self, movie_ratings_batch):
+        self.__route_batch(
+            batch=movie_ratings_batch,
+            get_hash_id=lambda movie_rating: movie_rating.id,
+            batch_class=MovieRatingsBatch,
+            log_action_prefix="movie_ratings_batch"
+        )
+        
+    def __route_movie_rating_partials(self, movie_rating_partials_batch):
+        self.__route_batch(
+            batch=movie_rating_partials_batch,
+            get_hash_id=lambda movie_rating_partial: movie_rating_partial.id,
+            batch_class=MovieRatingPartialsBatch,
+            log_action_prefix="movie_rating_partials_batch"
+        )
+        
+    def __route_actor_participation_partials(self, actor_participation_partials_batch):
+        self.__route_batch(
+            batch=actor_participation_partials_batch,
+            get_hash_id=lambda actor_participation: actor_participation[0],
+            batch_class=ActorParticipationPartialsBatch,
+            log_action_prefix="actor_participation_partials_batch"
+        )
+        
+    def __route_analyzed_movies(self, analyzed_movies_batch):
+        self.__route_batch(
+            batch=analyzed_movies_batch,
+            get_hash_id=lambda analyzed_movie: int(analyzed_movie.sentiment),
+            batch_class=AnalyzedMoviesBatch,
+            log_action_prefix="analyzed_movies_batch"
+        )
+        
     def __send_eof_to_all_destination_nodes(self, received_eof):
         for output_exchange_prefix, dest_nodes_amount in self._output_exchange_prefixes_and_dest_nodes_amount:
             for i in range(1, dest_nodes_amount + 1):
@@ -109,9 +237,15 @@ class Router(Monitorable):
                 self._middleware.send_message(PacketSerde.serialize(msg), exchange=output_exchange)
                 logging.info(f"action: sent_msg | result: success | destination_id: {i}")
     
+    def __deserialize(self, packet):
+        indexed_batch = PacketSerde.deserialize_indexed_batch(packet)
+        if indexed_batch is not None:
+            return indexed_batch
+        return PacketSerde.deserialize(packet)
+    
     def __handle_packet(self, packet):
         fail_with_probability(self._failure_probability, "before sending message")
-        msg = PacketSerde.deserialize(packet)
+        msg = self.__deserialize(packet)
         if msg.packet_type() == PacketType.MOVIES_BATCH:
             movies_batch = msg
             self.__route_movies(movies_batch)
@@ -121,17 +255,39 @@ class Router(Monitorable):
         elif msg.packet_type() == PacketType.CREDITS_BATCH:
             credits_batch = msg
             self.__route_credits(credits_batch)
+        elif msg.packet_type() == PacketType.MOVIE_RATINGS_BATCH:
+            movie_ratings_batch = msg
+            self.__route_movie_ratings(movie_ratings_batch)
+        elif msg.packet_type() == PacketType.MOVIE_CREDITS_BATCH:
+            movie_credits_batch = msg
+            self.__route_movie_credits_by_actor(movie_credits_batch)
+        elif msg.packet_type() == PacketType.MOVIE_RATING_PARTIALS_BATCH:
+            movie_rating_partials_batch = msg
+            self.__route_movie_rating_partials(movie_rating_partials_batch)
+        elif msg.packet_type() == PacketType.ACTOR_PARTICIPATION_PARTIALS_BATCH:
+            actor_participation_partials_batch = msg
+            self.__route_actor_participation_partials(actor_participation_partials_batch)
+        elif msg.packet_type() == PacketType.ANALYZED_MOVIES_BATCH:
+            analyzed_movies_batch = msg
+            self.__route_analyzed_movies(analyzed_movies_batch)
         elif msg.packet_type() == PacketType.EOF:
             eof = msg
+            self._movie_ids_filters.pop(eof.client_id, None)
             eof.add_seen_id(self._id)
             if len(eof.seen_ids) == self._cluster_size:
                 self.__send_eof_to_all_destination_nodes(eof)
             else:
-                self._middleware.reenqueue_message(PacketSerde.serialize(eof))
+                # Only the data queue is shared by the routers of the cluster, the queue of the
+                # movie ids filters is consumed by this router alone
+                self._middleware.reenqueue_message(PacketSerde.serialize(eof), queue=self._input_queues[0][0])
         elif msg.packet_type() == PacketType.CLIENT_DISCONNECTED:
             client_disconnected = msg
             logging.debug(f"action: client_disconnected | result: success | client_id: {client_disconnected.client_id}")
+            self._movie_ids_filters.pop(client_disconnected.client_id, None)
             self.__send_message_to_all_destination_nodes(client_disconnected)
+        elif msg.packet_type() == PacketType.MOVIE_IDS_FILTER:
+            movie_ids_filter = msg
+            self.__store_movie_ids_filter(movie_ids_filter)
         else:
             logging.error(f"action: unexpected_packet_type | result: fail | packet_type: {msg.packet_type()}")
         fail_with_probability(self._failure_probability, "after sending message")
@@ -139,5 +295,17 @@ class Router(Monitorable):
     def run(self):
         self.start_receiving_health_checks()
         input_queues_and_callback_functions = [(input_queue[0], input_queue[1], self.__handle_packet) for input_queue in self._input_queues]
-        self._middleware = Middleware(input_queues_and_callback_functions=input_queues_and_callback_functions)
+        if self._movie_ids_filter_input_exchange:
+            # Every router of the cluster needs all the filters, so each one binds its own queue
+            movie_ids_filter_input_queue = f"{self._movie_ids_filter_input_exchange}_{self._id}"
+            input_queues_and_callback_functions.append((movie_ids_filter_input_queue, self._movie_ids_filter_input_exchange, self.__handle_packet))
+        middleware_class = AsyncMiddleware if self._middleware_type == ASYNC_MIDDLEWARE_TYPE else Middleware
+        self._middleware = middleware_class(input_queues_and_callback_functions=input_queues_and_callback_functions,
+                                            publish_batch_size=self._publish_batch_size,
+                                            publish_flush_interval_ms=self._publish_flush_interval_ms,
+                                            reliable_publishes=self._reliable_publishes,
+                                            prefetch_count=self._prefetch_count,
+                                            ack_batch_size=self._ack_batch_size,
+                                            ack_flush_interval_ms=self._ack_flush_interval_ms,
+                                           )
         self._middleware.handle_messages()
@@ -0,0 +1,101 @@
+import os
+import sys
+import unittest
+from collections import deque
+
+CONTROLLER_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(CONTROLLER_PATH)))
+sys.path.insert(0, CONTROLLER_PATH)
+
+from src.router import Router
+from messages.eof import EOF
+from messages.packet_serde import PacketSerde
+from messages.packet_type import PacketType
+
+DATA_QUEUE = "ratings"
+MOVIE_IDS_FILTER_EXCHANGE = "movie_ids_filters"
+OUTPUT_EXCHANGE_PREFIX = "ratings_joiner"
+DEST_NODES_AMOUNT = 3
+MAX_DELIVERIES = 1000
+
+class FakeBroker:
+    """
+    Fanout exchanges bound to queues, where the messages published to an exchange
+    without queues are kept by exchange
+    """
+    def __init__(self):
+        self.queues = {}
+        self.bindings = {}
+        self.published = {}
+
+    def declare_queue(self, queue, exchange=None):
+        self.queues.setdefault(queue, deque())
+        if exchange:
+            self.bindings.setdefault(exchange, set()).add(queue)
+
+    def publish(self, exchange, routing_key, msg):
+        if not exchange:
+            self.queues[routing_key].append(msg)
+        elif exchange in self.bindings:
+            for queue in self.bindings[exchange]:
+                self.queues[queue].append(msg)
+        else:
+            self.published.setdefault(exchange, []).append(msg)
+
+class FakeMiddleware:
+    """
+    Middleware with the publishing semantics of the real one, over a fake broker
+    """
+    def __init__(self, broker, input_queues_and_callback_functions):
+        self._broker = broker
+        self._input_queues_and_callback_functions = input_queues_and_callback_functions
+        for queue, exchange, _ in input_queues_and_callback_functions:
+            broker.declare_queue(queue, exchange)
+
+    def send_message(self, msg, exchange=None):
+        self._broker.publish(exchange, '', msg)
+
+    def reenqueue_message(self, msg, queue=None):
+        if queue is None:
+            for q, _, _ in self._input_queues_and_callback_functions:
+                self._broker.publish('', q, msg)
+        else:
+            self._broker.publish('', queue, msg)
+
+class TestRouterEOF(unittest.TestCase):
+    def setUp(self):
+        self.broker = FakeBroker()
+        self.routers = []
+        for id in ("1", "2"):
+            router = Router([(DATA_QUEUE, DATA_QUEUE)], [(OUTPUT_EXCHANGE_PREFIX, DEST_NODES_AMOUNT)], 0, 2, id, 1, 0, False, 1, 1, 0, "sync", MOVIE_IDS_FILTER_EXCHANGE, None)
+            movie_ids_filter_queue = f"{MOVIE_IDS_FILTER_EXCHANGE}_{id}"
+            router._middleware = FakeMiddleware(self.broker, [
+                (DATA_QUEUE, DATA_QUEUE, router._Router__handle_packet),
+                (movie_ids_filter_queue, MOVIE_IDS_FILTER_EXCHANGE, router._Router__handle_packet),
+            ])
+            self.routers.append((router, [DATA_QUEUE, movie_ids_filter_queue]))
+
+    def __deliver_all(self):
+        """
+        Deliver the queued messages to the routers in turns, as competing consumers of
+        the data queue, until every queue is empty
+        """
+        deliveries = 0
+        while any(self.broker.queues.values()):
+            for router, queues in self.routers:
+                for queue in queues:
+                    if self.broker.queues[queue]:
+                        router._Router__handle_packet(self.broker.queues[queue].popleft())
+                        deliveries += 1
+            self.assertLess(deliveries, MAX_DELIVERIES, "the EOF is re-enqueued endlessly")
+
+    def test_eof_is_sent_once_to_every_destination(self):
+        self.broker.publish(DATA_QUEUE, '', PacketSerde.serialize(EOF("client")))
+        self.__deliver_all()
+        for i in range(1, DEST_NODES_AMOUNT + 1):
+            packets = self.broker.published.get(f"{OUTPUT_EXCHANGE_PREFIX}_{i}", [])
+            eofs = [packet for packet in packets if PacketSerde.packet_type(packet) == PacketType.EOF]
+            self.assertEqual(len(eofs), 1)
+
+if __name__ == "__main__":
+    unittest.main()
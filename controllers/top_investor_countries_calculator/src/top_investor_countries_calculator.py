@@ -8,23 +8,32 @@ from messages.packet_serde import PacketSerde
 from messages.packet_type import PacketType
 from messages.investor_country import InvestorCountry
 from common.monitorable import Monitorable
+from common.top_k import TopK, SpaceSavingTopK
 from storage_adapter.storage_adapter import StorageAdapter
+from storage_adapter.wal_state import WalState, save_processed_message_id
 from common.failure_simulation import fail_with_probability
 
 STATE_FILE_KEY = "state"
 INVESTMENT_BY_COUNTRY = "investment_by_country"
 PROCESSED_MESSAGE_IDS= "processed_message_ids"
-MAX_PROCESSED_MESSAGE_IDS = 500
+TOP_K = "top_k"
+
+APPROXIMATE_TOP_K_MODE = "approximate"
 
 class TopInvestorCountriesCalculator(Monitorable):
-    def __init__(self, top_n_investor_countries, input_queues, output_exchange, failure_probability, storage_path):
+    def __init__(self, top_n_investor_countries, input_queues, output_exchange, failure_probability, storage_path, prefetch_count, ack_batch_size, ack_flush_interval_ms, wal_max_records, wal_max_bytes, top_k_mode, top_k_capacity):
         self._top_n_investor_countries = top_n_investor_countries
         self._input_queues = input_queues
         self._output_exchange = output_exchange
         self._failure_probability = failure_probability
         self._middleware = None
-        self._state = {}
-        self._storage_adapter = StorageAdapter(storage_path)
+        self._storage_adapter = StorageAdapter(storage_path, wal_max_records=wal_max_records, wal_max_bytes=wal_max_bytes)
+        self._state = WalState(self._storage_adapter, STATE_FILE_KEY, self.__apply_delta, self.__new_client_state, snapshot_function=self.__persistent_state)
+        self._prefetch_count = prefetch_count
+        self._ack_batch_size = ack_batch_size
+        self._ack_flush_interval_ms = ack_flush_interval_ms
+        self._top_k_mode = top_k_mode
+        self._top_k_capacity = top_k_capacity
         
         signal.signal(signal.SIGTERM, self.__handle_signal)
 
@@ -47,9 +56,7 @@ class TopInvestorCountriesCalculator(Monitorable):
         """
         Load persisted state from storage
         """
-        state = self._storage_adapter.load_data(STATE_FILE_KEY)
-        if state:
-            self._state = state
+        if self._state.load():
             logging.debug(f"action: load_state_from_storage | result: success | state: {self._state}")
             
     def __generate_deterministic_uuid(self, message_id, country):
@@ -58,34 +65,50 @@ class TopInvestorCountriesCalculator(Monitorable):
         """
         return str(uuid.uuid5(uuid.UUID(message_id), country))
     
-    def __save_processed_message_id(self, client_id, message_id):
-        self._state[client_id][PROCESSED_MESSAGE_IDS][message_id] = time.time_ns()
-        if len(self._state[client_id][PROCESSED_MESSAGE_IDS]) > MAX_PROCESSED_MESSAGE_IDS:
-            oldest_message_id = min(self._state[client_id][PROCESSED_MESSAGE_IDS], key=self._state[client_id][PROCESSED_MESSAGE_IDS].get)
-            self._state[client_id][PROCESSED_MESSAGE_IDS].pop(oldest_message_id)
+    def __new_client_state(self):
+        return {INVESTMENT_BY_COUNTRY: {}, PROCESSED_MESSAGE_IDS: {}}
+    
+    def __get_top_k(self, client_state):
+        """
+        Get the incremental top k of a client, created from its counts the first time.
+        It updates the counts of the state in place and it is not persisted, as it is
+        rebuilt from them
+        """
+        if TOP_K not in client_state:
+            if self._top_k_mode == APPROXIMATE_TOP_K_MODE:
+                client_state[TOP_K] = SpaceSavingTopK(self._top_n_investor_countries, self._top_k_capacity, client_state[INVESTMENT_BY_COUNTRY])
+            else:
+                client_state[TOP_K] = TopK(self._top_n_investor_countries, client_state[INVESTMENT_BY_COUNTRY])
+        return client_state[TOP_K]
+    
+    def __apply_delta(self, client_state, delta):
+        message_id, processed_time, investment_by_country = delta
+        top_k = self.__get_top_k(client_state)
+        for country, investment in investment_by_country.items():
+            top_k.add(country, investment)
+        save_processed_message_id(client_state[PROCESSED_MESSAGE_IDS], message_id, processed_time)
     
     def __update_investments(self, movies_batch):
         client_id = movies_batch.client_id
-        self._state[client_id] = self._state.get(client_id, {INVESTMENT_BY_COUNTRY: {}, PROCESSED_MESSAGE_IDS: {}})
-        if movies_batch.message_id in self._state[client_id][PROCESSED_MESSAGE_IDS]:
+        if movies_batch.message_id in self._state.client_state(client_id)[PROCESSED_MESSAGE_IDS]:
             return
+        investment_by_country = {}
         for movie in movies_batch.get_items():
             for country in movie.production_countries:
-                self._state[client_id][INVESTMENT_BY_COUNTRY][country] = self._state[client_id][INVESTMENT_BY_COUNTRY].get(country, 0) + movie.budget
-        self.__save_processed_message_id(client_id, movies_batch.message_id)
-        self._storage_adapter.update(STATE_FILE_KEY, self._state[client_id], secondary_file_key=client_id)
+                investment_by_country[country] = investment_by_country.get(country, 0) + movie.budget
+        delta = (movies_batch.message_id, time.time_ns(), investment_by_country)
+        self._state.add_delta(client_id, delta)
     
     def __get_top_investor_countries(self, client_id):
         if client_id not in self._state:
             return []
-        sorted_investments = sorted(self._state[client_id][INVESTMENT_BY_COUNTRY].items(), key=lambda x: x[1], reverse=True)
-        top_investor_countries = sorted_investments[:self._top_n_investor_countries]
-        return top_investor_countries
+        return self.__get_top_k(self._state[client_id]).top()
     
-    def __clean_client_state(self, client_id):
-        if client_id in self._state:
-            self._state.pop(client_id)
-            self._storage_adapter.delete(STATE_FILE_KEY, secondary_file_key=client_id)
+    def __persistent_state(self, client_state):
+        """
+        Leave the top k out of the snapshots, as it is rebuilt from the counts
+        """
+        return {key: value for key, value in client_state.items() if key != TOP_K}
     
     def __handle_packet(self, packet):
         fail_with_probability(self._failure_probability, "before handling packet")
@@ -101,12 +124,14 @@ class TopInvestorCountriesCalculator(Monitorable):
                 self._middleware.send_message(PacketSerde.serialize(investor_country))
             self._middleware.send_message(PacketSerde.serialize(EOF(eof.client_id, message_id=eof.message_id)))
             logging.info("action: sent_eof | result: success")
+            # The results must be published before the state needed to send them again is deleted
+            self._middleware.flush()
             fail_with_probability(self._failure_probability, "after sending results and eof, before cleaning client state")
-            self.__clean_client_state(eof.client_id)
+            self._state.delete(eof.client_id)
         elif msg.packet_type() == PacketType.CLIENT_DISCONNECTED:
             client_disconnected = msg
             logging.debug(f"action: client_disconnected | result: success | client_id: {client_disconnected.client_id}")
-            self.__clean_client_state(client_disconnected.client_id)
+            self._state.delete(client_disconnected.client_id)
             self._middleware.send_message(PacketSerde.serialize(client_disconnected))
         else:
             logging.error(f"action: unexpected_packet_type | result: fail | packet_type: {msg.packet_type()}")
@@ -118,5 +143,9 @@ class TopInvestorCountriesCalculator(Monitorable):
         input_queues_and_callback_functions = [(input_queue[0], input_queue[1], self.__handle_packet) for input_queue in self._input_queues]
         self._middleware = Middleware(input_queues_and_callback_functions=input_queues_and_callback_functions,
                                       output_exchange=self._output_exchange,
+                                      prefetch_count=self._prefetch_count,
+                                      ack_batch_size=self._ack_batch_size,
+                                      ack_flush_interval_ms=self._ack_flush_interval_ms,
+                                      before_ack_function=self._state.save,
                                      )
         self._middleware.handle_messages()
@@ -39,6 +39,11 @@ def initialize_config():
         config_params["credits_router_by_movie_id"] = int(config["CLUSTER_SIZES"]["CREDITS_ROUTER_BY_MOVIE_ID"])
         config_params["movies_credits_joiner"] = int(config["CLUSTER_SIZES"]["MOVIES_CREDITS_JOINER"])
         config_params["movies_sentiment_analyzer"] = int(config["CLUSTER_SIZES"]["MOVIES_SENTIMENT_ANALYZER"])
+        config_params["top_investor_countries_calculator"] = int(config["CLUSTER_SIZES"]["TOP_INVESTOR_COUNTRIES_CALCULATOR"])
+        config_params["most_least_rated_movies_calculator"] = int(config["CLUSTER_SIZES"]["MOST_LEAST_RATED_MOVIES_CALCULATOR"])
+        config_params["top_actors_participation_calculator"] = int(config["CLUSTER_SIZES"]["TOP_ACTORS_PARTICIPATION_CALCULATOR"])
+        config_params["avg_rate_revenue_budget_calculator"] = int(config["CLUSTER_SIZES"]["AVG_RATE_REVENUE_BUDGET_CALCULATOR"])
+        config_params["aggregators_router"] = int(config["CLUSTER_SIZES"]["AGGREGATORS_ROUTER"])
         config_params["health_guard"] = int(config["CLUSTER_SIZES"]["HEALTH_GUARD"])
         
         config_params["clients"] = int(config["CLIENTS"]["CLIENTS"])
@@ -59,6 +64,8 @@ def initialize_config():
         config_params["failure_probabilities"]["most_least_rated_movies_calculator"] = failure_probabilities.get("most_least_rated_movies_calculator", 0.0)
         config_params["failure_probabilities"]["top_actors_participation_calculator"] = failure_probabilities.get("top_actors_participation_calculator", 0.0)
         config_params["failure_probabilities"]["avg_rate_revenue_budget_calculator"] = failure_probabilities.get("avg_rate_revenue_budget_calculator", 0.0)
+        config_params["failure_probabilities"]["aggregators_router"] = failure_probabilities.get("aggregators_router", 0.0)
+        config_params["failure_probabilities"]["results_merger"] = failure_probabilities.get("results_merger", 0.0)
     except KeyError as e:
         raise KeyError(f"Key was not found. Error: {e}")
     except ValueError as e:
@@ -112,7 +112,7 @@ def generate_filter_cluster(cluster_size, service_prefix, filter_field, filter_v
         ]
     )
 
-def generate_routing_cluster(cluster_size, service_prefix, input_queues, output_exchange_prefixes_and_dest_nodes_amount, failure_probability):
+def generate_routing_cluster(cluster_size, service_prefix, input_queues, output_exchange_prefixes_and_dest_nodes_amount, failure_probability, movie_ids_filter_input_exchange=None, movies_routing_field=None):
     """
     Generic function to generate a cluster of routing services
     
@@ -123,20 +123,27 @@ def generate_routing_cluster(cluster_size, service_prefix, input_queues, output_
         input_queues: Input queues configuration
         output_exchange_prefixes_and_dest_nodes_amount: Output exchange prefixes and their destination nodes amount
         failure_probability: Probability of service failure
+        movie_ids_filter_input_exchange: Exchange where the destination joiners publish their movie ids filters
+        movies_routing_field: Field of the movies used to choose their destination node
         
     Returns:
         Dictionary mapping service names to their configurations
     """    
+    environment = [
+        "PYTHONUNBUFFERED=1",
+        f"INPUT_QUEUES={input_queues}",
+        f"OUTPUT_EXCHANGE_PREFIXES_AND_DEST_NODES_AMOUNT={output_exchange_prefixes_and_dest_nodes_amount}",
+        f"FAILURE_PROBABILITY={failure_probability}",
+    ]
+    if movie_ids_filter_input_exchange:
+        environment.append(f"MOVIE_IDS_FILTER_INPUT_EXCHANGE={movie_ids_filter_input_exchange}")
+    if movies_routing_field:
+        environment.append(f"MOVIES_ROUTING_FIELD={movies_routing_field}")
     return generate_cluster(
         cluster_size=cluster_size,
         service_prefix=service_prefix,
         image="router",
-        environment=[
-            "PYTHONUNBUFFERED=1",
-            f"INPUT_QUEUES={input_queues}",
-            f"OUTPUT_EXCHANGE_PREFIXES_AND_DEST_NODES_AMOUNT={output_exchange_prefixes_and_dest_nodes_amount}",
-            f"FAILURE_PROBABILITY={failure_probability}",
-        ],
+        environment=environment,
         volumes=[
             "./controllers/router/config.ini:/config.ini"
         ],
@@ -145,7 +152,7 @@ def generate_routing_cluster(cluster_size, service_prefix, input_queues, output_
         ]
     )
 
-def generate_movies_joiner_cluster(cluster_size, service_prefix, input_queues_prefixes, output_exchange, failure_probability):
+def generate_movies_joiner_cluster(cluster_size, service_prefix, input_queues_prefixes, output_exchange, failure_probability, movie_ids_filter_exchange=None):
     """
     Generic function to generate a cluster of joiner services
     
@@ -155,6 +162,7 @@ def generate_movies_joiner_cluster(cluster_size, service_prefix, input_queues_pr
         input_queues_prefixes: List of input queues prefixes
         output_exchange: Output exchange name
         failure_probability: Probability of service failure
+        movie_ids_filter_exchange: Exchange where the movie ids filters are published
         
     Returns:
         Dictionary mapping service names to their configurations
@@ -165,11 +173,57 @@ def generate_movies_joiner_cluster(cluster_size, service_prefix, input_queues_pr
     for i in range(1, cluster_size + 1):
         service_name = f"{service_prefix}_{i}"
         input_queues = f"[{', '.join([f'("{prefix}_{i}", "{prefix}_{i}")' for prefix in input_queues_prefixes])}]"
+        environment = [
+            "PYTHONUNBUFFERED=1",
+            f"INPUT_QUEUES={input_queues}",
+            f"OUTPUT_EXCHANGE={output_exchange}",
+            f"FAILURE_PROBABILITY={failure_probability}",
+            f"CLUSTER_SIZE={cluster_size}",
+            f"ID={i}",
+            f"STORAGE_PATH={STORAGE_PATH}"
+        ]
+        if movie_ids_filter_exchange:
+            environment.append(f"MOVIE_IDS_FILTER_EXCHANGE={movie_ids_filter_exchange}")
         services[service_name] = generate_service(
             name=service_name,
             image='movies_joiner',
+            environment=environment,
+            volumes=[
+                "./controllers/movies_joiner/config.ini:/config.ini",
+                f"{service_name}_storage:{STORAGE_PATH}"
+            ],
+            networks=[
+                NETWORK_NAME
+            ]
+        )
+    
+    return services
+
+def generate_movies_sentiment_analyzer_cluster(cluster_size, service_prefix, field_to_analyze, input_queues, output_exchange, failure_probability):
+    """
+    Generic function to generate a cluster of sentiment analyzer services
+    
+    Args:
+        cluster_size: Number of instances to create
+        service_prefix: Prefix for the service names
+        field_to_analyze: Field to analyze
+        input_queues: Input queues configuration
+        output_exchange: Output exchange name
+        failure_probability: Probability of service failure
+        
+    Returns:
+        Dictionary mapping service names to their configurations
+    """
+    services = {}
+    
+    for i in range(1, cluster_size + 1):
+        service_name = f"{service_prefix}_{i}"
+        services[service_name] = generate_service(
+            name=service_name,
+            image="movies_sentiment_analyzer",
             environment=[
                 "PYTHONUNBUFFERED=1",
+                f"FIELD_TO_ANALYZE={field_to_analyze}",
                 f"INPUT_QUEUES={input_queues}",
                 f"OUTPUT_EXCHANGE={output_exchange}",
                 f"FAILURE_PROBABILITY={failure_probability}",
@@ -178,7 +232,7 @@ def generate_movies_joiner_cluster(cluster_size, service_prefix, input_queues_pr
                 f"STORAGE_PATH={STORAGE_PATH}"
             ],
             volumes=[
-                "./controllers/movies_joiner/config.ini:/config.ini",
+                "./controllers/movies_sentiment_analyzer/config.ini:/config.ini",
                 f"{service_name}_storage:{STORAGE_PATH}"
             ],
             networks=[
@@ -188,39 +242,107 @@ def generate_movies_joiner_cluster(cluster_size, service_prefix, input_queues_pr
     
     return services
 
-def generate_movies_sentiment_analyzer_cluster(cluster_size, service_prefix, field_to_analyze, input_queues, output_exchange, failure_probability):
+def generate_aggregator_service(service_name, image, environment, input_queue, output_exchange, failure_probability):
     """
-    Generic function to generate a cluster of sentiment analyzer services
+    Generic function to generate an aggregator service with its own storage
     
     Args:
-        cluster_size: Number of instances to create
-        service_prefix: Prefix for the service names
-        field_to_analyze: Field to analyze
-        input_queues: Input queues configuration
+        service_name: Name of the service
+        image: Docker image name
+        environment: Environment variables specific to the aggregator
+        input_queue: Input queue, bound to the exchange with the same name
         output_exchange: Output exchange name
         failure_probability: Probability of service failure
         
     Returns:
-        Dictionary mapping service names to their configurations
+        Dictionary with service configuration
     """
-    return generate_cluster(
-        cluster_size=cluster_size,
-        service_prefix=service_prefix,
-        image="movies_sentiment_analyzer",
+    return generate_service(
+        name=service_name,
+        image=image,
         environment=[
             "PYTHONUNBUFFERED=1",
-            f"FIELD_TO_ANALYZE={field_to_analyze}",
-            f"INPUT_QUEUES={input_queues}",
+            *environment,
+            f"INPUT_QUEUES=[('{input_queue}', '{input_queue}')]",
             f"OUTPUT_EXCHANGE={output_exchange}",
             f"FAILURE_PROBABILITY={failure_probability}",
+            f"STORAGE_PATH={STORAGE_PATH}"
+        ],
+        volumes=[
+            f"./controllers/{image}/config.ini:/config.ini",
+            f"{service_name}_storage:{STORAGE_PATH}"
+        ],
+        networks=[
+            NETWORK_NAME
+        ]
+    )
+
+def generate_sharded_aggregator(shards_amount, routers_amount, service_name, image, environment, input_queue, output_exchange, failure_probabilities, merger_environment=[], movies_routing_field=None):
+    """
+    Generic function to generate an aggregator. With a single shard it is one service.
+    Otherwise a cluster of routers partitions its input by key among the shards, which
+    send their partial results to a merger that sends the final results
+    
+    Args:
+        shards_amount: Number of aggregator instances
+        routers_amount: Number of routers partitioning the input among the shards
+        service_name: Name of the aggregator service, used as prefix of the sharded services
+        image: Docker image name of the aggregator
+        environment: Environment variables specific to the aggregator
+        input_queue: Input queue of the aggregator
+        output_exchange: Output exchange of the final results
+        failure_probabilities: Probabilities of failure of the aggregator, routers and merger
+        merger_environment: Environment variables specific to the merger
+        movies_routing_field: Field of the movies used by the routers to partition them
+        
+    Returns:
+        Dictionary mapping service names to their configurations
+    """
+    aggregator_failure_probability, router_failure_probability, merger_failure_probability = failure_probabilities
+    if shards_amount == 1:
+        return {service_name: generate_aggregator_service(service_name, image, environment, input_queue, output_exchange, aggregator_failure_probability)}
+    
+    shards_exchange_prefix = f"{input_queue}_shard"
+    partials_exchange = f"{service_name}_partials"
+    services = generate_routing_cluster(
+        cluster_size=routers_amount,
+        service_prefix=f"{service_name}_router",
+        input_queues=f'[("{input_queue}", "{input_queue}")]',
+        output_exchange_prefixes_and_dest_nodes_amount=f'[("{shards_exchange_prefix}", {shards_amount})]',
+        failure_probability=router_failure_probability,
+        movies_routing_field=movies_routing_field
+    )
+    for i in range(1, shards_amount + 1):
+        shard_service_name = f"{service_name}_{i}"
+        services[shard_service_name] = generate_aggregator_service(shard_service_name, image, environment, f"{shards_exchange_prefix}_{i}", partials_exchange, aggregator_failure_probability)
+    merger_service_name = f"{service_name}_merger"
+    services[merger_service_name] = generate_service(
+        name=merger_service_name,
+        image="results_merger",
+        environment=[
+            "PYTHONUNBUFFERED=1",
+            *merger_environment,
+            f"INPUT_QUEUES=[('{partials_exchange}', '{partials_exchange}')]",
+            f"OUTPUT_EXCHANGE={output_exchange}",
+            f"FAILURE_PROBABILITY={merger_failure_probability}",
+            f"STORAGE_PATH={STORAGE_PATH}",
+            f"PARTIALS_AMOUNT={shards_amount}"
         ],
         volumes=[
-            "./controllers/movies_sentiment_analyzer/config.ini:/config.ini"
+            "./controllers/results_merger/config.ini:/config.ini",
+            f"{merger_service_name}_storage:{STORAGE_PATH}"
         ],
         networks=[
             NETWORK_NAME
         ]
     )
+    return services
+
+def sharded_aggregator_storage_volumes(service_name, shards_amount):
+    """Get the names of the storage volumes of the services of an aggregator"""
+    if shards_amount == 1:
+        return [f"{service_name}_storage"]
+    return [f"{service_name}_{i}_storage" for i in range(1, shards_amount + 1)] + [f"{service_name}_merger_storage"]
 
 def generate_data_cleaner():
     """Generate data_cleaner service configuration"""
@@ -332,27 +454,23 @@ def generate_movies_filter_by_one_country_cluster(cluster_size, failure_probabil
         failure_probability=failure_probability
     )
     
-def generate_top_investor_countries_calculator(failure_probability):
-    """Generate the movies top investor countries calculator service configuration"""
-    service_name = "top_investor_countries_calculator"
-    return generate_service(
-        name=service_name,
+def generate_top_investor_countries_calculator(shards_amount, routers_amount, failure_probabilities):
+    """Generate the movies top investor countries calculator services configuration"""
+    return generate_sharded_aggregator(
+        shards_amount=shards_amount,
+        routers_amount=routers_amount,
+        service_name="top_investor_countries_calculator",
         image="top_investor_countries_calculator",
         environment=[
-            "PYTHONUNBUFFERED=1",
-            "TOP_N_INVESTOR_COUNTRIES=5",
-            "INPUT_QUEUES=[('movies_produced_by_one_country', 'movies_produced_by_one_country')]",
-            "OUTPUT_EXCHANGE=top_investor_countries",
-            f"FAILURE_PROBABILITY={failure_probability}",
-            f"STORAGE_PATH={STORAGE_PATH}"
+            "TOP_N_INVESTOR_COUNTRIES=5"
         ],
-        volumes=[
-            "./controllers/top_investor_countries_calculator/config.ini:/config.ini",
-            f"{service_name}_storage:{STORAGE_PATH}"
+        input_queue="movies_produced_by_one_country",
+        output_exchange="top_investor_countries",
+        failure_probabilities=failure_probabilities,
+        merger_environment=[
+            "TOP_N=5"
         ],
-        networks=[
-            NETWORK_NAME
-        ]
+        movies_routing_field="production_countries"
     )
     
 def generate_movies_filter_argentina_cluster(cluster_size, failure_probability):
@@ -398,7 +516,8 @@ def generate_ratings_router_by_movie_id_cluster(cluster_size, destination_nodes_
         service_prefix="ratings_router_by_movie_id",
         input_queues='[("ratings", "ratings")]',
         output_exchange_prefixes_and_dest_nodes_amount=f'[("ratings", {destination_nodes_amount})]',
-        failure_probability=failure_probability
+        failure_probability=failure_probability,
+        movie_ids_filter_input_exchange="movie_ids_filter_q3"
     )
     
 def generate_movies_ratings_joiner_cluster(cluster_size, failure_probability):
@@ -408,29 +527,21 @@ def generate_movies_ratings_joiner_cluster(cluster_size, failure_probability):
         service_prefix="movies_ratings_joiner",
         input_queues_prefixes=["movies_produced_in_argentina_released_after_2000_q3", "ratings"],
         output_exchange="ratings_movies_produced_in_argentina_released_after_2000",
-        failure_probability=failure_probability
+        failure_probability=failure_probability,
+        movie_ids_filter_exchange="movie_ids_filter_q3"
     )
     
-def generate_most_least_rated_movies_calculator(failure_probability):
-    """Generate the most and least rated movies calculator service configuration"""
-    service_name = "most_least_rated_movies_calculator"
-    return generate_service(
-        name=service_name,
+def generate_most_least_rated_movies_calculator(shards_amount, routers_amount, failure_probabilities):
+    """Generate the most and least rated movies calculator services configuration"""
+    return generate_sharded_aggregator(
+        shards_amount=shards_amount,
+        routers_amount=routers_amount,
+        service_name="most_least_rated_movies_calculator",
         image="most_least_rated_movies_calculator",
-        environment=[
-            "PYTHONUNBUFFERED=1",
-            "INPUT_QUEUES=[('ratings_movies_produced_in_argentina_released_after_2000', 'ratings_movies_produced_in_argentina_released_after_2000')]",
-            "OUTPUT_EXCHANGE=most_least_rated_movies_produced_in_argentina_released_after_2000",
-            f"FAILURE_PROBABILITY={failure_probability}",
-            f"STORAGE_PATH={STORAGE_PATH}"
-        ],
-        volumes=[
-            "./controllers/most_least_rated_movies_calculator/config.ini:/config.ini",
-            f"{service_name}_storage:{STORAGE_PATH}"
-        ],
-        networks=[
-            NETWORK_NAME
-        ]
+        environment=[],
+        input_queue="ratings_movies_produced_in_argentina_released_after_2000",
+        output_exchange="most_least_rated_movies_produced_in_argentina_released_after_2000",
+        failure_probabilities=failure_probabilities
     )
     
 def generate_credits_router_by_movie_id_cluster(cluster_size, destination_nodes_amount, failure_probability):
@@ -440,7 +551,8 @@ def generate_credits_router_by_movie_id_cluster(cluster_size, destination_nodes_
         service_prefix="credits_router_by_movie_id",
         input_queues='[("credits", "credits")]',
         output_exchange_prefixes_and_dest_nodes_amount=f'[("credits", {destination_nodes_amount})]',
-        failure_probability=failure_probability
+        failure_probability=failure_probability,
+        movie_ids_filter_input_exchange="movie_ids_filter_q4"
     )
     
 def generate_movies_credits_joiner_cluster(cluster_size, failure_probability):
@@ -450,29 +562,25 @@ def generate_movies_credits_joiner_cluster(cluster_size, failure_probability):
         service_prefix="movies_credits_joiner",
         input_queues_prefixes=["movies_produced_in_argentina_released_after_2000_q4", "credits"],
         output_exchange="credits_movies_produced_in_argentina_released_after_2000",
-        failure_probability=failure_probability
+        failure_probability=failure_probability,
+        movie_ids_filter_exchange="movie_ids_filter_q4"
     )
     
-def generate_top_actors_participation_calculator(failure_probability):
-    """Generate the top actors participation calculator service configuration"""
-    service_name = "top_actors_participation_calculator"
-    return generate_service(
-        name=service_name,
+def generate_top_actors_participation_calculator(shards_amount, routers_amount, failure_probabilities):
+    """Generate the top actors participation calculator services configuration"""
+    return generate_sharded_aggregator(
+        shards_amount=shards_amount,
+        routers_amount=routers_amount,
+        service_name="top_actors_participation_calculator",
         image="top_actors_participation_calculator",
         environment=[
-            "PYTHONUNBUFFERED=1",
-            "TOP_N_ACTORS_PARTICIPATION=10",
-            "INPUT_QUEUES=[('credits_movies_produced_in_argentina_released_after_2000', 'credits_movies_produced_in_argentina_released_after_2000')]",
-            "OUTPUT_EXCHANGE=top_actors_participation_movies_produced_in_argentina_released_after_2000",
-            f"FAILURE_PROBABILITY={failure_probability}",
-            f"STORAGE_PATH={STORAGE_PATH}"
-        ],
-        volumes=[
-            "./controllers/top_actors_participation_calculator/config.ini:/config.ini",
-            f"{service_name}_storage:{STORAGE_PATH}"
+            "TOP_N_ACTORS_PARTICIPATION=10"
         ],
-        networks=[
-            NETWORK_NAME
+        input_queue="credits_movies_produced_in_argentina_released_after_2000",
+        output_exchange="top_actors_participation_movies_produced_in_argentina_released_after_2000",
+        failure_probabilities=failure_probabilities,
+        merger_environment=[
+            "TOP_N=10"
         ]
     )
     
@@ -487,26 +595,17 @@ def generate_movies_sentiment_analyzer_by_overview_cluster(cluster_size, failure
         failure_probability=failure_probability
     )
     
-def generate_avg_rate_revenue_budget_calculator(failure_probability):
-    """Generate the average rate revenue budget calculator service configuration"""
-    service_name = "avg_rate_revenue_budget_calculator"
-    return generate_service(
-        name=service_name,
+def generate_avg_rate_revenue_budget_calculator(shards_amount, routers_amount, failure_probabilities):
+    """Generate the average rate revenue budget calculator services configuration"""
+    return generate_sharded_aggregator(
+        shards_amount=shards_amount,
+        routers_amount=routers_amount,
+        service_name="avg_rate_revenue_budget_calculator",
         image="avg_rate_revenue_budget_calculator",
-        environment=[
-            "PYTHONUNBUFFERED=1",
-            "INPUT_QUEUES=[('movies_sentiment_analyzed', 'movies_sentiment_analyzed')]",
-            "OUTPUT_EXCHANGE=avg_rate_revenue_budget_by_sentiment",
-            f"FAILURE_PROBABILITY={failure_probability}",
-            f"STORAGE_PATH={STORAGE_PATH}"
-        ],
-        volumes=[
-            "./controllers/avg_rate_revenue_budget_calculator/config.ini:/config.ini",
-            f"{service_name}_storage:{STORAGE_PATH}"
-        ],
-        networks=[
-            NETWORK_NAME
-        ]
+        environment=[],
+        input_queue="movies_sentiment_analyzed",
+        output_exchange="avg_rate_revenue_budget_by_sentiment",
+        failure_probabilities=failure_probabilities
     )
     
 def generate_health_guard_cluster(cluster_size):
@@ -565,13 +664,13 @@ def generate_storage_volumes_config(config_params):
         volume_name = f"movies_credits_joiner_{i}_storage"
         volumes[volume_name] = None
         
-    volumes["top_investor_countries_calculator_storage"] = None
-    
-    volumes["most_least_rated_movies_calculator_storage"] = None
-    
-    volumes["top_actors_participation_calculator_storage"] = None
-    
-    volumes["avg_rate_revenue_budget_calculator_storage"] = None
+    for i in range(1, config_params["movies_sentiment_analyzer"] + 1):
+        volume_name = f"movies_sentiment_analyzer_{i}_storage"
+        volumes[volume_name] = None
+        
+    for aggregator in ["top_investor_countries_calculator", "most_least_rated_movies_calculator", "top_actors_participation_calculator", "avg_rate_revenue_budget_calculator"]:
+        for volume_name in sharded_aggregator_storage_volumes(aggregator, config_params[aggregator]):
+            volumes[volume_name] = None
     
     volumes["data_cleaner_storage"] = None
     
@@ -617,9 +716,12 @@ def generate_docker_compose(config_params):
         config_params["failure_probabilities"]["movies_filter_by_one_production_country"]
     )
     docker_compose["services"].update(movies_filter_by_one_country_cluster)
-    docker_compose["services"]["top_investor_countries_calculator"] = generate_top_investor_countries_calculator(
-        config_params["failure_probabilities"]["top_investor_countries_calculator"]
+    top_investor_countries_calculator_services = generate_top_investor_countries_calculator(
+        config_params["top_investor_countries_calculator"],
+        config_params["aggregators_router"],
+        (config_params["failure_probabilities"]["top_investor_countries_calculator"], config_params["failure_probabilities"]["aggregators_router"], config_params["failure_probabilities"]["results_merger"])
     )
+    docker_compose["services"].update(top_investor_countries_calculator_services)
     
     # Queries 3 and 4
     movies_filter_argentina_cluster = generate_movies_filter_argentina_cluster(
@@ -652,9 +754,12 @@ def generate_docker_compose(config_params):
         config_params["failure_probabilities"]["movies_ratings_joiner"]
     )
     docker_compose["services"].update(movies_ratings_joiner_cluster)
-    docker_compose["services"]["most_least_rated_movies_calculator"] = generate_most_least_rated_movies_calculator(
-        config_params["failure_probabilities"]["most_least_rated_movies_calculator"]
+    most_least_rated_movies_calculator_services = generate_most_least_rated_movies_calculator(
+        config_params["most_least_rated_movies_calculator"],
+        config_params["aggregators_router"],
+        (config_params["failure_probabilities"]["most_least_rated_movies_calculator"], config_params["failure_probabilities"]["aggregators_router"], config_params["failure_probabilities"]["results_merger"])
     )
+    docker_compose["services"].update(most_least_rated_movies_calculator_services)
     
     # Query 4
     credits_router_by_movie_id_cluster = generate_credits_router_by_movie_id_cluster(
@@ -668,9 +773,12 @@ def generate_docker_compose(config_params):
         config_params["failure_probabilities"]["movies_credits_joiner"]
     )
     docker_compose["services"].update(movies_credits_joiner_cluster)
-    docker_compose["services"]["top_actors_participation_calculator"] = generate_top_actors_participation_calculator(
-        config_params["failure_probabilities"]["top_actors_participation_calculator"]
+    top_actors_participation_calculator_services = generate_top_actors_participation_calculator(
+        config_params["top_actors_participation_calculator"],
+        config_params["aggregators_router"],
+        (config_params["failure_probabilities"]["top_actors_participation_calculator"], config_params["failure_probabilities"]["aggregators_router"], config_params["failure_probabilities"]["results_merger"])
     )
+    docker_compose["services"].update(top_actors_participation_calculator_services)
 
     # Query 5
     movies_sentiment_analyzer_cluster = generate_movies_sentiment_analyzer_by_overview_cluster(
@@ -678,9 +786,12 @@ def generate_docker_compose(config_params):
         config_params["failure_probabilities"]["movies_sentiment_analyzer"]
     )
     docker_compose["services"].update(movies_sentiment_analyzer_cluster)
-    docker_compose["services"]["avg_rate_revenue_budget_calculator"] = generate_avg_rate_revenue_budget_calculator(
-        config_params["failure_probabilities"]["avg_rate_revenue_budget_calculator"]
+    avg_rate_revenue_budget_calculator_services = generate_avg_rate_revenue_budget_calculator(
+        config_params["avg_rate_revenue_budget_calculator"],
+        config_params["aggregators_router"],
+        (config_params["failure_probabilities"]["avg_rate_revenue_budget_calculator"], config_params["failure_probabilities"]["aggregators_router"], config_params["failure_probabilities"]["results_merger"])
     )
+    docker_compose["services"].update(avg_rate_revenue_budget_calculator_services)
     
     # Health guards
     health_guard_cluster = generate_health_guard_cluster(
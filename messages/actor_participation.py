@@ -2,7 +2,7 @@ from messages.base_message import BaseMessage
 from messages.packet_type import PacketType
 
 from messages.serialization import (
-    encode_string, encode_num,
+    FORMAT_VERSION,
 )
 
 class ActorParticipation(BaseMessage):
@@ -17,23 +17,20 @@ class ActorParticipation(BaseMessage):
     def packet_type(self):
         return PacketType.ACTOR_PARTICIPATION
 
-    def serialize(self):
-        payload = b""
-        payload += encode_string(self.message_id)
-        payload += encode_string(self.client_id)
-        payload += encode_string(self.actor)
-        payload += encode_num(self.participation)
-
-        return payload
+    def write(self, writer):
+        writer.write_string(self.message_id)
+        writer.write_string(self.client_id)
+        writer.write_string(self.actor)
+        writer.write_int(self.participation)
 
     @classmethod
-    def deserialize(cls, payload: bytes):
+    def deserialize(cls, payload: bytes, version=FORMAT_VERSION):
         offset = 0
         
         message_id, offset = cls.deserialize_string(payload, offset)
         client_id, offset = cls.deserialize_string(payload, offset)
         actor, offset = cls.deserialize_string(payload, offset)
-        participation, offset = cls.deserialize_int(payload, offset)
+        participation, offset = cls.deserialize_int(payload, offset, version)
 
         return cls(client_id, actor, participation, message_id)
     
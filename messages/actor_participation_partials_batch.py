@@ -0,0 +1,50 @@
+from messages.base_message import BaseMessage
+from messages.packet_type import PacketType
+
+from messages.serialization import (
+    FORMAT_VERSION,
+)
+
+class ActorParticipationPartialsBatch(BaseMessage):
+    """
+    Amount of movies of every actor, pre-aggregated by a joiner
+    """
+    def __init__(self, client_id, actors_participation, message_id=None):
+        super().__init__(client_id, message_id)
+        # (actor, participation) pairs, with every actor at most once
+        self.actors_participation = actors_participation
+
+    def __repr__(self):
+        return f"ActorParticipationPartialsBatch(amount_actors={len(self.actors_participation)})"
+        
+    def packet_type(self):
+        return PacketType.ACTOR_PARTICIPATION_PARTIALS_BATCH
+    
+    def add_item(self, item):
+        self.actors_participation.append(item)
+        
+    def get_items(self):
+        return self.actors_participation
+    
+    def write(self, writer):
+        writer.write_string(self.message_id)
+        writer.write_string(self.client_id)
+        for actor, participation in self.actors_participation:
+            writer.write_string(actor)
+            writer.write_int(participation)
+    
+    @classmethod
+    def deserialize(cls, payload: bytes, version=FORMAT_VERSION):
+        offset = 0
+        
+        message_id, offset = cls.deserialize_string(payload, offset)
+        client_id, offset = cls.deserialize_string(payload, offset)
+        
+        actors_participation = []
+        while offset < len(payload):
+            actor, offset = cls.deserialize_string(payload, offset)
+            participation, offset = cls.deserialize_int(payload, offset, version)
+            
+            actors_participation.append((actor, participation))
+
+        return cls(client_id, actors_participation, message_id)
@@ -1,5 +1,4 @@
 from enum import IntEnum
-from messages.serialization import encode_num
 
 class Sentiment(IntEnum):
     NEGATIVE = 0
@@ -30,10 +29,7 @@ class AnalyzedMovie:
     def __repr__(self):
         return f"AnalyzedMovie(revenue={self.revenue}, budget={self.budget}, sentiment={repr(self.sentiment)})"
     
-    def serialize(self):
-        payload = b""
-        payload += encode_num(self.revenue)
-        payload += encode_num(self.budget)
-        payload += encode_num(self.sentiment.value)
-
-        return payload
+    def write(self, writer):
+        writer.write_float(self.revenue)
+        writer.write_int(self.budget)
+        writer.write_int(self.sentiment.value)
@@ -3,7 +3,7 @@ from messages.packet_type import PacketType
 from messages.analyzed_movie import Sentiment, AnalyzedMovie
 
 from messages.serialization import (
-    encode_string,
+    FORMAT_VERSION,
 )
 
 class AnalyzedMoviesBatch(BaseMessage):
@@ -23,16 +23,14 @@ class AnalyzedMoviesBatch(BaseMessage):
     def get_items(self):
         return self.analyzed_movies
     
-    def serialize(self):
-        payload = b""
-        payload += encode_string(self.message_id)
-        payload += encode_string(self.client_id)
+    def write(self, writer):
+        writer.write_string(self.message_id)
+        writer.write_string(self.client_id)
         for analyzed_movie in self.analyzed_movies:
-            payload += analyzed_movie.serialize()
-        return payload
+            analyzed_movie.write(writer)
     
     @classmethod
-    def deserialize(cls, payload: bytes):
+    def deserialize(cls, payload: bytes, version=FORMAT_VERSION):
         offset = 0
         
         message_id, offset = cls.deserialize_string(payload, offset)
@@ -40,9 +38,9 @@ class AnalyzedMoviesBatch(BaseMessage):
         
         analyzed_movies = []
         while offset < len(payload):
-            revenue, offset = cls.deserialize_float(payload, offset)
-            budget, offset = cls.deserialize_int(payload, offset)
-            sentiment, offset = cls.deserialize_int(payload, offset)
+            revenue, offset = cls.deserialize_float(payload, offset, version)
+            budget, offset = cls.deserialize_int(payload, offset, version)
+            sentiment, offset = cls.deserialize_int(payload, offset, version)
             
             analyzed_movies.append(AnalyzedMovie(revenue, budget, Sentiment(sentiment)))
 
@@ -3,7 +3,7 @@ from messages.packet_type import PacketType
 from messages.analyzed_movie import Sentiment
 
 from messages.serialization import (
-    encode_string, encode_num,
+    FORMAT_VERSION,
 )
 
 class AvgRateRevenueBudget(BaseMessage):
@@ -18,23 +18,20 @@ class AvgRateRevenueBudget(BaseMessage):
     def packet_type(self):
         return PacketType.AVG_RATE_REVENUE_BUDGET
 
-    def serialize(self):
-        payload = b""
-        payload += encode_string(self.message_id)
-        payload += encode_string(self.client_id)
-        payload += encode_num(self.sentiment.value)
-        payload += encode_num(self.avg)
-
-        return payload
+    def write(self, writer):
+        writer.write_string(self.message_id)
+        writer.write_string(self.client_id)
+        writer.write_int(self.sentiment.value)
+        writer.write_float(self.avg)
 
     @classmethod
-    def deserialize(cls, payload: bytes):
+    def deserialize(cls, payload: bytes, version=FORMAT_VERSION):
         offset = 0
         
         message_id, offset = cls.deserialize_string(payload, offset)
         client_id, offset = cls.deserialize_string(payload, offset)
-        sentiment, offset = cls.deserialize_int(payload, offset)
-        avg, offset = cls.deserialize_float(payload, offset)
+        sentiment, offset = cls.deserialize_int(payload, offset, version)
+        avg, offset = cls.deserialize_float(payload, offset, version)
 
         return cls(client_id, Sentiment(sentiment), avg, message_id)
     
@@ -1,7 +1,7 @@
 import uuid
 
 from messages.serialization import (
-    LENGTH_FIELD,
+    LENGTH_FIELD, FORMAT_VERSION, PayloadWriter,
     decode_string, decode_strings_list, decode_date, decode_int, decode_float, decode_strings_set
 )
 
@@ -10,6 +10,11 @@ class BaseMessage:
         self.message_id = message_id or str(uuid.uuid4())
         self.client_id = client_id
     
+    def serialize(self, *args, **kwargs):
+        writer = PayloadWriter()
+        self.write(writer, *args, **kwargs)
+        return writer.getvalue()
+    
     @classmethod
     def deserialize_field(cls, payload: bytes, offset, decoder):
         length_field = int.from_bytes(payload[offset:offset+LENGTH_FIELD], 'big')
@@ -19,6 +24,16 @@ class BaseMessage:
         
         return field, offset
     
+    @classmethod
+    def deserialize_field_span(cls, payload: bytes, offset):
+        """
+        Skip a field without decoding it, returning the span of its encoded value
+        """
+        length_field = int.from_bytes(payload[offset:offset+LENGTH_FIELD], 'big')
+        offset += LENGTH_FIELD
+        
+        return (offset, offset + length_field), offset + length_field
+    
     @classmethod
     def deserialize_string(cls, payload: bytes, offset):
         return cls.deserialize_field(payload, offset, decode_string)
@@ -32,12 +47,12 @@ class BaseMessage:
         return cls.deserialize_field(payload, offset, decode_date)
 
     @classmethod
-    def deserialize_int(cls, payload: bytes, offset):
-        return cls.deserialize_field(payload, offset, decode_int)
+    def deserialize_int(cls, payload: bytes, offset, version=FORMAT_VERSION):
+        return cls.deserialize_field(payload, offset, lambda data_bytes: decode_int(data_bytes, version))
 
     @classmethod
-    def deserialize_float(cls, payload: bytes, offset):
-        return cls.deserialize_field(payload, offset, decode_float)
+    def deserialize_float(cls, payload: bytes, offset, version=FORMAT_VERSION):
+        return cls.deserialize_field(payload, offset, lambda data_bytes: decode_float(data_bytes, version))
 
     @classmethod
     def deserialize_strings_set(cls, payload: bytes, offset):
@@ -2,7 +2,7 @@ from messages.base_message import BaseMessage
 from messages.packet_type import PacketType
 
 from messages.serialization import (
-    encode_string,
+    FORMAT_VERSION,
 )
 
 class ClientDisconnected(BaseMessage):
@@ -15,15 +15,12 @@ class ClientDisconnected(BaseMessage):
     def packet_type(self):
         return PacketType.CLIENT_DISCONNECTED
 
-    def serialize(self):
-        payload = b""
-        payload += encode_string(self.message_id)
-        payload += encode_string(self.client_id)
-
-        return payload
+    def write(self, writer):
+        writer.write_string(self.message_id)
+        writer.write_string(self.client_id)
 
     @classmethod
-    def deserialize(cls, payload: bytes):
+    def deserialize(cls, payload: bytes, version=FORMAT_VERSION):
         offset = 0
         
         message_id, offset = cls.deserialize_string(payload, offset)
@@ -1,10 +1,10 @@
-from io import StringIO
-import csv
-import ast
 from messages.exceptions import InvalidLineError
+from messages.csv_lines import parse_csv_line
+from messages.names_list import parse_names_list
+from messages.lazy_field import LazyField
 
 from messages.serialization import (
-    encode_num, encode_strings_iterable,
+    LENGTH_FIELD, FORMAT_VERSION, decode_int, decode_strings_list,
 )
 
 TOTAL_FIELDS_IN_CSV_LINE = 3
@@ -17,18 +17,16 @@ class Credit:
     def __repr__(self):
         return f"Credit(movie_id={self.movie_id}, cast={self.cast})"
 
-    def serialize(self):
-        payload = b""
-        payload += encode_num(self.movie_id)
-        payload += encode_strings_iterable(self.cast)
-
-        return payload
+    def write(self, writer):
+        writer.write_int(self.movie_id)
+        writer.write_strings_iterable(self.cast)
     
     @classmethod
     def from_csv_line(cls, line: str):
-        reader = csv.reader(StringIO(line), quotechar='"', delimiter=',', quoting=csv.QUOTE_MINIMAL)
-        fields = next(reader)
+        return cls.from_csv_fields(parse_csv_line(line))
 
+    @classmethod
+    def from_csv_fields(cls, fields: list[str]):
         if len(fields) != TOTAL_FIELDS_IN_CSV_LINE:
             raise InvalidLineError(f"Invalid amount of line fields: {len(fields)}")
 
@@ -50,7 +48,30 @@ class Credit:
         if not cast_str:
             raise InvalidLineError("Invalid cast: empty")
         try:
-            cast_json = ast.literal_eval(cast_str)
-            return [c['name'] for c in cast_json]
+            return parse_names_list(cast_str)
         except (ValueError, SyntaxError):
             return []
+
+class LazyCredit(Credit):
+    """
+    Credit that references its encoded fields in the payload of the batch it was
+    deserialized from. Fields are decoded on first access, and an unmodified credit is
+    serialized by copying its encoded bytes
+    """
+    movie_id = LazyField(decode_int, numeric=True)
+    cast = LazyField(decode_strings_list)
+
+    def __init__(self, payload, fields_spans, version=FORMAT_VERSION):
+        self._payload = payload
+        self._fields_spans = fields_spans
+        self._version = version
+        self._decoded_fields = {}
+        self._modified = False
+
+    def write(self, writer):
+        if self._modified or self._version != FORMAT_VERSION:
+            super().write(writer)
+            return
+        start, _ = self._fields_spans['movie_id']
+        _, end = self._fields_spans['cast']
+        writer.write_bytes(self._payload[start-LENGTH_FIELD:end])
@@ -1,10 +1,12 @@
 from messages.base_message import BaseMessage
 from messages.packet_type import PacketType
-from messages.credit import Credit
+from messages.credit import Credit, LazyCredit
 from messages.exceptions import InvalidLineError
+from messages.csv_lines import parse_csv_lines
+from messages.indexed_batch import write_batch_index
 
 from messages.serialization import (
-    encode_string,
+    FORMAT_VERSION,
 )
 
 class CreditsBatch(BaseMessage):
@@ -24,16 +26,19 @@ class CreditsBatch(BaseMessage):
     def get_items(self):
         return self.credits
     
-    def serialize(self):
-        payload = b""
-        payload += encode_string(self.message_id)
-        payload += encode_string(self.client_id)
+    def write(self, writer, indexed=False):
+        payload_start = writer.tell()
+        writer.write_string(self.message_id)
+        writer.write_string(self.client_id)
+        ends = []
         for credit in self.credits:
-            payload += credit.serialize()
-        return payload
+            credit.write(writer)
+            ends.append(writer.tell() - payload_start)
+        if indexed:
+            write_batch_index(writer, [credit.movie_id for credit in self.credits], ends)
     
     @classmethod
-    def deserialize(cls, payload: bytes):
+    def deserialize(cls, payload: bytes, version=FORMAT_VERSION):
         offset = 0
         
         message_id, offset = cls.deserialize_string(payload, offset)
@@ -41,19 +46,19 @@ class CreditsBatch(BaseMessage):
         
         credits = []
         while offset < len(payload):
-            movie_id, offset = cls.deserialize_int(payload, offset)
-            cast, offset = cls.deserialize_strings_list(payload, offset)
+            movie_id_span, offset = cls.deserialize_field_span(payload, offset)
+            cast_span, offset = cls.deserialize_field_span(payload, offset)
             
-            credits.append(Credit(movie_id, cast))
+            credits.append(LazyCredit(payload, {'movie_id': movie_id_span, 'cast': cast_span}, version))
 
         return cls(client_id, credits, message_id)
     
     @classmethod
     def from_csv_lines(cls, client_id, lines: list[str]):
         credits = []
-        for line in lines:
+        for fields in parse_csv_lines(lines):
             try:
-                credit = Credit.from_csv_line(line)
+                credit = Credit.from_csv_fields(fields)
                 credits.append(credit)
             except InvalidLineError:
                 continue
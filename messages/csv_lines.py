@@ -0,0 +1,22 @@
+from io import StringIO
+import csv
+
+def parse_csv_lines(lines):
+    """
+    Parse csv lines with a single reader, yielding the fields of every line. A line
+    with an unterminated quoted field makes the reader take the lines after it as part
+    of the same record, so the lines of that record are parsed one by one instead
+    """
+    reader = csv.reader(lines, quotechar='"', delimiter=',', quoting=csv.QUOTE_MINIMAL)
+    parsed_lines_amount = 0
+    for fields in reader:
+        if reader.line_num == parsed_lines_amount + 1:
+            yield fields
+        else:
+            for line in lines[parsed_lines_amount:reader.line_num]:
+                yield parse_csv_line(line)
+        parsed_lines_amount = reader.line_num
+
+def parse_csv_line(line):
+    reader = csv.reader(StringIO(line), quotechar='"', delimiter=',', quoting=csv.QUOTE_MINIMAL)
+    return next(reader, [])
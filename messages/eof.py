@@ -2,7 +2,7 @@ from messages.base_message import BaseMessage
 from messages.packet_type import PacketType
 
 from messages.serialization import (
-    encode_string, encode_strings_iterable,
+    FORMAT_VERSION,
 )
 
 class EOF(BaseMessage):
@@ -16,16 +16,13 @@ class EOF(BaseMessage):
     def add_seen_id(self, id):
         self.seen_ids.add(id)
     
-    def serialize(self):
-        payload = b""
-        payload += encode_string(self.message_id)
-        payload += encode_string(self.client_id)
-        payload += encode_strings_iterable(self.seen_ids)
-        
-        return payload 
+    def write(self, writer):
+        writer.write_string(self.message_id)
+        writer.write_string(self.client_id)
+        writer.write_strings_iterable(self.seen_ids)
 
     @classmethod
-    def deserialize(cls, payload: bytes):
+    def deserialize(cls, payload: bytes, version=FORMAT_VERSION):
         offset = 0
         
         message_id, offset = cls.deserialize_string(payload, offset)
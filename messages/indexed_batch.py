@@ -0,0 +1,81 @@
+import struct
+from messages.base_message import BaseMessage
+
+LENGTH_ITEMS_AMOUNT = 4
+# Routing key of the item and offset where the item ends, relative to the payload start
+ITEM_INDEX_ENTRY = struct.Struct('>qI')
+
+def write_batch_index(writer, keys, ends):
+    """
+    Append the index of a batch after its items. The amount of items goes last, so
+    the index can be found from the end of the payload
+    """
+    for key, end in zip(keys, ends):
+        writer.write_bytes(ITEM_INDEX_ENTRY.pack(key, end))
+    writer.write_bytes(len(ends).to_bytes(LENGTH_ITEMS_AMOUNT, 'big'))
+
+def split_batch_index(payload):
+    """
+    Split a payload written with an index into the payload without it, the keys of
+    its items and the offsets where they end
+    """
+    amount_items = int.from_bytes(payload[len(payload)-LENGTH_ITEMS_AMOUNT:], 'big')
+    index_start = len(payload) - LENGTH_ITEMS_AMOUNT - amount_items * ITEM_INDEX_ENTRY.size
+    keys = []
+    ends = []
+    for key, end in ITEM_INDEX_ENTRY.iter_unpack(payload[index_start:len(payload)-LENGTH_ITEMS_AMOUNT]):
+        keys.append(key)
+        ends.append(end)
+    return payload[:index_start], keys, ends
+
+class IndexedBatch(BaseMessage):
+    """
+    View of a serialized batch that was written with an index of its items. Items are
+    only known by their routing key and the span of their encoded bytes, so a batch is
+    split by copying byte ranges without decoding or building any item
+    """
+    def __init__(self, client_id, packet_type, payload, keys, items_spans, message_id=None):
+        super().__init__(client_id, message_id)
+        self._packet_type = packet_type
+        self._payload = payload
+        self.keys = keys
+        self._items_spans = items_spans
+
+    def __repr__(self):
+        return f"IndexedBatch(packet_type={self._packet_type}, amount_items={len(self.keys)})"
+
+    def __len__(self):
+        return len(self.keys)
+
+    def packet_type(self):
+        return self._packet_type
+
+    @classmethod
+    def deserialize(cls, packet_type, payload: bytes, keys, ends):
+        offset = 0
+
+        message_id, offset = cls.deserialize_string(payload, offset)
+        client_id, offset = cls.deserialize_string(payload, offset)
+
+        items_spans = list(zip([offset] + ends[:-1], ends))
+
+        return cls(client_id, packet_type, payload, keys, items_spans, message_id)
+
+    def take(self, indexes, message_id=None):
+        """
+        Create a view with the items at the given positions
+        """
+        keys = [self.keys[i] for i in indexes]
+        items_spans = [self._items_spans[i] for i in indexes]
+        return IndexedBatch(self.client_id, self._packet_type, self._payload, keys, items_spans, message_id=message_id)
+
+    def write(self, writer, indexed=False):
+        payload_start = writer.tell()
+        writer.write_string(self.message_id)
+        writer.write_string(self.client_id)
+        ends = []
+        for start, end in self._items_spans:
+            writer.write_bytes(self._payload[start:end])
+            ends.append(writer.tell() - payload_start)
+        if indexed:
+            write_batch_index(writer, self.keys, ends)
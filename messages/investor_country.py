@@ -2,7 +2,7 @@ from messages.base_message import BaseMessage
 from messages.packet_type import PacketType
 
 from messages.serialization import (
-    encode_string, encode_num,
+    FORMAT_VERSION,
 )
 
 class InvestorCountry(BaseMessage):
@@ -17,23 +17,20 @@ class InvestorCountry(BaseMessage):
     def packet_type(self):
         return PacketType.INVESTOR_COUNTRY
 
-    def serialize(self):
-        payload = b""
-        payload += encode_string(self.message_id)
-        payload += encode_string(self.client_id)
-        payload += encode_string(self.country)
-        payload += encode_num(self.investment)
-
-        return payload
+    def write(self, writer):
+        writer.write_string(self.message_id)
+        writer.write_string(self.client_id)
+        writer.write_string(self.country)
+        writer.write_int(self.investment)
 
     @classmethod
-    def deserialize(cls, payload: bytes):
+    def deserialize(cls, payload: bytes, version=FORMAT_VERSION):
         offset = 0
         
         message_id, offset = cls.deserialize_string(payload, offset)
         client_id, offset = cls.deserialize_string(payload, offset)
         country, offset = cls.deserialize_string(payload, offset)
-        investment, offset = cls.deserialize_int(payload, offset)
+        investment, offset = cls.deserialize_int(payload, offset, version)
 
         return cls(client_id, country, investment, message_id)
     
@@ -0,0 +1,31 @@
+class LazyField:
+    """
+    Field of a message item that is decoded from the serialized payload on first access.
+    The instance keeps the payload, the span of every encoded field in it and the fields
+    already decoded. Assigning a field marks the item as modified, so it is not
+    serialized back by copying its encoded bytes. Numeric fields are decoded according
+    to the wire format version of the payload
+    """
+    def __init__(self, decoder, numeric=False):
+        self._decoder = decoder
+        self._numeric = numeric
+
+    def __set_name__(self, owner, name):
+        self._name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        decoded_fields = instance._decoded_fields
+        if self._name not in decoded_fields:
+            start, end = instance._fields_spans.get(self._name, (0, 0))
+            data_bytes = instance._payload[start:end]
+            if self._numeric:
+                decoded_fields[self._name] = self._decoder(data_bytes, instance._version)
+            else:
+                decoded_fields[self._name] = self._decoder(data_bytes)
+        return decoded_fields[self._name]
+
+    def __set__(self, instance, value):
+        instance._decoded_fields[self._name] = value
+        instance._modified = True
@@ -1,8 +1,12 @@
-from io import StringIO
-import csv
-import ast
 from datetime import datetime
 from messages.exceptions import InvalidLineError
+from messages.csv_lines import parse_csv_line
+from messages.names_list import parse_names_list
+from messages.lazy_field import LazyField
+
+from messages.serialization import (
+    LENGTH_FIELD, FORMAT_VERSION, decode_string, decode_int, decode_float, decode_strings_list, decode_date
+)
 
 TOTAL_FIELDS_IN_CSV_LINE = 24
 
@@ -20,11 +24,15 @@ class Movie:
     def __repr__(self):
         return f"Movie(id={self.id}, title={self.title}, genres={self.genres}, production_countries={self.production_countries}, release_date={self.release_date}, budget={self.budget}, overview={self.overview}, revenue={self.revenue})"
 
+    def write_field(self, writer, field, write):
+        write(writer, getattr(self, field))
+
     @classmethod
     def from_csv_line(cls, line: str):
-        reader = csv.reader(StringIO(line), quotechar='"', delimiter=',', quoting=csv.QUOTE_MINIMAL)
-        fields = next(reader)
+        return cls.from_csv_fields(parse_csv_line(line))
 
+    @classmethod
+    def from_csv_fields(cls, fields: list[str]):
         if len(fields) != TOTAL_FIELDS_IN_CSV_LINE:
             raise InvalidLineError(f"Invalid amount of line fields: {len(fields)}")
 
@@ -62,8 +70,7 @@ class Movie:
         if not genres_str:
             raise InvalidLineError("Invalid genres: empty")
         try:
-            genres_json = ast.literal_eval(genres_str)
-            return [g['name'] for g in genres_json]
+            return parse_names_list(genres_str)
         except (ValueError, SyntaxError):
             return []
     
@@ -86,8 +93,7 @@ class Movie:
         if not production_countries_str:
             raise InvalidLineError("Invalid production_countries: empty")
         try:
-            countries_json = ast.literal_eval(production_countries_str)
-            return [c['name'] for c in countries_json]
+            return parse_names_list(production_countries_str)
         except (ValueError, SyntaxError):
             return []
     
@@ -141,4 +147,33 @@ class Movie:
         if self.revenue is not None:
             result_line.append(str(self.revenue))
             
-        return ','.join(result_line)
\ No newline at end of file
+        return ','.join(result_line)
+
+class LazyMovie(Movie):
+    """
+    Movie that references its encoded fields in the payload of the batch it was
+    deserialized from. Fields are decoded on first access, and the fields that were
+    never accessed are serialized by copying their encoded bytes
+    """
+    id = LazyField(decode_int, numeric=True)
+    title = LazyField(decode_string)
+    genres = LazyField(decode_strings_list)
+    production_countries = LazyField(decode_strings_list)
+    release_date = LazyField(decode_date)
+    budget = LazyField(decode_int, numeric=True)
+    overview = LazyField(decode_string)
+    revenue = LazyField(decode_float, numeric=True)
+
+    def __init__(self, payload, fields_spans, version=FORMAT_VERSION):
+        self._payload = payload
+        self._fields_spans = fields_spans
+        self._version = version
+        self._decoded_fields = {}
+        self._modified = False
+
+    def write_field(self, writer, field, write):
+        if field in self._decoded_fields or field not in self._fields_spans or self._version != FORMAT_VERSION:
+            super().write_field(writer, field, write)
+            return
+        start, end = self._fields_spans[field]
+        writer.write_bytes(self._payload[start-LENGTH_FIELD:end])
@@ -1,7 +1,3 @@
-from messages.serialization import (
-    encode_num, encode_string, encode_strings_iterable,
-)
-
 class MovieCredit:
     def __init__(self, id, title, cast):
         self.id = id
@@ -11,10 +7,7 @@ class MovieCredit:
     def __repr__(self):
         return f"MovieCredit(id={self.id}, title={self.title}, cast={self.cast})"
 
-    def serialize(self):
-        payload = b""
-        payload += encode_num(self.id)
-        payload += encode_string(self.title)
-        payload += encode_strings_iterable(self.cast)
-
-        return payload
+    def write(self, writer):
+        writer.write_int(self.id)
+        writer.write_string(self.title)
+        writer.write_strings_iterable(self.cast)
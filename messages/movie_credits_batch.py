@@ -3,7 +3,7 @@ from messages.packet_type import PacketType
 from messages.movie_credit import MovieCredit
 
 from messages.serialization import (
-    encode_string,
+    FORMAT_VERSION,
 )
 
 class MovieCreditsBatch(BaseMessage):
@@ -23,16 +23,14 @@ class MovieCreditsBatch(BaseMessage):
     def get_items(self):
         return self.movie_credits
     
-    def serialize(self):
-        payload = b""
-        payload += encode_string(self.message_id)
-        payload += encode_string(self.client_id)
+    def write(self, writer):
+        writer.write_string(self.message_id)
+        writer.write_string(self.client_id)
         for movie_credit in self.movie_credits:
-            payload += movie_credit.serialize()
-        return payload
+            movie_credit.write(writer)
     
     @classmethod
-    def deserialize(cls, payload: bytes):
+    def deserialize(cls, payload: bytes, version=FORMAT_VERSION):
         offset = 0
         
         message_id, offset = cls.deserialize_string(payload, offset)
@@ -40,7 +38,7 @@ class MovieCreditsBatch(BaseMessage):
         
         movie_credits = []
         while offset < len(payload):
-            id, offset = cls.deserialize_int(payload, offset)
+            id, offset = cls.deserialize_int(payload, offset, version)
             title, offset = cls.deserialize_string(payload, offset)
             cast, offset = cls.deserialize_strings_list(payload, offset)
             
@@ -0,0 +1,49 @@
+from messages.base_message import BaseMessage
+from messages.packet_type import PacketType
+from common.bloom_filter import BloomFilter
+
+from messages.serialization import (
+    FORMAT_VERSION,
+)
+
+LENGTH_BITS = 4
+
+class MovieIdsFilter(BaseMessage):
+    """
+    Bloom filter with the ids of the movies a joiner holds for a client. The joiner is
+    identified by the exchange it consumes the items to join from
+    """
+    def __init__(self, client_id, input_exchange, bloom_filter, message_id=None):
+        super().__init__(client_id, message_id)
+        self.input_exchange = input_exchange
+        self.bloom_filter = bloom_filter
+
+    def __repr__(self):
+        return f"MovieIdsFilter(input_exchange={self.input_exchange}, bloom_filter={self.bloom_filter})"
+
+    def packet_type(self):
+        return PacketType.MOVIE_IDS_FILTER
+
+    def write(self, writer):
+        writer.write_string(self.message_id)
+        writer.write_string(self.client_id)
+        writer.write_string(self.input_exchange)
+        writer.write_int(self.bloom_filter.bits_amount)
+        writer.write_int(self.bloom_filter.hashes_amount)
+        writer.write_bytes(len(self.bloom_filter.bits).to_bytes(LENGTH_BITS, 'big'))
+        writer.write_bytes(self.bloom_filter.bits)
+
+    @classmethod
+    def deserialize(cls, payload: bytes, version=FORMAT_VERSION):
+        offset = 0
+
+        message_id, offset = cls.deserialize_string(payload, offset)
+        client_id, offset = cls.deserialize_string(payload, offset)
+        input_exchange, offset = cls.deserialize_string(payload, offset)
+        bits_amount, offset = cls.deserialize_int(payload, offset, version)
+        hashes_amount, offset = cls.deserialize_int(payload, offset, version)
+        length_bits = int.from_bytes(payload[offset:offset+LENGTH_BITS], 'big')
+        offset += LENGTH_BITS
+        bits = payload[offset:offset+length_bits]
+
+        return cls(client_id, input_exchange, BloomFilter(bits_amount, hashes_amount, bits), message_id)
@@ -0,0 +1,18 @@
+class MovieRatingPartial:
+    """
+    Sum and amount of the ratings of a movie, pre-aggregated by a joiner
+    """
+    def __init__(self, id, title, sum_ratings, amount_ratings):
+        self.id = id
+        self.title = title
+        self.sum_ratings = sum_ratings
+        self.amount_ratings = amount_ratings
+        
+    def __repr__(self):
+        return f"MovieRatingPartial(id={self.id}, title={self.title}, sum_ratings={self.sum_ratings}, amount_ratings={self.amount_ratings})"
+
+    def write(self, writer):
+        writer.write_int(self.id)
+        writer.write_string(self.title)
+        writer.write_float(self.sum_ratings)
+        writer.write_int(self.amount_ratings)
@@ -0,0 +1,48 @@
+from messages.base_message import BaseMessage
+from messages.packet_type import PacketType
+from messages.movie_rating_partial import MovieRatingPartial
+
+from messages.serialization import (
+    FORMAT_VERSION,
+)
+
+class MovieRatingPartialsBatch(BaseMessage):
+    def __init__(self, client_id, movie_rating_partials, message_id=None):
+        super().__init__(client_id, message_id)
+        self.movie_rating_partials = movie_rating_partials
+
+    def __repr__(self):
+        return f"MovieRatingPartialsBatch(amount_movie_rating_partials={len(self.movie_rating_partials)})"
+        
+    def packet_type(self):
+        return PacketType.MOVIE_RATING_PARTIALS_BATCH
+    
+    def add_item(self, item: MovieRatingPartial):
+        self.movie_rating_partials.append(item)
+        
+    def get_items(self):
+        return self.movie_rating_partials
+    
+    def write(self, writer):
+        writer.write_string(self.message_id)
+        writer.write_string(self.client_id)
+        for movie_rating_partial in self.movie_rating_partials:
+            movie_rating_partial.write(writer)
+    
+    @classmethod
+    def deserialize(cls, payload: bytes, version=FORMAT_VERSION):
+        offset = 0
+        
+        message_id, offset = cls.deserialize_string(payload, offset)
+        client_id, offset = cls.deserialize_string(payload, offset)
+        
+        movie_rating_partials = []
+        while offset < len(payload):
+            id, offset = cls.deserialize_int(payload, offset, version)
+            title, offset = cls.deserialize_string(payload, offset)
+            sum_ratings, offset = cls.deserialize_float(payload, offset, version)
+            amount_ratings, offset = cls.deserialize_int(payload, offset, version)
+            
+            movie_rating_partials.append(MovieRatingPartial(id, title, sum_ratings, amount_ratings))
+
+        return cls(client_id, movie_rating_partials, message_id)
@@ -3,7 +3,7 @@ from messages.packet_type import PacketType
 from messages.movie_rating import MovieRating
 
 from messages.serialization import (
-    encode_string,
+    FORMAT_VERSION,
 )
 
 class MovieRatingsBatch(BaseMessage):
@@ -23,16 +23,14 @@ class MovieRatingsBatch(BaseMessage):
     def get_items(self):
         return self.movie_ratings
     
-    def serialize(self):
-        payload = b""
-        payload += encode_string(self.message_id)
-        payload += encode_string(self.client_id)
+    def write(self, writer):
+        writer.write_string(self.message_id)
+        writer.write_string(self.client_id)
         for movie_rating in self.movie_ratings:
-            payload += movie_rating.serialize()
-        return payload
+            movie_rating.write(writer)
     
     @classmethod
-    def deserialize(cls, payload: bytes):
+    def deserialize(cls, payload: bytes, version=FORMAT_VERSION):
         offset = 0
         
         message_id, offset = cls.deserialize_string(payload, offset)
@@ -40,9 +38,9 @@ class MovieRatingsBatch(BaseMessage):
         
         movie_ratings = []
         while offset < len(payload):
-            id, offset = cls.deserialize_int(payload, offset)
+            id, offset = cls.deserialize_int(payload, offset, version)
             title, offset = cls.deserialize_string(payload, offset)
-            rating, offset = cls.deserialize_float(payload, offset)
+            rating, offset = cls.deserialize_float(payload, offset, version)
             
             movie_ratings.append(MovieRating(id, title, rating))
 
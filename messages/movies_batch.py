@@ -1,12 +1,12 @@
 from enum import IntEnum
 from messages.base_message import BaseMessage
 from messages.packet_type import PacketType
-from messages.movie import Movie
+from messages.movie import Movie, LazyMovie
 from messages.exceptions import InvalidLineError
+from messages.csv_lines import parse_csv_lines
 
 from messages.serialization import (
-    encode_string, encode_num, encode_strings_iterable, encode_date,
-    decode_string, decode_int, decode_float, decode_strings_list, decode_date
+    LENGTH_FIELD, FORMAT_VERSION, PayloadWriter,
 )
 
 LENGTH_MOVIES_AMOUNT = 2
@@ -39,62 +39,50 @@ class MoviesBatch(BaseMessage):
     def get_items(self):
         return self.movies
     
-    def serialize(self, fields_subset=None):
-        field_type_and_encode_map = {
-            'id': (FieldType.ID, encode_num),
-            'title': (FieldType.TITLE, encode_string),
-            'genres': (FieldType.GENRES, encode_strings_iterable),
-            'production_countries': (FieldType.PRODUCTION_COUNTRIES, encode_strings_iterable),
-            'release_date': (FieldType.RELEASE_DATE, encode_date),
-            'budget': (FieldType.BUDGET, encode_num),
-            'overview': (FieldType.OVERVIEW, encode_string),
-            'revenue': (FieldType.REVENUE, encode_num),
+    def write(self, writer, fields_subset=None):
+        field_type_and_write_map = {
+            'id': (FieldType.ID, PayloadWriter.write_int),
+            'title': (FieldType.TITLE, PayloadWriter.write_string),
+            'genres': (FieldType.GENRES, PayloadWriter.write_strings_iterable),
+            'production_countries': (FieldType.PRODUCTION_COUNTRIES, PayloadWriter.write_strings_iterable),
+            'release_date': (FieldType.RELEASE_DATE, PayloadWriter.write_date),
+            'budget': (FieldType.BUDGET, PayloadWriter.write_int),
+            'overview': (FieldType.OVERVIEW, PayloadWriter.write_string),
+            'revenue': (FieldType.REVENUE, PayloadWriter.write_float),
         }
 
-        payload = b""
-        payload += encode_string(self.message_id)
-        payload += encode_string(self.client_id)
+        writer.write_string(self.message_id)
+        writer.write_string(self.client_id)
         
-        payload += len(self.movies).to_bytes(LENGTH_MOVIES_AMOUNT, 'big')
+        writer.write_bytes(len(self.movies).to_bytes(LENGTH_MOVIES_AMOUNT, 'big'))
         
-        fields = fields_subset if fields_subset is not None else field_type_and_encode_map.keys()
+        fields = fields_subset if fields_subset is not None else field_type_and_write_map.keys()
         for field in fields:
-            if field not in field_type_and_encode_map:
+            if field not in field_type_and_write_map:
                 continue
-            field_type, encode = field_type_and_encode_map[field]
-            encoded_field_type = field_type.to_bytes(LENGTH_FIELD_TYPE, 'big')
+            field_type, write = field_type_and_write_map[field]
+            field_start = writer.tell()
+            writer.write_bytes(field_type.to_bytes(LENGTH_FIELD_TYPE, 'big'))
             
-            movies_that_have_value = 0
-            
-            encoded_fields = b""
             for movie in self.movies:
-                field_value = getattr(movie, field)
-                if isinstance(field_value, (list, str)):
-                    if len(field_value) != 0:
-                        movies_that_have_value += 1
-                elif field_value is not None:
-                    movies_that_have_value += 1
-                encoded_field = encode(field_value)
-                encoded_fields += encoded_field
-                
-            if movies_that_have_value == 0:
-                continue
-
-            payload += encoded_field_type + encoded_fields
-
-        return payload
+                movie.write_field(writer, field, write)
+            
+            # Empty strings and lists and missing values are encoded as just their length,
+            # so a field no movie has a value for is dropped
+            if writer.tell() - field_start == LENGTH_FIELD_TYPE + LENGTH_FIELD * len(self.movies):
+                writer.truncate(field_start)
     
     @classmethod
-    def deserialize(cls, payload: bytes):
-        field_name_and_decoder = {
-            FieldType.ID: ('id', decode_int),
-            FieldType.TITLE: ('title', decode_string),
-            FieldType.GENRES: ('genres', decode_strings_list),
-            FieldType.PRODUCTION_COUNTRIES: ('production_countries', decode_strings_list),
-            FieldType.RELEASE_DATE: ('release_date', decode_date),
-            FieldType.BUDGET: ('budget', decode_int),
-            FieldType.OVERVIEW: ('overview', decode_string),
-            FieldType.REVENUE: ('revenue', decode_float),
+    def deserialize(cls, payload: bytes, version=FORMAT_VERSION):
+        field_names = {
+            FieldType.ID: 'id',
+            FieldType.TITLE: 'title',
+            FieldType.GENRES: 'genres',
+            FieldType.PRODUCTION_COUNTRIES: 'production_countries',
+            FieldType.RELEASE_DATE: 'release_date',
+            FieldType.BUDGET: 'budget',
+            FieldType.OVERVIEW: 'overview',
+            FieldType.REVENUE: 'revenue',
         }
 
         offset = 0
@@ -105,26 +93,27 @@ class MoviesBatch(BaseMessage):
         amount_movies = int.from_bytes(payload[offset:offset+LENGTH_MOVIES_AMOUNT], 'big')
         offset += LENGTH_MOVIES_AMOUNT
         
-        movies = [Movie() for _ in range(amount_movies)]
+        movies_fields_spans = [{} for _ in range(amount_movies)]
         
         while offset < len(payload):
             field_type = FieldType(payload[offset])
             offset += LENGTH_FIELD_TYPE
             
-            field, decoder = field_name_and_decoder[field_type]
+            field = field_names[field_type]
             
-            for movie in movies:
-                field_value, offset = cls.deserialize_field(payload, offset, decoder)
-                setattr(movie, field, field_value)
+            for fields_spans in movies_fields_spans:
+                fields_spans[field], offset = cls.deserialize_field_span(payload, offset)
+
+        movies = [LazyMovie(payload, fields_spans, version) for fields_spans in movies_fields_spans]
 
         return cls(client_id, movies, message_id)
     
     @classmethod
     def from_csv_lines(cls, client_id, lines: list[str]):
         movies = []
-        for line in lines:
+        for fields in parse_csv_lines(lines):
             try:
-                movie = Movie.from_csv_line(line)
+                movie = Movie.from_csv_fields(fields)
                 movies.append(movie)
             except InvalidLineError:
                 continue
@@ -0,0 +1,235 @@
+import numpy as np
+from messages.base_message import BaseMessage
+from messages.packet_type import PacketType
+from messages.movies_batch import FieldType, LENGTH_MOVIES_AMOUNT, LENGTH_FIELD_TYPE
+from messages.serialization import (
+    LENGTH_FIELD, FORMAT_VERSION, TEXT_NUMERICS_FORMAT_VERSION, FLOAT32, FLOAT64, PayloadWriter, decode_int, decode_float,
+)
+
+FIELD_TYPES = {
+    'id': FieldType.ID,
+    'title': FieldType.TITLE,
+    'genres': FieldType.GENRES,
+    'production_countries': FieldType.PRODUCTION_COUNTRIES,
+    'release_date': FieldType.RELEASE_DATE,
+    'budget': FieldType.BUDGET,
+    'overview': FieldType.OVERVIEW,
+    'revenue': FieldType.REVENUE,
+}
+
+NUMERIC_FIELD_TYPES = (FieldType.ID, FieldType.BUDGET, FieldType.REVENUE)
+
+LENGTH_YEAR = 4
+YEAR_DIGITS_WEIGHTS = np.array([1000, 100, 10, 1], dtype=np.int32)
+INT64_SIZE = 8
+FLOAT32_SIZE = FLOAT32.size
+FLOAT64_SIZE = FLOAT64.size
+
+class MoviesBatchColumns(BaseMessage):
+    """
+    Columnar view of a serialized MoviesBatch. The wire layout is already column-major,
+    so decoding only records where the value of every movie starts and how long it is.
+    Numeric columns are decoded into NumPy masked arrays on first access, gathering the
+    bytes of every movie at once, and string list columns are flattened. Selected movies are
+    serialized back by copying their encoded values, without building Movie objects
+    """
+    def __init__(self, client_id, payload, amount_movies, spans, message_id=None, version=FORMAT_VERSION):
+        super().__init__(client_id, message_id)
+        self._payload = payload
+        self._version = version
+        self._amount_movies = amount_movies
+        # Field type -> (starts, lengths) of the encoded value of every movie in the payload
+        self._spans = spans
+        self._numeric_columns = {}
+
+    def __repr__(self):
+        return f"MoviesBatchColumns(amount_movies={self._amount_movies})"
+
+    def __len__(self):
+        return self._amount_movies
+
+    def packet_type(self):
+        return PacketType.MOVIES_BATCH
+
+    @classmethod
+    def deserialize(cls, payload: bytes, version=FORMAT_VERSION):
+        offset = 0
+
+        message_id, offset = cls.deserialize_string(payload, offset)
+        client_id, offset = cls.deserialize_string(payload, offset)
+
+        amount_movies = int.from_bytes(payload[offset:offset+LENGTH_MOVIES_AMOUNT], 'big')
+        offset += LENGTH_MOVIES_AMOUNT
+
+        spans = {}
+        while offset < len(payload):
+            field_type = FieldType(payload[offset])
+            offset += LENGTH_FIELD_TYPE
+
+            starts = []
+            lengths = []
+            for _ in range(amount_movies):
+                length_field = int.from_bytes(payload[offset:offset+LENGTH_FIELD], 'big')
+                offset += LENGTH_FIELD
+                starts.append(offset)
+                lengths.append(length_field)
+                offset += length_field
+            spans[field_type] = (np.array(starts, dtype=np.int64), np.array(lengths, dtype=np.int64))
+
+        return cls(client_id, payload, amount_movies, spans, message_id, version)
+
+    def __gather_bytes(self, starts, lengths, width):
+        """
+        Copy the encoded value of every movie into a row of width bytes, aligned to the
+        right and padded with zeros on the left, in a single fancy indexing operation
+        """
+        payload = np.frombuffer(self._payload, dtype=np.uint8)
+        columns = np.arange(width)
+        first_columns = width - np.minimum(lengths, width)
+        indexes = starts[:, np.newaxis] - first_columns[:, np.newaxis] + columns
+        in_value = columns >= first_columns[:, np.newaxis]
+        rows = np.where(in_value, payload[np.clip(indexes, 0, len(payload) - 1)], 0).astype(np.uint8)
+        return np.ascontiguousarray(rows)
+
+    def __decode_ints(self, starts, lengths):
+        """
+        Decode big endian two's complement ints, by reading them as 8 byte unsigned ints
+        and extending their sign with an arithmetic shift. The few ints encoded in more
+        than 8 bytes, like -2**63, are decoded one by one
+        """
+        values = np.zeros(len(lengths), dtype=np.int64)
+        wide = lengths > INT64_SIZE
+        narrow_lengths = np.where(wide, 0, lengths)
+        unsigned_values = self.__gather_bytes(starts, narrow_lengths, INT64_SIZE).view('>u8').ravel().astype(np.uint64)
+        shifts = np.where(narrow_lengths > 0, 8 * (INT64_SIZE - narrow_lengths), 0).astype(np.uint64)
+        values[:] = (unsigned_values << shifts).view(np.int64) >> shifts.astype(np.int64)
+        for i in np.flatnonzero(wide).tolist():
+            values[i] = decode_int(self._payload[starts[i]:starts[i]+lengths[i]], self._version)
+        return values
+
+    def __decode_floats(self, starts, lengths):
+        """
+        Decode float32 and float64 values, each group with its own view of the bytes
+        """
+        values = np.zeros(len(lengths), dtype=np.float64)
+        for size, dtype in ((FLOAT32_SIZE, '>f4'), (FLOAT64_SIZE, '>f8')):
+            of_size = lengths == size
+            values[of_size] = self.__gather_bytes(starts[of_size], lengths[of_size], size).view(dtype).ravel()
+        return values
+
+    def __decode_years(self, starts, lengths):
+        """
+        Decode the year of ISO format dates from its 4 ASCII digits
+        """
+        digits = self.__gather_bytes(starts, np.full(len(starts), LENGTH_YEAR), LENGTH_YEAR).astype(np.int32) - ord('0')
+        return digits @ YEAR_DIGITS_WEIGHTS
+
+    def __numeric_column(self, field_type, decode, parse, dtype):
+        """
+        Decode a numeric column, masked where the movie has no value. Binary numerics are
+        decoded all at once with decode, and text numerics one by one with parse
+        """
+        if field_type not in self._numeric_columns:
+            values = np.zeros(self._amount_movies, dtype=dtype)
+            missing = np.ones(self._amount_movies, dtype=bool)
+            if field_type in self._spans:
+                starts, lengths = self._spans[field_type]
+                missing = lengths == 0
+                if decode is not None:
+                    values[~missing] = decode(starts[~missing], lengths[~missing])
+                else:
+                    for i, (start, length) in enumerate(zip(starts.tolist(), lengths.tolist())):
+                        if length:
+                            values[i] = parse(self._payload[start:start+length])
+            self._numeric_columns[field_type] = np.ma.MaskedArray(values, mask=missing)
+        return self._numeric_columns[field_type]
+
+    def __binary_numerics(self):
+        return self._version != TEXT_NUMERICS_FORMAT_VERSION
+
+    @property
+    def ids(self):
+        decode = self.__decode_ints if self.__binary_numerics() else None
+        return self.__numeric_column(FieldType.ID, decode, lambda data_bytes: decode_int(data_bytes, self._version), np.int64)
+
+    @property
+    def budgets(self):
+        decode = self.__decode_ints if self.__binary_numerics() else None
+        return self.__numeric_column(FieldType.BUDGET, decode, lambda data_bytes: decode_int(data_bytes, self._version), np.int64)
+
+    @property
+    def revenues(self):
+        decode = self.__decode_floats if self.__binary_numerics() else None
+        return self.__numeric_column(FieldType.REVENUE, decode, lambda data_bytes: decode_float(data_bytes, self._version), np.float64)
+
+    @property
+    def release_years(self):
+        return self.__numeric_column(FieldType.RELEASE_DATE, self.__decode_years, None, np.int32)
+
+    def strings(self, field):
+        """
+        Decode a string column, with an empty string for the movies without value
+        """
+        field_type = FIELD_TYPES[field]
+        if field_type not in self._spans:
+            return [''] * self._amount_movies
+        starts, lengths = self._spans[field_type]
+        return [str(self._payload[start:start+length], 'utf-8') for start, length in zip(starts.tolist(), lengths.tolist())]
+
+    def string_lists(self, field):
+        """
+        Flatten a string list column. Returns the strings of all the movies and, for
+        every string, the index of the movie it belongs to
+        """
+        field_type = FIELD_TYPES[field]
+        strings = []
+        movies_indexes = []
+        if field_type in self._spans:
+            starts, lengths = self._spans[field_type]
+            for i, (start, length) in enumerate(zip(starts.tolist(), lengths.tolist())):
+                offset = start
+                while offset < start + length:
+                    length_elem = int.from_bytes(self._payload[offset:offset+LENGTH_FIELD], 'big')
+                    offset += LENGTH_FIELD
+                    strings.append(str(self._payload[offset:offset+length_elem], 'utf-8'))
+                    movies_indexes.append(i)
+                    offset += length_elem
+        return strings, np.array(movies_indexes, dtype=np.intp)
+
+    def take(self, mask):
+        """
+        Create a view with the movies selected by a boolean mask
+        """
+        spans = {field_type: (starts[mask], lengths[mask]) for field_type, (starts, lengths) in self._spans.items()}
+        return MoviesBatchColumns(self.client_id, self._payload, int(np.count_nonzero(mask)), spans, message_id=self.message_id, version=self._version)
+
+    def __write_numeric_column(self, writer, field_type):
+        """
+        Encode a numeric column in the current wire format version, for views of payloads
+        written with an older one
+        """
+        column = {FieldType.ID: self.ids, FieldType.BUDGET: self.budgets, FieldType.REVENUE: self.revenues}[field_type]
+        write = PayloadWriter.write_float if field_type == FieldType.REVENUE else PayloadWriter.write_int
+        for value in column.tolist():
+            write(writer, value)
+
+    def write(self, writer, fields_subset=None):
+        writer.write_string(self.message_id)
+        writer.write_string(self.client_id)
+
+        writer.write_bytes(self._amount_movies.to_bytes(LENGTH_MOVIES_AMOUNT, 'big'))
+
+        fields = fields_subset if fields_subset is not None else FIELD_TYPES.keys()
+        for field in fields:
+            field_type = FIELD_TYPES.get(field)
+            if field_type not in self._spans:
+                continue
+            starts, lengths = self._spans[field_type]
+            if not lengths.any():
+                continue
+            writer.write_bytes(field_type.to_bytes(LENGTH_FIELD_TYPE, 'big'))
+            if self._version != FORMAT_VERSION and field_type in NUMERIC_FIELD_TYPES:
+                self.__write_numeric_column(writer, field_type)
+                continue
+            for start, length in zip(starts.tolist(), lengths.tolist()):
+                writer.write_bytes(self._payload[start-LENGTH_FIELD:start+length])
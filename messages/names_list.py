@@ -0,0 +1,41 @@
+import ast
+import re
+
+# Value of a key other than the name, as python gives it in a repr. Strings with escape
+# sequences are left to ast.literal_eval
+OTHER_VALUE_PATTERN = r"""(?:-?\d+(?:\.\d+)?|None|True|False|'[^'\\]*'|"[^"\\]*")"""
+# Item of a list of dicts like [{'id': 16, 'name': 'Animation'}], followed by the
+# separator of the next item or the end of the list
+NAMES_LIST_ITEM_REGEX = re.compile(
+    rf"""\{{(?:'\w+': {OTHER_VALUE_PATTERN}, )*'name': (?:'([^'\\]*)'|"([^"\\]*)")(?:, '\w+': {OTHER_VALUE_PATTERN})*\}}(, |\]\Z)"""
+)
+MAX_INTERNED_NAMES = 10000
+
+# Genres, production countries and actors repeat across movies and credits, so every
+# one of them references the same string for each name
+interned_names = {}
+
+def intern_name(name):
+    if len(interned_names) >= MAX_INTERNED_NAMES:
+        return interned_names.get(name, name)
+    return interned_names.setdefault(name, name)
+
+def parse_names_list(names_list_str):
+    """
+    Return the names of a list of dicts like [{'id': 16, 'name': 'Animation'}] in a
+    single pass over the string, without building its AST. Lists that do not follow
+    the format python gives to their repr are evaluated with ast.literal_eval, which
+    raises ValueError or SyntaxError on malformed lists
+    """
+    if names_list_str == '[]':
+        return []
+    if names_list_str.startswith('['):
+        names = []
+        item_match = NAMES_LIST_ITEM_REGEX.match(names_list_str, 1)
+        while item_match:
+            single_quoted, double_quoted, separator = item_match.groups()
+            names.append(intern_name(single_quoted if single_quoted is not None else double_quoted))
+            if separator == ']':
+                return names
+            item_match = NAMES_LIST_ITEM_REGEX.match(names_list_str, item_match.end())
+    return [intern_name(item['name']) for item in ast.literal_eval(names_list_str)]
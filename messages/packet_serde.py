@@ -1,5 +1,10 @@
+import zlib
 from messages.packet_type import PacketType
-from messages.serialization import encode_packet_type
+from messages.serialization import (
+    LENGTH_PACKET_TYPE, LENGTH_FORMAT_VERSION, FORMAT_VERSION, SUPPORTED_FORMAT_VERSIONS,
+    COMPRESSED_FLAG, INDEXED_FLAG, FORMAT_FLAGS,
+    PayloadWriter, encode_format_version,
+)
 from messages.movies_batch import MoviesBatch
 from messages.eof import EOF
 from messages.investor_country import InvestorCountry
@@ -11,39 +16,127 @@ from messages.actor_participation import ActorParticipation
 from messages.analyzed_movies_batch import AnalyzedMoviesBatch
 from messages.avg_rate_revenue_budget import AvgRateRevenueBudget
 from messages.client_disconnected import ClientDisconnected
+from messages.movie_ids_filter import MovieIdsFilter
+from messages.movie_rating_partials_batch import MovieRatingPartialsBatch
+from messages.actor_participation_partials_batch import ActorParticipationPartialsBatch
+from messages.indexed_batch import IndexedBatch, split_batch_index
+
+LENGTH_HEADER = LENGTH_PACKET_TYPE + LENGTH_FORMAT_VERSION
+COMPRESSION_THRESHOLD = 4096
+COMPRESSION_LEVEL = 1
+INDEXED_PACKET_TYPES = (PacketType.RATINGS_BATCH, PacketType.CREDITS_BATCH)
 
 class PacketSerde:
     @classmethod
-    def deserialize(cls, packet):
+    def __parse_format_version(cls, packet):
+        """
+        Return the wire format version and the flags of a packet, without touching its payload
+        """
+        flags = packet[LENGTH_PACKET_TYPE] & FORMAT_FLAGS
+        version = packet[LENGTH_PACKET_TYPE] & ~FORMAT_FLAGS
+        if version not in SUPPORTED_FORMAT_VERSIONS:
+            raise ValueError(f"Unsupported wire format version: {version}")
+        return version, flags
+    
+    @classmethod
+    def __parse_header(cls, packet):
         packet_type = PacketType(packet[0])
-        payload = packet[1:]
+        version, flags = cls.__parse_format_version(packet)
+        # Messages are decoded from a memoryview so fields are not copied before decoding them
+        payload = memoryview(packet)[LENGTH_HEADER:]
+        if flags & COMPRESSED_FLAG:
+            payload = memoryview(zlib.decompress(payload))
+        return packet_type, version, flags, payload
+    
+    @classmethod
+    def packet_type(cls, packet):
+        """
+        Return the packet type of a packet without decoding its payload
+        """
+        return PacketType(packet[0])
+    
+    @classmethod
+    def deserialize_header(cls, packet):
+        """
+        Return the packet type, the wire format version and the payload of a packet,
+        decompressing the payload and dropping its items index if needed
+        """
+        packet_type, version, flags, payload = cls.__parse_header(packet)
+        if flags & INDEXED_FLAG:
+            payload, _, _ = split_batch_index(payload)
+        return packet_type, version, payload
+    
+    @classmethod
+    def deserialize_indexed_batch(cls, packet):
+        """
+        Return an IndexedBatch view of a packet written with an items index, or None if
+        the packet has no index. The flags are checked before decompressing the payload,
+        so packets without index are only decompressed when they are deserialized
+        """
+        version, flags = cls.__parse_format_version(packet)
+        if not flags & INDEXED_FLAG or version != FORMAT_VERSION:
+            return None
+        packet_type, version, flags, payload = cls.__parse_header(packet)
+        payload, keys, ends = split_batch_index(payload)
+        return IndexedBatch.deserialize(packet_type, payload, keys, ends)
+    
+    @classmethod
+    def deserialize(cls, packet):
+        packet_type, version, payload = cls.deserialize_header(packet)
         if packet_type == PacketType.MOVIES_BATCH:
-            return MoviesBatch.deserialize(payload)
+            return MoviesBatch.deserialize(payload, version)
         elif packet_type == PacketType.EOF:
-            return EOF.deserialize(payload)
+            return EOF.deserialize(payload, version)
         elif packet_type == PacketType.INVESTOR_COUNTRY:
-            return InvestorCountry.deserialize(payload)
+            return InvestorCountry.deserialize(payload, version)
         elif packet_type == PacketType.RATINGS_BATCH:
-            return RatingsBatch.deserialize(payload)
+            return RatingsBatch.deserialize(payload, version)
         elif packet_type == PacketType.MOVIE_RATINGS_BATCH:
-            return MovieRatingsBatch.deserialize(payload)
+            return MovieRatingsBatch.deserialize(payload, version)
         elif packet_type == PacketType.CREDITS_BATCH:
-            return CreditsBatch.deserialize(payload)
+            return CreditsBatch.deserialize(payload, version)
         elif packet_type == PacketType.MOVIE_CREDITS_BATCH:
-            return MovieCreditsBatch.deserialize(payload)
+            return MovieCreditsBatch.deserialize(payload, version)
         elif packet_type == PacketType.ACTOR_PARTICIPATION:
-            return ActorParticipation.deserialize(payload)
+            return ActorParticipation.deserialize(payload, version)
         elif packet_type == PacketType.ANALYZED_MOVIES_BATCH:
-            return AnalyzedMoviesBatch.deserialize(payload)
+            return AnalyzedMoviesBatch.deserialize(payload, version)
         elif packet_type == PacketType.AVG_RATE_REVENUE_BUDGET:
-            return AvgRateRevenueBudget.deserialize(payload)
+            return AvgRateRevenueBudget.deserialize(payload, version)
         elif packet_type == PacketType.CLIENT_DISCONNECTED:
-            return ClientDisconnected.deserialize(payload)
+            return ClientDisconnected.deserialize(payload, version)
+        elif packet_type == PacketType.MOVIE_IDS_FILTER:
+            return MovieIdsFilter.deserialize(payload, version)
+        elif packet_type == PacketType.MOVIE_RATING_PARTIALS_BATCH:
+            return MovieRatingPartialsBatch.deserialize(payload, version)
+        elif packet_type == PacketType.ACTOR_PARTICIPATION_PARTIALS_BATCH:
+            return ActorParticipationPartialsBatch.deserialize(payload, version)
         else:
             raise ValueError(f"Unknown packet type: {packet_type}")
     
     @classmethod
-    def serialize(self, msg, fields_subset=None):
+    def serialize(self, msg, fields_subset=None, compression_threshold=COMPRESSION_THRESHOLD, indexed=False):
+        """
+        Serialize a message. Payloads of at least compression_threshold bytes are
+        compressed when that makes them smaller, a None threshold disables compression.
+        If indexed is set, ratings and credits batches are followed by an index of their
+        items so routers can split them without deserializing them
+        """
+        indexed = indexed and msg.packet_type() in INDEXED_PACKET_TYPES
+        flags = INDEXED_FLAG if indexed else 0
+        writer = PayloadWriter()
+        writer.write_packet_type(msg.packet_type())
+        writer.write_format_version(FORMAT_VERSION | flags)
         if fields_subset and msg.packet_type() == PacketType.MOVIES_BATCH:
-            return encode_packet_type(msg.packet_type()) + msg.serialize(fields_subset=fields_subset)
-        return encode_packet_type(msg.packet_type()) + msg.serialize()
+            msg.write(writer, fields_subset=fields_subset)
+        elif indexed:
+            msg.write(writer, indexed=True)
+        else:
+            msg.write(writer)
+        packet = writer.getvalue()
+        if compression_threshold is None or len(packet) - LENGTH_HEADER < compression_threshold:
+            return packet
+        compressed_payload = zlib.compress(memoryview(packet)[LENGTH_HEADER:], COMPRESSION_LEVEL)
+        if len(compressed_payload) >= len(packet) - LENGTH_HEADER:
+            return packet
+        return packet[:LENGTH_PACKET_TYPE] + encode_format_version(FORMAT_VERSION | flags | COMPRESSED_FLAG) + compressed_payload
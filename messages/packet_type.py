@@ -12,6 +12,9 @@ class PacketType(IntEnum):
     ANALYZED_MOVIES_BATCH = 9
     AVG_RATE_REVENUE_BUDGET = 10
     CLIENT_DISCONNECTED = 11
+    MOVIE_IDS_FILTER = 12
+    MOVIE_RATING_PARTIALS_BATCH = 13
+    ACTOR_PARTICIPATION_PARTIALS_BATCH = 14
 
     def __str__(self):
         return self.name
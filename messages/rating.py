@@ -1,9 +1,9 @@
-from io import StringIO
-import csv
 from messages.exceptions import InvalidLineError
+from messages.csv_lines import parse_csv_line
+from messages.lazy_field import LazyField
 
 from messages.serialization import (
-    encode_num,
+    LENGTH_FIELD, FORMAT_VERSION, decode_int, decode_float,
 )
 
 TOTAL_FIELDS_IN_CSV_LINE = 4
@@ -16,18 +16,16 @@ class Rating:
     def __repr__(self):
         return f"Rating(movie_id={self.movie_id}, rating={self.rating})"
 
-    def serialize(self):
-        payload = b""
-        payload += encode_num(self.movie_id)
-        payload += encode_num(self.rating)
-
-        return payload
+    def write(self, writer):
+        writer.write_int(self.movie_id)
+        writer.write_float(self.rating)
     
     @classmethod
     def from_csv_line(cls, line: str):
-        reader = csv.reader(StringIO(line), quotechar='"', delimiter=',', quoting=csv.QUOTE_MINIMAL)
-        fields = next(reader)
+        return cls.from_csv_fields(parse_csv_line(line))
 
+    @classmethod
+    def from_csv_fields(cls, fields: list[str]):
         if len(fields) != TOTAL_FIELDS_IN_CSV_LINE:
             raise InvalidLineError(f"Invalid amount of line fields: {len(fields)}")
 
@@ -50,4 +48,28 @@ class Rating:
             raise InvalidLineError("Invalid rating: empty")
         if not rating_str.replace('.', '', 1).isdecimal():
             raise InvalidLineError(f"Invalid rating: {rating_str}")
-        return float(rating_str)
\ No newline at end of file
+        return float(rating_str)
+
+class LazyRating(Rating):
+    """
+    Rating that references its encoded fields in the payload of the batch it was
+    deserialized from. Fields are decoded on first access, and an unmodified rating is
+    serialized by copying its encoded bytes
+    """
+    movie_id = LazyField(decode_int, numeric=True)
+    rating = LazyField(decode_float, numeric=True)
+
+    def __init__(self, payload, fields_spans, version=FORMAT_VERSION):
+        self._payload = payload
+        self._fields_spans = fields_spans
+        self._version = version
+        self._decoded_fields = {}
+        self._modified = False
+
+    def write(self, writer):
+        if self._modified or self._version != FORMAT_VERSION:
+            super().write(writer)
+            return
+        start, _ = self._fields_spans['movie_id']
+        _, end = self._fields_spans['rating']
+        writer.write_bytes(self._payload[start-LENGTH_FIELD:end])
\ No newline at end of file
@@ -1,10 +1,12 @@
 from messages.base_message import BaseMessage
 from messages.packet_type import PacketType
-from messages.rating import Rating
+from messages.rating import Rating, LazyRating
 from messages.exceptions import InvalidLineError
+from messages.csv_lines import parse_csv_lines
+from messages.indexed_batch import write_batch_index
 
 from messages.serialization import (
-    encode_string,
+    FORMAT_VERSION,
 )
 
 class RatingsBatch(BaseMessage):
@@ -24,16 +26,19 @@ class RatingsBatch(BaseMessage):
     def get_items(self):
         return self.ratings
     
-    def serialize(self):
-        payload = b""
-        payload += encode_string(self.message_id)
-        payload += encode_string(self.client_id)
+    def write(self, writer, indexed=False):
+        payload_start = writer.tell()
+        writer.write_string(self.message_id)
+        writer.write_string(self.client_id)
+        ends = []
         for rating in self.ratings:
-            payload += rating.serialize()
-        return payload
+            rating.write(writer)
+            ends.append(writer.tell() - payload_start)
+        if indexed:
+            write_batch_index(writer, [rating.movie_id for rating in self.ratings], ends)
     
     @classmethod
-    def deserialize(cls, payload: bytes):
+    def deserialize(cls, payload: bytes, version=FORMAT_VERSION):
         offset = 0
         
         message_id, offset = cls.deserialize_string(payload, offset)
@@ -41,19 +46,19 @@ class RatingsBatch(BaseMessage):
         
         ratings = []
         while offset < len(payload):
-            movie_id, offset = cls.deserialize_int(payload, offset)
-            rating, offset = cls.deserialize_float(payload, offset)
+            movie_id_span, offset = cls.deserialize_field_span(payload, offset)
+            rating_span, offset = cls.deserialize_field_span(payload, offset)
             
-            ratings.append(Rating(movie_id, rating))
+            ratings.append(LazyRating(payload, {'movie_id': movie_id_span, 'rating': rating_span}, version))
 
         return cls(client_id, ratings, message_id)
     
     @classmethod
     def from_csv_lines(cls, client_id, lines: list[str]):
         ratings = []
-        for line in lines:
+        for fields in parse_csv_lines(lines):
             try:
-                rating = Rating.from_csv_line(line)
+                rating = Rating.from_csv_fields(fields)
                 ratings.append(rating)
             except InvalidLineError:
                 continue
@@ -1,11 +1,33 @@
-from datetime import datetime
+import struct
+from datetime import date
 
 LENGTH_PACKET_TYPE = 1
+LENGTH_FORMAT_VERSION = 1
 LENGTH_FIELD = 2
 
+# Numeric fields are decimal strings in the first version of the wire format. From the
+# second one on ints are big endian two's complement in as few bytes as they fit and
+# floats are float32 when that keeps their exact value and float64 otherwise. The
+# length prefix of the field tells the width, so it needs no extra tag
+TEXT_NUMERICS_FORMAT_VERSION = 1
+BINARY_NUMERICS_FORMAT_VERSION = 2
+FORMAT_VERSION = BINARY_NUMERICS_FORMAT_VERSION
+SUPPORTED_FORMAT_VERSIONS = (TEXT_NUMERICS_FORMAT_VERSION, BINARY_NUMERICS_FORMAT_VERSION)
+# The highest bits of the format version byte flag a payload compressed with zlib and
+# a batch payload followed by an index of its items
+COMPRESSED_FLAG = 0x80
+INDEXED_FLAG = 0x40
+FORMAT_FLAGS = COMPRESSED_FLAG | INDEXED_FLAG
+
+FLOAT32 = struct.Struct('>f')
+FLOAT64 = struct.Struct('>d')
+
 def encode_packet_type(packet_type):
     return packet_type.to_bytes(LENGTH_PACKET_TYPE, 'big')
 
+def encode_format_version(version):
+    return version.to_bytes(LENGTH_FORMAT_VERSION, 'big')
+
 def encode_string(s):
     if s is None:
         return (0).to_bytes(LENGTH_FIELD, 'big')
@@ -15,21 +37,34 @@ def encode_string(s):
 def encode_strings_iterable(strings):
     if not strings:
         return (0).to_bytes(LENGTH_FIELD, 'big')
-    data_bytes = b''
-    for string in strings:
-        data_bytes += encode_string(string)
+    data_bytes = b''.join(encode_string(string) for string in strings)
     return len(data_bytes).to_bytes(LENGTH_FIELD, 'big') + data_bytes
 
 def encode_date(d):
     iso = d.isoformat() if d is not None else None
     return encode_string(iso)
 
-def encode_num(n):
-    s = str(n) if n is not None else None
-    return encode_string(s)
+def encode_int(n):
+    if n is None:
+        return (0).to_bytes(LENGTH_FIELD, 'big')
+    n = int(n)
+    # Two's complement needs one bit more than the magnitude of n, or of ~n if negative
+    length = ((n if n >= 0 else ~n).bit_length() + 8) // 8
+    return length.to_bytes(LENGTH_FIELD, 'big') + n.to_bytes(length, 'big', signed=True)
+
+def encode_float(n):
+    if n is None:
+        return (0).to_bytes(LENGTH_FIELD, 'big')
+    try:
+        data_bytes = FLOAT32.pack(n)
+        if FLOAT32.unpack(data_bytes)[0] != n:
+            data_bytes = FLOAT64.pack(n)
+    except OverflowError:
+        data_bytes = FLOAT64.pack(n)
+    return len(data_bytes).to_bytes(LENGTH_FIELD, 'big') + data_bytes
 
 def decode_string(data_bytes):
-    return data_bytes.decode('utf-8') if data_bytes else ''
+    return str(data_bytes, 'utf-8') if data_bytes else ''
 
 def decode_strings_list(data_bytes):
     offset = 0
@@ -44,15 +79,23 @@ def decode_strings_list(data_bytes):
 
 def decode_date(data_bytes):
     s = decode_string(data_bytes)
-    return datetime.fromisoformat(s).date() if s else None
+    return date.fromisoformat(s) if s else None
 
-def decode_int(data_bytes):
-    s = decode_string(data_bytes)
-    return int(s) if s else None
+def decode_int(data_bytes, version=FORMAT_VERSION):
+    if not data_bytes:
+        return None
+    if version == TEXT_NUMERICS_FORMAT_VERSION:
+        return int(bytes(data_bytes))
+    return int.from_bytes(data_bytes, 'big', signed=True)
 
-def decode_float(data_bytes):
-    s = decode_string(data_bytes)
-    return float(s) if s else None
+def decode_float(data_bytes, version=FORMAT_VERSION):
+    if not data_bytes:
+        return None
+    if version == TEXT_NUMERICS_FORMAT_VERSION:
+        return float(bytes(data_bytes))
+    if len(data_bytes) == FLOAT32.size:
+        return FLOAT32.unpack(data_bytes)[0]
+    return FLOAT64.unpack(data_bytes)[0]
 
 def decode_strings_set(data_bytes):
     offset = 0
@@ -64,3 +107,50 @@ def decode_strings_set(data_bytes):
         res.add(decode_string(elem))
         offset += length_elem
     return res
+
+class PayloadWriter:
+    """
+    Streaming encoder that accumulates a payload into a single buffer which grows in
+    place, so serializing a batch takes time linear in its size instead of copying
+    the payload built so far on every field
+    """
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def tell(self):
+        return len(self._buffer)
+
+    def truncate(self, position):
+        del self._buffer[position:]
+
+    def getvalue(self):
+        return bytes(self._buffer)
+
+    def write_bytes(self, data_bytes):
+        self._buffer += data_bytes
+
+    def write_packet_type(self, packet_type):
+        self._buffer += encode_packet_type(packet_type)
+
+    def write_format_version(self, version):
+        self._buffer += encode_format_version(version)
+
+    def write_string(self, s):
+        self._buffer += encode_string(s)
+
+    def write_strings_iterable(self, strings):
+        length_position = len(self._buffer)
+        self._buffer += (0).to_bytes(LENGTH_FIELD, 'big')
+        for string in strings or ():
+            self._buffer += encode_string(string)
+        length = len(self._buffer) - length_position - LENGTH_FIELD
+        self._buffer[length_position:length_position+LENGTH_FIELD] = length.to_bytes(LENGTH_FIELD, 'big')
+
+    def write_date(self, d):
+        self._buffer += encode_date(d)
+
+    def write_int(self, n):
+        self._buffer += encode_int(n)
+
+    def write_float(self, n):
+        self._buffer += encode_float(n)
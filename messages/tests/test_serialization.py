@@ -0,0 +1,150 @@
+import math
+import os
+import sys
+import unittest
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from messages.movie import Movie
+from messages.movies_batch import MoviesBatch, FieldType, LENGTH_MOVIES_AMOUNT, LENGTH_FIELD_TYPE
+from messages.packet_serde import PacketSerde
+from messages.packet_type import PacketType
+from messages.rating import Rating
+from messages.ratings_batch import RatingsBatch
+from messages.serialization import (
+    LENGTH_FIELD, FORMAT_VERSION, TEXT_NUMERICS_FORMAT_VERSION, BINARY_NUMERICS_FORMAT_VERSION,
+    COMPRESSED_FLAG, PayloadWriter, encode_int, encode_float, decode_int, decode_float,
+)
+
+def field_bytes(encoded_field):
+    return encoded_field[LENGTH_FIELD:]
+
+def write_text_field(writer, value):
+    data_bytes = b'' if value is None else str(value).encode('utf-8')
+    writer.write_bytes(len(data_bytes).to_bytes(LENGTH_FIELD, 'big') + data_bytes)
+
+def text_numerics_packet(packet_type, write_payload):
+    """
+    Build a packet in the first version of the wire format, which encodes numeric
+    fields as decimal strings
+    """
+    writer = PayloadWriter()
+    writer.write_packet_type(packet_type)
+    writer.write_format_version(TEXT_NUMERICS_FORMAT_VERSION)
+    write_payload(writer)
+    return writer.getvalue()
+
+class TestNumericFields(unittest.TestCase):
+    def test_int_round_trip(self):
+        for n in (0, 1, -1, 127, 128, -128, -129, 255, 2**31, -2**31 - 1, 2**63 - 1, -2**63, 10**30):
+            with self.subTest(n=n):
+                self.assertEqual(decode_int(field_bytes(encode_int(n)), BINARY_NUMERICS_FORMAT_VERSION), n)
+
+    def test_int_uses_fewest_bytes(self):
+        for n, length in ((0, 1), (127, 1), (-128, 1), (128, 2), (-129, 2), (2**31 - 1, 4), (2**31, 5), (-2**31, 4), (2**63 - 1, 8), (-2**63, 8)):
+            with self.subTest(n=n):
+                self.assertEqual(len(field_bytes(encode_int(n))), length)
+
+    def test_float_exact_in_float32_is_encoded_in_4_bytes(self):
+        for n in (0.0, -0.0, 1.5, -2.25, 16777216.0, float("inf"), float("-inf")):
+            with self.subTest(n=n):
+                encoded_float = encode_float(n)
+                self.assertEqual(len(field_bytes(encoded_float)), 4)
+                self.assertEqual(decode_float(field_bytes(encoded_float), BINARY_NUMERICS_FORMAT_VERSION), n)
+
+    def test_float_not_exact_in_float32_is_encoded_in_8_bytes(self):
+        # 1e300 overflows float32 and the others lose precision in it
+        for n in (0.1, 373554033.0, 1e300, -1e-300, 3.141592653589793):
+            with self.subTest(n=n):
+                encoded_float = encode_float(n)
+                self.assertEqual(len(field_bytes(encoded_float)), 8)
+                self.assertEqual(decode_float(field_bytes(encoded_float), BINARY_NUMERICS_FORMAT_VERSION), n)
+
+    def test_float_nan(self):
+        self.assertTrue(math.isnan(decode_float(field_bytes(encode_float(float("nan"))))))
+
+    def test_ints_and_floats_are_ints_and_floats(self):
+        self.assertIsInstance(decode_float(field_bytes(encode_float(2))), float)
+        self.assertEqual(decode_int(field_bytes(encode_int(2.0))), 2)
+
+    def test_missing_values(self):
+        for version in (TEXT_NUMERICS_FORMAT_VERSION, BINARY_NUMERICS_FORMAT_VERSION):
+            with self.subTest(version=version):
+                self.assertIsNone(decode_int(field_bytes(encode_int(None)), version))
+                self.assertIsNone(decode_float(field_bytes(encode_float(None)), version))
+
+    def test_text_numerics(self):
+        self.assertEqual(decode_int(b'-1234567890123', TEXT_NUMERICS_FORMAT_VERSION), -1234567890123)
+        self.assertEqual(decode_float(b'0.1', TEXT_NUMERICS_FORMAT_VERSION), 0.1)
+        self.assertEqual(decode_float(b'30000000', TEXT_NUMERICS_FORMAT_VERSION), 30000000.0)
+        self.assertEqual(decode_int(memoryview(b'42'), TEXT_NUMERICS_FORMAT_VERSION), 42)
+
+class TestPacketSerde(unittest.TestCase):
+    def test_ratings_batch_round_trip(self):
+        ratings = [Rating(1, 4.5), Rating(2**40, 0.1), Rating(0, 3.0)]
+        packet = PacketSerde.serialize(RatingsBatch("client", ratings))
+        self.assertEqual(packet[1], FORMAT_VERSION)
+        batch = PacketSerde.deserialize(packet)
+        self.assertEqual(batch.client_id, "client")
+        self.assertEqual([(rating.movie_id, rating.rating) for rating in batch.ratings], [(1, 4.5), (2**40, 0.1), (0, 3.0)])
+
+    def test_movies_batch_round_trip(self):
+        movies = [
+            Movie(id=862, title="Toy Story", genres=["Animation"], production_countries=["US"], release_date=date(1995, 10, 30), budget=30000000, overview="Toys", revenue=373554033.0),
+            Movie(id=8844, title="Jumanji", release_date=date(1995, 12, 15), budget=65000000, revenue=262797249.7),
+            Movie(id=15602),
+        ]
+        batch = PacketSerde.deserialize(PacketSerde.serialize(MoviesBatch("client", movies)))
+        for movie, decoded_movie in zip(movies, batch.movies):
+            for field in ("id", "title", "genres", "production_countries", "release_date", "budget", "overview", "revenue"):
+                self.assertEqual(getattr(decoded_movie, field), getattr(movie, field) or getattr(Movie(), field))
+
+    def test_compressed_round_trip(self):
+        ratings = [Rating(i, i / 10) for i in range(2000)]
+        packet = PacketSerde.serialize(RatingsBatch("client", ratings))
+        self.assertTrue(packet[1] & COMPRESSED_FLAG)
+        batch = PacketSerde.deserialize(packet)
+        self.assertEqual([(rating.movie_id, rating.rating) for rating in batch.ratings], [(i, i / 10) for i in range(2000)])
+
+    def test_text_numerics_ratings_batch(self):
+        def write_payload(writer):
+            writer.write_string("message")
+            writer.write_string("client")
+            for movie_id, rating in ((1, "4.5"), (2**40, "0.1"), (3, None)):
+                write_text_field(writer, movie_id)
+                write_text_field(writer, rating)
+        packet = text_numerics_packet(PacketType.RATINGS_BATCH, write_payload)
+        batch = PacketSerde.deserialize(packet)
+        expected_ratings = [(1, 4.5), (2**40, 0.1), (3, None)]
+        self.assertEqual([(rating.movie_id, rating.rating) for rating in batch.ratings], expected_ratings)
+        # Items read from a previous version are written in the current one instead of copied
+        packet = PacketSerde.serialize(batch)
+        self.assertEqual(packet[1], FORMAT_VERSION)
+        batch = PacketSerde.deserialize(packet)
+        self.assertEqual([(rating.movie_id, rating.rating) for rating in batch.ratings], expected_ratings)
+
+    def test_text_numerics_movies_batch(self):
+        def write_payload(writer):
+            writer.write_string("message")
+            writer.write_string("client")
+            writer.write_bytes((2).to_bytes(LENGTH_MOVIES_AMOUNT, 'big'))
+            for field_type, values in ((FieldType.ID, (862, 8844)), (FieldType.BUDGET, (30000000, None)), (FieldType.REVENUE, ("373554033", "262797249.7"))):
+                writer.write_bytes(field_type.to_bytes(LENGTH_FIELD_TYPE, 'big'))
+                for value in values:
+                    write_text_field(writer, value)
+        packet = text_numerics_packet(PacketType.MOVIES_BATCH, write_payload)
+        batch = PacketSerde.deserialize(packet)
+        expected_movies = [(862, 30000000, 373554033.0), (8844, None, 262797249.7)]
+        self.assertEqual([(movie.id, movie.budget, movie.revenue) for movie in batch.movies], expected_movies)
+        batch = PacketSerde.deserialize(PacketSerde.serialize(batch))
+        self.assertEqual([(movie.id, movie.budget, movie.revenue) for movie in batch.movies], expected_movies)
+
+    def test_unsupported_version(self):
+        packet = PacketSerde.serialize(RatingsBatch("client", [Rating(1, 4.5)]))
+        packet = packet[:1] + bytes([FORMAT_VERSION + 1]) + packet[2:]
+        with self.assertRaises(ValueError):
+            PacketSerde.deserialize(packet)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,216 @@
+import asyncio
+import logging
+import aio_pika
+
+HOST = 'rabbitmq'
+EXCHANGE_TYPE = aio_pika.ExchangeType.FANOUT
+PREFETCH_COUNT = 1
+ACK_BATCH_SIZE = 1
+ACK_FLUSH_INTERVAL_MS = 0
+
+class _InputQueueState:
+    """
+    Ack bookkeeping of an input queue. Every input queue is consumed through its own
+    channel, so a cumulative ack never acks deliveries of another queue
+    """
+    def __init__(self):
+        self.last_handled_delivery = None
+        self.unacked_delivery = None
+        self.unacked_deliveries = 0
+        self.ack_timer = None
+
+class AsyncMiddleware:
+    """
+    Middleware with the same interface as Middleware that runs on an asyncio event loop.
+    Callbacks are still synchronous, but the messages they publish are sent in the
+    background while the following deliveries are handled. A delivery is acked once
+    the messages it originated were published, and acks of a queue are sent in
+    delivery order. Up to prefetch_count deliveries per queue are in flight at once
+    """
+    def __init__(self, input_queues_and_callback_functions=[], output_exchange=None, publish_batch_size=None, publish_flush_interval_ms=None, reliable_publishes=False, prefetch_count=PREFETCH_COUNT, ack_batch_size=ACK_BATCH_SIZE, ack_flush_interval_ms=ACK_FLUSH_INTERVAL_MS, before_ack_function=None):
+        # publish_batch_size and publish_flush_interval_ms are accepted to keep the
+        # interface of Middleware, publishes are pipelined instead of batched
+        self._input_queues_and_callback_functions = input_queues_and_callback_functions
+        self._output_exchange = output_exchange
+        # Reliable publishes are confirmed by the broker with publisher confirms
+        self._reliable_publishes = reliable_publishes
+        self._prefetch_count = max(prefetch_count, 1)
+        self._ack_batch_size = max(ack_batch_size, 1)
+        self._ack_flush_interval = ack_flush_interval_ms / 1000
+        self._before_ack_function = before_ack_function
+        self._loop = asyncio.new_event_loop()
+        self._connection = None
+        self._publish_channel = None
+        self._exchanges = {}
+        self._input_queues = []
+        self._consumer_tags = []
+        self._pending_publishes = set()
+        self._current_delivery_publishes = None
+        self._stop_consuming = None
+        self._consuming = False
+
+        if self._ack_batch_size > self._prefetch_count:
+            logging.warning(f"action: middleware_config | result: fail | ack_batch_size: {self._ack_batch_size} is greater than prefetch_count: {self._prefetch_count}, using it as prefetch_count")
+            self._prefetch_count = self._ack_batch_size
+        self._loop.run_until_complete(self.__connect())
+
+    async def __connect(self):
+        self._connection = await aio_pika.connect(host=HOST)
+        self._publish_channel = await self._connection.channel(publisher_confirms=self._reliable_publishes)
+        await self.__declare_input_queues()
+        if self._output_exchange is not None:
+            await self.__get_exchange(self._output_exchange)
+
+    async def __declare_input_queues(self):
+        for queue, exchange, callback_function in self._input_queues_and_callback_functions:
+            channel = await self._connection.channel()
+            await channel.set_qos(prefetch_count=self._prefetch_count)
+            input_queue = await channel.declare_queue(queue)
+            if exchange:
+                input_exchange = await channel.declare_exchange(exchange, EXCHANGE_TYPE)
+                await input_queue.bind(input_exchange)
+            self._input_queues.append((input_queue, callback_function))
+
+    def __get_exchange(self, exchange):
+        """
+        Return a future with the declared exchange. Exchanges are declared once and
+        publishes to the same exchange wait on the same future, so they keep their order
+        """
+        if exchange not in self._exchanges:
+            if exchange == '':
+                declaration = self._loop.create_future()
+                declaration.set_result(self._publish_channel.default_exchange)
+            else:
+                declaration = asyncio.ensure_future(self._publish_channel.declare_exchange(exchange, EXCHANGE_TYPE), loop=self._loop)
+            self._exchanges[exchange] = declaration
+        return self._exchanges[exchange]
+
+    async def __publish(self, exchange, routing_key, msg):
+        output_exchange = await self.__get_exchange(exchange)
+        await output_exchange.publish(aio_pika.Message(body=msg), routing_key=routing_key, mandatory=False)
+
+    def __start_publish(self, exchange, routing_key, msg):
+        task = self._loop.create_task(self.__publish(exchange, routing_key, msg))
+        self._pending_publishes.add(task)
+        task.add_done_callback(self._pending_publishes.discard)
+        if self._current_delivery_publishes is not None:
+            self._current_delivery_publishes.append(task)
+
+    def __wrapper_callback_function(self, callback_function, input_queue_state):
+        async def callback(message):
+            try:
+                # Callbacks are run in delivery order, as nothing is awaited before them
+                self._current_delivery_publishes = []
+                try:
+                    callback_function(message.body)
+                finally:
+                    publishes, self._current_delivery_publishes = self._current_delivery_publishes, None
+                previous_delivery = input_queue_state.last_handled_delivery
+                handled = self._loop.create_future()
+                input_queue_state.last_handled_delivery = handled
+                try:
+                    await asyncio.gather(*publishes)
+                    if previous_delivery is not None:
+                        await previous_delivery
+                    await self.__register_handled_delivery(message, input_queue_state)
+                finally:
+                    handled.set_result(None)
+            except Exception as e:
+                self.__fail(e)
+        return callback
+
+    async def __register_handled_delivery(self, message, input_queue_state):
+        input_queue_state.unacked_deliveries += 1
+        input_queue_state.unacked_delivery = message
+        if input_queue_state.unacked_deliveries >= self._ack_batch_size:
+            await self.__ack_pending_deliveries(input_queue_state)
+        elif input_queue_state.ack_timer is None and self._ack_flush_interval:
+            input_queue_state.ack_timer = self._loop.call_later(self._ack_flush_interval, self.__on_ack_timer, input_queue_state)
+
+    def __on_ack_timer(self, input_queue_state):
+        input_queue_state.ack_timer = None
+        task = self._loop.create_task(self.__ack_pending_deliveries(input_queue_state))
+        task.add_done_callback(lambda t: t.cancelled() or t.exception() is None or self.__fail(t.exception()))
+
+    async def __ack_pending_deliveries(self, input_queue_state):
+        """
+        Ack all the deliveries of the queue handled since the last ack with a single
+        cumulative ack. The controller's durable state is flushed first
+        """
+        if input_queue_state.ack_timer is not None:
+            input_queue_state.ack_timer.cancel()
+            input_queue_state.ack_timer = None
+        if not input_queue_state.unacked_deliveries:
+            return
+        message = input_queue_state.unacked_delivery
+        multiple = input_queue_state.unacked_deliveries > 1
+        input_queue_state.unacked_deliveries = 0
+        input_queue_state.unacked_delivery = None
+        if self._before_ack_function:
+            self._before_ack_function()
+        await message.ack(multiple=multiple)
+
+    def __fail(self, error):
+        logging.error(f"action: middleware_handle_message | result: fail | error: {error}")
+        if self._stop_consuming is not None and not self._stop_consuming.done():
+            self._stop_consuming.set_exception(error)
+
+    def flush(self):
+        """
+        Wait until all the messages sent were published. While consuming there is no need
+        to call it, as deliveries are only acked after their messages were published
+        """
+        if self._loop.is_running() or not self._pending_publishes:
+            return
+        self._loop.run_until_complete(asyncio.gather(*self._pending_publishes))
+
+    def send_message(self, msg, exchange=None):
+        if self._output_exchange is None and exchange is None:
+            return
+        if exchange is None:
+            self.__start_publish(self._output_exchange, '', msg)
+        else:
+            self.__start_publish(exchange, '', msg)
+
+    def reenqueue_message(self, msg, queue=None):
+        if queue is None:
+            for q, _, _ in self._input_queues_and_callback_functions:
+                self.__start_publish('', q, msg)
+        else:
+            self.__start_publish('', queue, msg)
+
+    async def __consume(self):
+        self._stop_consuming = self._loop.create_future()
+        for input_queue, callback_function in self._input_queues:
+            tag = await input_queue.consume(self.__wrapper_callback_function(callback_function, _InputQueueState()))
+            self._consumer_tags.append((input_queue, tag))
+        try:
+            await self._stop_consuming
+        finally:
+            for input_queue, tag in self._consumer_tags:
+                if not input_queue.channel.is_closed:
+                    await input_queue.cancel(tag)
+            logging.info("action: middleware_stop_consuming | result: success")
+            await self.__close_connection()
+
+    def handle_messages(self):
+        self._consuming = True
+        try:
+            self._loop.run_until_complete(self.__consume())
+        finally:
+            self._consuming = False
+
+    async def __close_connection(self):
+        await self._connection.close()
+        logging.info("action: middleware_close_connection | result: success")
+
+    def __request_stop(self):
+        if not self._stop_consuming.done():
+            self._stop_consuming.set_result(None)
+
+    def stop(self):
+        if self._consuming:
+            self._loop.call_soon_threadsafe(self.__request_stop)
+        else:
+            self.flush()
+            self._loop.run_until_complete(self.__close_connection())
@@ -1,29 +1,64 @@
 import pika
 import logging
 import functools
+import time
 
 HOST = 'rabbitmq'
 EXCHANGE_TYPE = 'fanout'
 PREFETCH_COUNT = 1
+ACK_BATCH_SIZE = 1
+ACK_FLUSH_INTERVAL_MS = 0
+PUBLISH_BATCH_SIZE = 1
+PUBLISH_FLUSH_INTERVAL_MS = 0
 
 class Middleware:
-    def __init__(self, input_queues_and_callback_functions=[], output_exchange=None):
+    """
+    Blocking RabbitMQ client. Publishes are buffered in batches of publish_batch_size,
+    flushed when the batch is full, when publish_flush_interval_ms elapsed since the
+    first buffered publish, before acking, or when the controller calls flush. With
+    reliable_publishes the channel is put in AMQP transaction mode (tx_select), and
+    every flush and ack is committed with tx_commit. That is not the lighter publisher
+    confirms mode; a commit waits for the broker
+    """
+    def __init__(self, input_queues_and_callback_functions=[], output_exchange=None, publish_batch_size=PUBLISH_BATCH_SIZE, publish_flush_interval_ms=PUBLISH_FLUSH_INTERVAL_MS, reliable_publishes=False, prefetch_count=PREFETCH_COUNT, ack_batch_size=ACK_BATCH_SIZE, ack_flush_interval_ms=ACK_FLUSH_INTERVAL_MS, before_ack_function=None):
         self._connection = pika.BlockingConnection(pika.ConnectionParameters(host=HOST))
         self._channel = self._connection.channel()
         self._input_queues_and_callback_functions = input_queues_and_callback_functions
         self._output_exchange = output_exchange
         self._consumer_tags = []
         self._consuming = False
+        self._declared_exchanges = set()
+        self._publish_batch_size = max(publish_batch_size, 1)
+        self._publish_flush_interval = publish_flush_interval_ms / 1000
+        self._reliable_publishes = reliable_publishes
+        self._pending_publishes = []
+        self._first_pending_publish_time = None
+        self._publish_timer = None
+        self._handling_delivery = False
+        self._ack_batch_size = max(ack_batch_size, 1)
+        self._ack_flush_interval = ack_flush_interval_ms / 1000
+        self._before_ack_function = before_ack_function
+        self._prefetch_count = prefetch_count
+        self._unacked_deliveries = 0
+        self._last_unacked_delivery_tag = None
+        self._ack_timer = None
         
+        if self._ack_batch_size > self._prefetch_count:
+            # The broker stops delivering once prefetch_count messages are unacked,
+            # so a smaller prefetch would stall the consumer before completing a batch
+            logging.warning(f"action: middleware_config | result: fail | ack_batch_size: {self._ack_batch_size} is greater than prefetch_count: {self._prefetch_count}, using it as prefetch_count")
+            self._prefetch_count = self._ack_batch_size
+        if self._reliable_publishes:
+            self._channel.tx_select()
         self.__declare_input_queues()
         self.__declare_output_exchange()
         
     def __declare_input_queues(self):
-        self._channel.basic_qos(prefetch_count=PREFETCH_COUNT)    
+        self._channel.basic_qos(prefetch_count=self._prefetch_count)    
         for queue, exchange, callback_function in self._input_queues_and_callback_functions:
             self._channel.queue_declare(queue=queue)
             if exchange:
-                self._channel.exchange_declare(exchange=exchange, exchange_type=EXCHANGE_TYPE)
+                self.__declare_exchange(exchange)
                 self._channel.queue_bind(exchange=exchange, queue=queue)
             
             tag = self._channel.basic_consume(queue=queue, on_message_callback=self.__wrapper_callback_function(callback_function))
@@ -31,32 +66,129 @@ class Middleware:
             
     def __wrapper_callback_function(self, callback_function):
         def callback(ch, method, properties, body):
-            callback_function(body)
+            self._handling_delivery = True
+            try:
+                callback_function(body)
+            finally:
+                self._handling_delivery = False
             if ch.is_open:
-                ch.basic_ack(delivery_tag=method.delivery_tag)
+                self._unacked_deliveries += 1
+                self._last_unacked_delivery_tag = method.delivery_tag
+                if self._unacked_deliveries >= self._ack_batch_size:
+                    self.__ack_pending_deliveries()
+                elif self._ack_timer is None and self._ack_flush_interval:
+                    self._ack_timer = self._connection.call_later(self._ack_flush_interval, self.__ack_pending_deliveries)
             
         return callback
+
+    def __ack_pending_deliveries(self):
+        """
+        Ack all the deliveries handled since the last ack with a single cumulative ack.
+        The messages they originated are published first and then the controller's
+        durable state is saved, so the persisted state never gets ahead of what was
+        published and every acked message is reflected in it in case of a crash
+        """
+        if self._ack_timer is not None:
+            self._connection.remove_timeout(self._ack_timer)
+            self._ack_timer = None
+        if not self._unacked_deliveries or not self._channel.is_open:
+            return
+        self.__flush_publishes()
+        if self._before_ack_function:
+            self._before_ack_function()
+        self._channel.basic_ack(delivery_tag=self._last_unacked_delivery_tag, multiple=self._unacked_deliveries > 1)
+        if self._reliable_publishes:
+            # Acks are part of the transaction too
+            self._channel.tx_commit()
+        self._unacked_deliveries = 0
+        self._last_unacked_delivery_tag = None
+
+    def __declare_exchange(self, exchange):
+        if exchange in self._declared_exchanges:
+            return
+        self._channel.exchange_declare(exchange=exchange, exchange_type=EXCHANGE_TYPE)
+        self._declared_exchanges.add(exchange)
         
     def __declare_output_exchange(self):
         if self._output_exchange is None:
             return
-        self._channel.exchange_declare(exchange=self._output_exchange, exchange_type=EXCHANGE_TYPE)
+        self.__declare_exchange(self._output_exchange)
+
+    def __publish(self, exchange, routing_key, msg):
+        """
+        Publish a message right away if batching is disabled, otherwise buffer it
+        and flush the buffered messages when the size or time threshold is reached
+        """
+        if self._publish_batch_size == 1 and not self._reliable_publishes:
+            self._channel.basic_publish(exchange=exchange, routing_key=routing_key, body=msg)
+            return
+        if not self._pending_publishes:
+            self._first_pending_publish_time = time.monotonic()
+        self._pending_publishes.append((exchange, routing_key, msg))
+        if len(self._pending_publishes) >= self._publish_batch_size or self.__publish_flush_interval_elapsed():
+            self.__flush_publishes()
+        else:
+            self.__schedule_publish_flush()
+
+    def __schedule_publish_flush(self):
+        """
+        Schedule a flush of the buffered publishes after the flush interval, so they are
+        published even if no other message is published or acked. Publishes buffered
+        outside of a delivery, where no ack flushes them, are flushed by the next
+        iteration of the connection's loop if there is no flush interval
+        """
+        if self._publish_timer is not None:
+            return
+        if self._publish_flush_interval:
+            self._publish_timer = self._connection.call_later(self._publish_flush_interval, self.__flush_publishes)
+        elif not self._handling_delivery:
+            self._publish_timer = self._connection.call_later(0, self.__flush_publishes)
+
+    def __publish_flush_interval_elapsed(self):
+        if not self._publish_flush_interval:
+            return False
+        return time.monotonic() - self._first_pending_publish_time >= self._publish_flush_interval
+
+    def __flush_publishes(self):
+        """
+        Publish all the buffered messages. With reliable publishes, the whole batch is
+        committed at once in the channel's transaction
+        """
+        if self._publish_timer is not None:
+            self._connection.remove_timeout(self._publish_timer)
+            self._publish_timer = None
+        if not self._pending_publishes or not self._channel.is_open:
+            return
+        for exchange, routing_key, msg in self._pending_publishes:
+            self._channel.basic_publish(exchange=exchange, routing_key=routing_key, body=msg)
+        logging.debug(f"action: flush_publishes | result: success | amount: {len(self._pending_publishes)}")
+        self._pending_publishes = []
+        self._first_pending_publish_time = None
+        if self._reliable_publishes:
+            self._channel.tx_commit()
+
+    def flush(self):
+        """
+        Publish the buffered messages right away. Controllers call it before deleting
+        durable state that would be needed to send them again after a crash
+        """
+        self.__flush_publishes()
         
     def send_message(self, msg, exchange=None):
         if self._output_exchange is None and exchange is None:
             return
         if exchange is None:
-            self._channel.basic_publish(exchange=self._output_exchange, routing_key='', body=msg)
+            self.__publish(self._output_exchange, '', msg)
         else:
-            self._channel.exchange_declare(exchange=exchange, exchange_type=EXCHANGE_TYPE)
-            self._channel.basic_publish(exchange=exchange, routing_key='', body=msg)
+            self.__declare_exchange(exchange)
+            self.__publish(exchange, '', msg)
         
     def reenqueue_message(self, msg, queue=None):
         if queue is None:
             for q, _, _ in self._input_queues_and_callback_functions:
-                self._channel.basic_publish(exchange='', routing_key=q, body=msg)
+                self.__publish('', q, msg)
         else:
-            self._channel.basic_publish(exchange='', routing_key=queue, body=msg)
+            self.__publish('', queue, msg)
         
     def handle_messages(self):
         self._consuming = True
@@ -80,4 +212,5 @@ class Middleware:
             logging.info("action: middleware_stop_consuming | result: success")
             self._connection.add_callback_threadsafe(self.__close_connection)
         else:
+            self.__flush_publishes()
             self.__close_connection()
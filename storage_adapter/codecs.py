@@ -0,0 +1,235 @@
+import ast
+import logging
+import struct
+from collections.abc import Mapping, Sequence, Set
+
+KEY_VALUE_SEPARATOR = ','
+TEXT_LENGTH_DATA_BYTES = 3
+BINARY_CODEC_HEADER = b'\x00\x00\x00\x01'
+
+class UnencodableValueError(TypeError):
+    """
+    Raised for values of a type the codec can not encode. It is a bug of the caller
+    rather than a storage failure, so the storage adapter lets it propagate
+    """
+    pass
+
+class TextCodec:
+    """
+    Codec that stores every value as its repr, parsed back with ast.literal_eval.
+    Records are prefixed with their length in 3 bytes
+    """
+    header = b''
+
+    def encode_record(self, key, value=None):
+        if value is None:
+            data_bytes = repr(key).encode('utf-8')
+        else:
+            data_bytes = f'{repr(key)}{KEY_VALUE_SEPARATOR}{repr(value)}'.encode('utf-8')
+        len_data_bytes = len(data_bytes).to_bytes(TEXT_LENGTH_DATA_BYTES, 'big')
+        return len_data_bytes + data_bytes
+
+    def decode_records(self, data):
+        """
+        Yield a (key,) or (key, value) tuple for every record in data
+        """
+        offset = 0
+        while offset + TEXT_LENGTH_DATA_BYTES <= len(data):
+            len_data = int.from_bytes(data[offset:offset + TEXT_LENGTH_DATA_BYTES], 'big')
+            offset += TEXT_LENGTH_DATA_BYTES
+            if offset + len_data > len(data):
+                logging.debug("action: decode_records | result: fail | data corruption detected")
+                return
+            decoded_data = bytes(data[offset:offset + len_data]).decode('utf-8')
+            offset += len_data
+            if KEY_VALUE_SEPARATOR in decoded_data:
+                key, value = decoded_data.split(KEY_VALUE_SEPARATOR, 1)
+                yield ast.literal_eval(key), ast.literal_eval(value)
+            else:
+                yield (ast.literal_eval(decoded_data),)
+
+    def complete_records_length(self, data):
+        """
+        Length of the complete records at the start of data, leaving out a record torn by a crash
+        """
+        offset = 0
+        while offset + TEXT_LENGTH_DATA_BYTES <= len(data):
+            end = offset + TEXT_LENGTH_DATA_BYTES + int.from_bytes(data[offset:offset + TEXT_LENGTH_DATA_BYTES], 'big')
+            if end > len(data):
+                break
+            offset = end
+        return offset
+
+    def encode_data(self, data):
+        return str(data).encode('utf-8')
+
+    def decode_data(self, data):
+        return ast.literal_eval(bytes(data).decode('utf-8'))
+
+NONE_TAG = 0
+TRUE_TAG = 1
+FALSE_TAG = 2
+INT_TAG = 3
+BIG_INT_TAG = 4
+FLOAT_TAG = 5
+STR_TAG = 6
+BYTES_TAG = 7
+TUPLE_TAG = 8
+LIST_TAG = 9
+SET_TAG = 10
+DICT_TAG = 11
+
+INT = struct.Struct('>q')
+FLOAT = struct.Struct('>d')
+LENGTH = struct.Struct('>I')
+MIN_INT = -2**63
+MAX_INT = 2**63 - 1
+
+class BinaryCodec:
+    """
+    Codec that stores values as a type tag followed by their struct-packed representation.
+    Strings and bytes are prefixed with their length and containers with their amount of
+    items. Records are prefixed with their length in 4 bytes, and a record holds the key
+    followed by the value if there is one. Files start with a header to tell them apart
+    from the ones written by the text codec
+    """
+    header = BINARY_CODEC_HEADER
+
+    def encode_record(self, key, value=None):
+        data = bytearray()
+        self.__encode_value(key, data)
+        if value is not None:
+            self.__encode_value(value, data)
+        return LENGTH.pack(len(data)) + data
+
+    def decode_records(self, data):
+        """
+        Yield a (key,) or (key, value) tuple for every record in data
+        """
+        offset = 0
+        while offset + LENGTH.size <= len(data):
+            len_data, = LENGTH.unpack_from(data, offset)
+            offset += LENGTH.size
+            end = offset + len_data
+            if end > len(data):
+                logging.debug("action: decode_records | result: fail | data corruption detected")
+                return
+            key, offset = self.__decode_value(data, offset)
+            if offset == end:
+                yield (key,)
+            else:
+                value, offset = self.__decode_value(data, offset)
+                yield key, value
+
+    def complete_records_length(self, data):
+        """
+        Length of the complete records at the start of data, leaving out a record torn by a crash
+        """
+        offset = 0
+        while offset + LENGTH.size <= len(data):
+            end = offset + LENGTH.size + LENGTH.unpack_from(data, offset)[0]
+            if end > len(data):
+                break
+            offset = end
+        return offset
+
+    def encode_data(self, data):
+        encoded_data = bytearray()
+        self.__encode_value(data, encoded_data)
+        return bytes(encoded_data)
+
+    def decode_data(self, data):
+        value, _ = self.__decode_value(data, 0)
+        return value
+
+    def __encode_value(self, value, data):
+        if value is None:
+            data.append(NONE_TAG)
+        elif value is True:
+            data.append(TRUE_TAG)
+        elif value is False:
+            data.append(FALSE_TAG)
+        elif isinstance(value, int):
+            if MIN_INT <= value <= MAX_INT:
+                data.append(INT_TAG)
+                data += INT.pack(value)
+            else:
+                self.__encode_sized(BIG_INT_TAG, str(value).encode('utf-8'), data)
+        elif isinstance(value, float):
+            data.append(FLOAT_TAG)
+            data += FLOAT.pack(value)
+        elif isinstance(value, str):
+            self.__encode_sized(STR_TAG, value.encode('utf-8'), data)
+        elif isinstance(value, (bytes, bytearray, memoryview)):
+            self.__encode_sized(BYTES_TAG, bytes(value), data)
+        elif isinstance(value, Mapping):
+            data.append(DICT_TAG)
+            data += LENGTH.pack(len(value))
+            for k, v in value.items():
+                self.__encode_value(k, data)
+                self.__encode_value(v, data)
+        elif isinstance(value, (Sequence, Set)):
+            # Other sequences and sets are decoded back as lists and sets
+            data.append(TUPLE_TAG if isinstance(value, tuple) else SET_TAG if isinstance(value, Set) else LIST_TAG)
+            data += LENGTH.pack(len(value))
+            for item in value:
+                self.__encode_value(item, data)
+        else:
+            raise UnencodableValueError(f"Type {type(value).__name__} can not be encoded by the binary codec")
+
+    def __encode_sized(self, tag, value_bytes, data):
+        data.append(tag)
+        data += LENGTH.pack(len(value_bytes))
+        data += value_bytes
+
+    def __decode_value(self, data, offset):
+        tag = data[offset]
+        offset += 1
+        if tag == INT_TAG:
+            return INT.unpack_from(data, offset)[0], offset + INT.size
+        if tag == STR_TAG:
+            length, = LENGTH.unpack_from(data, offset)
+            offset += LENGTH.size
+            return str(data[offset:offset + length], 'utf-8'), offset + length
+        if tag == FLOAT_TAG:
+            return FLOAT.unpack_from(data, offset)[0], offset + FLOAT.size
+        if tag == NONE_TAG:
+            return None, offset
+        if tag == TRUE_TAG:
+            return True, offset
+        if tag == FALSE_TAG:
+            return False, offset
+        if tag == BIG_INT_TAG:
+            length, = LENGTH.unpack_from(data, offset)
+            offset += LENGTH.size
+            return int(str(data[offset:offset + length], 'utf-8')), offset + length
+        if tag == BYTES_TAG:
+            length, = LENGTH.unpack_from(data, offset)
+            offset += LENGTH.size
+            return bytes(data[offset:offset + length]), offset + length
+        if tag in (TUPLE_TAG, LIST_TAG, SET_TAG, DICT_TAG):
+            amount, = LENGTH.unpack_from(data, offset)
+            offset += LENGTH.size
+            if tag == DICT_TAG:
+                value = {}
+                for _ in range(amount):
+                    k, offset = self.__decode_value(data, offset)
+                    value[k], offset = self.__decode_value(data, offset)
+                return value, offset
+            items = []
+            for _ in range(amount):
+                item, offset = self.__decode_value(data, offset)
+                items.append(item)
+            if tag == TUPLE_TAG:
+                return tuple(items), offset
+            return (items if tag == LIST_TAG else set(items)), offset
+        raise ValueError(f"Unknown binary codec tag: {tag}")
+
+TEXT_CODEC = TextCodec()
+BINARY_CODEC = BinaryCodec()
+
+def codec_of(data):
+    """
+    Detect the codec a file was written with from its first bytes
+    """
+    return BINARY_CODEC if bytes(data[:len(BINARY_CODEC_HEADER)]) == BINARY_CODEC_HEADER else TEXT_CODEC
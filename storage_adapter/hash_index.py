@@ -0,0 +1,171 @@
+import mmap
+import os
+import struct
+import uuid
+
+INDEX_FILE_EXTENSION = ".idx"
+DATA_FILE_EXTENSION = ".dat"
+INDEX_MAGIC = b'HASHIDX1'
+HEADER = struct.Struct('<8sQQ')
+BUCKET = struct.Struct('<QQI4x')
+BUCKET_LOCATION = struct.Struct('<QI')
+BUCKET_KEY = struct.Struct('<Q')
+INITIAL_CAPACITY = 1024
+MAX_LOAD_FACTOR = 0.7
+HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+UINT64_MASK = 2**64 - 1
+
+class HashIndex:
+    """
+    On-disk map of non-negative int keys to str values. The index file is an open
+    addressing hash table with linear probing accessed through mmap, where every bucket
+    holds the key plus one (0 marks an empty bucket) and the location of the value in
+    the data file, which is append only. Lookups read a few buckets from the page cache
+    and one value with a single pread, so the memory used does not depend on the amount
+    of entries and opening an existing index does not read it
+    """
+    def __init__(self, path):
+        self._index_file_path = f"{path}{INDEX_FILE_EXTENSION}"
+        self._data_file_path = f"{path}{DATA_FILE_EXTENSION}"
+        if not os.path.exists(self._index_file_path):
+            self.__create_index_file(self._index_file_path, INITIAL_CAPACITY)
+        self.__map_index()
+        self._data_file = open(self._data_file_path, 'ab')
+        self._data_fd = os.open(self._data_file_path, os.O_RDONLY)
+
+    def __create_index_file(self, index_file_path, capacity):
+        with open(index_file_path, 'wb') as f:
+            f.write(HEADER.pack(INDEX_MAGIC, capacity, 0))
+            f.truncate(HEADER.size + capacity * BUCKET.size)
+
+    def __map_index(self):
+        self._index_file = open(self._index_file_path, 'r+b')
+        self._index = mmap.mmap(self._index_file.fileno(), 0)
+        magic, self._capacity, self._count = HEADER.unpack_from(self._index, 0)
+        if magic != INDEX_MAGIC:
+            raise ValueError(f"Invalid hash index file: {self._index_file_path}")
+        self._hash_shift = 64 - (self._capacity.bit_length() - 1)
+
+    def __unmap_index(self):
+        self._index.close()
+        self._index_file.close()
+
+    def __bucket_position(self, bucket):
+        return HEADER.size + bucket * BUCKET.size
+
+    def __find_bucket(self, index, capacity, hash_shift, key):
+        """
+        Return the position of the bucket holding the key, or of the empty bucket where
+        it should be inserted
+        """
+        stored_key = key + 1
+        bucket = ((stored_key * HASH_MULTIPLIER) & UINT64_MASK) >> hash_shift
+        while True:
+            position = HEADER.size + bucket * BUCKET.size
+            bucket_key, = BUCKET_KEY.unpack_from(index, position)
+            if bucket_key == 0 or bucket_key == stored_key:
+                return position, bucket_key
+            bucket = (bucket + 1) & (capacity - 1)
+
+    def __get_location(self, key):
+        if not isinstance(key, int) or not 0 <= key < UINT64_MASK:
+            return None
+        position, bucket_key = self.__find_bucket(self._index, self._capacity, self._hash_shift, key)
+        if bucket_key == 0:
+            return None
+        return BUCKET_LOCATION.unpack_from(self._index, position + BUCKET_KEY.size)
+
+    def __contains__(self, key):
+        return self.__get_location(key) is not None
+
+    def __getitem__(self, key):
+        location = self.__get_location(key)
+        if location is None:
+            raise KeyError(key)
+        offset, length = location
+        return os.pread(self._data_fd, length, offset).decode('utf-8')
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __len__(self):
+        return self._count
+
+    def keys(self):
+        """
+        Return the stored keys, scanning every bucket of the index
+        """
+        return [bucket_key - 1 for bucket_key, _, _ in BUCKET.iter_unpack(self._index[HEADER.size:]) if bucket_key != 0]
+
+    def __setitem__(self, key, value):
+        self.put_many([(key, value)])
+
+    def put_many(self, key_values):
+        """
+        Store several values with a single write to the data file. Values are written
+        before their buckets, so a crash can only leave unreferenced bytes in the data
+        file. The value of a key that is already stored is not modified
+        """
+        new_key_values = {}
+        for key, value in key_values:
+            if not isinstance(key, int) or not 0 <= key < UINT64_MASK:
+                raise ValueError(f"Hash index keys must be non-negative ints, got: {key}")
+            if key not in new_key_values and key not in self:
+                new_key_values[key] = value.encode('utf-8')
+        if not new_key_values:
+            return
+        while self._count + len(new_key_values) > self._capacity * MAX_LOAD_FACTOR:
+            self.__grow()
+        offset = self._data_file.tell()
+        self._data_file.write(b''.join(new_key_values.values()))
+        self._data_file.flush()
+        for key, value_bytes in new_key_values.items():
+            position, _ = self.__find_bucket(self._index, self._capacity, self._hash_shift, key)
+            BUCKET_LOCATION.pack_into(self._index, position + BUCKET_KEY.size, offset, len(value_bytes))
+            BUCKET_KEY.pack_into(self._index, position, key + 1)
+            offset += len(value_bytes)
+        self._count += len(new_key_values)
+        HEADER.pack_into(self._index, 0, INDEX_MAGIC, self._capacity, self._count)
+
+    def __grow(self):
+        """
+        Rehash every bucket into an index file with twice the capacity, which replaces
+        the current one atomically
+        """
+        capacity = self._capacity * 2
+        hash_shift = 64 - (capacity.bit_length() - 1)
+        temp_index_file_path = os.path.join(os.path.dirname(self._index_file_path), f"{uuid.uuid4()}")
+        self.__create_index_file(temp_index_file_path, capacity)
+        with open(temp_index_file_path, 'r+b') as f:
+            with mmap.mmap(f.fileno(), 0) as index:
+                for bucket in range(self._capacity):
+                    bucket_data = self._index[self.__bucket_position(bucket):self.__bucket_position(bucket + 1)]
+                    bucket_key, = BUCKET_KEY.unpack_from(bucket_data, 0)
+                    if bucket_key == 0:
+                        continue
+                    position, _ = self.__find_bucket(index, capacity, hash_shift, bucket_key - 1)
+                    index[position:position + BUCKET.size] = bucket_data
+                HEADER.pack_into(index, 0, INDEX_MAGIC, capacity, self._count)
+                index.flush()
+        self.__unmap_index()
+        os.replace(temp_index_file_path, self._index_file_path)
+        self.__map_index()
+
+    def flush(self):
+        self._data_file.flush()
+        self._index.flush()
+
+    def close(self):
+        self.flush()
+        self.__unmap_index()
+        self._data_file.close()
+        os.close(self._data_fd)
+
+    def delete(self):
+        self.close()
+        for file_path in (self._index_file_path, self._data_file_path):
+            if os.path.exists(file_path):
+                os.remove(file_path)
@@ -1,14 +1,45 @@
 import logging
 import os
 import uuid
-import ast
+import time
+from storage_adapter.codecs import BINARY_CODEC, BINARY_CODEC_HEADER, UnencodableValueError, codec_of
+from storage_adapter.hash_index import HashIndex, INDEX_FILE_EXTENSION
 
-LENGTH_DATA_BYTES = 3
-KEY_VALUE_SEPARATOR = ','
+SNAPSHOT_FILE_KEY_PREFIX = "snapshot_"
+WAL_FILE_KEY_PREFIX = "wal_"
+HASH_INDEX_FILE_KEY_PREFIX = "index_"
+WAL_MAX_RECORDS = 1000
+WAL_MAX_BYTES = 4 * 1024 * 1024
+MAX_APPEND_HANDLES = 64
+FLUSH_PER_CALL = "flush_per_call"
+FLUSH_PER_BATCH = "flush_per_batch"
+FSYNC_INTERVAL = "fsync_interval"
+DURABILITY_POLICIES = (FLUSH_PER_CALL, FLUSH_PER_BATCH, FSYNC_INTERVAL)
+FSYNC_INTERVAL_MS = 100
 
 class StorageAdapter:
-    def __init__(self, storage_path):
+    def __init__(self, storage_path, wal_max_records=WAL_MAX_RECORDS, wal_max_bytes=WAL_MAX_BYTES, codec=BINARY_CODEC, durability_policy=FLUSH_PER_BATCH, fsync_interval_ms=FSYNC_INTERVAL_MS):
         self.storage_path = storage_path
+        # With FLUSH_PER_CALL every record is flushed on its own, with FLUSH_PER_BATCH all
+        # the records of an append call are flushed at once, and with FSYNC_INTERVAL they
+        # are also fsynced by the first append after fsync_interval_ms elapsed since the
+        # last fsync, when their handle is evicted or when the adapter is closed
+        if durability_policy not in DURABILITY_POLICIES:
+            raise ValueError(f"Unknown durability policy: {durability_policy}")
+        self._durability_policy = durability_policy
+        self._fsync_interval = fsync_interval_ms / 1000
+        self._last_fsync_time = time.monotonic()
+        self._append_handles = {}
+        # Paths of the append handles written since the last fsync
+        self._unsynced_file_paths = set()
+        # Codec used to write new files. Existing files are read and appended to with the
+        # codec they were written with, detected from their header
+        self._codec = codec
+        self._files_codecs = {}
+        self._wal_max_records = wal_max_records
+        self._wal_max_bytes = wal_max_bytes
+        # Last sequence number, amount of records and size in bytes of every write-ahead log
+        self._wals_status = {}
         try:
             os.makedirs(os.path.dirname(storage_path), exist_ok=True)
             logging.debug(f"Storage directory created at: {storage_path}")
@@ -39,66 +70,168 @@ class StorageAdapter:
     
     def delete(self, file_key, secondary_file_key=None):
         file_path = self.__get_file_path(file_key, secondary_file_key)
+        self.__forget_file(file_path)
         try:
             os.remove(file_path)
             logging.debug(f"action: delete_file_from_storage | result: success | path: {file_path}")
         except Exception as e:
             logging.error(f"action: delete_file_from_storage | result: fail | error: {e} | path: {file_path}")
     
-    def __encode_key_value(self, key, value=None):
-        if value is None:
-            data_bytes = repr(key).encode('utf-8')
-        else:
-            data_bytes = f'{repr(key)}{KEY_VALUE_SEPARATOR}{repr(value)}'.encode('utf-8')
-        len_data_bytes = len(data_bytes).to_bytes(LENGTH_DATA_BYTES, 'big')
-        return len_data_bytes + data_bytes
+    def __get_appending_codec(self, file_path):
+        """
+        Get the codec to append records to a file with. Existing files keep the codec
+        they were written with and new ones use the adapter's codec
+        """
+        if file_path not in self._files_codecs:
+            codec = self._codec
+            if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
+                with open(file_path, 'rb') as f:
+                    codec = codec_of(f.read(len(BINARY_CODEC_HEADER)))
+            self._files_codecs[file_path] = codec
+        return self._files_codecs[file_path]
+    
+    def __get_append_handle(self, file_path):
+        """
+        Get a cached handle to append to a file, closing the least recently used handle
+        if there are too many open
+        """
+        f = self._append_handles.pop(file_path, None)
+        if f is None:
+            if len(self._append_handles) >= MAX_APPEND_HANDLES:
+                least_recently_used_file_path = next(iter(self._append_handles))
+                self.__close_append_handle(least_recently_used_file_path)
+            f = open(file_path, 'ab')
+        self._append_handles[file_path] = f
+        return f
+    
+    def __close_append_handle(self, file_path):
+        """
+        Close the cached handle of a file, fsyncing it first if it has unsynced records
+        """
+        f = self._append_handles.pop(file_path)
+        if file_path in self._unsynced_file_paths:
+            self._unsynced_file_paths.discard(file_path)
+            os.fsync(f.fileno())
+        f.close()
+    
+    def __fsync_append_handles(self):
+        for file_path in self._unsynced_file_paths:
+            os.fsync(self._append_handles[file_path].fileno())
+        self._unsynced_file_paths = set()
+        self._last_fsync_time = time.monotonic()
+    
+    def __forget_file(self, file_path):
+        """
+        Close the cached handle and forget the codec of a file that is going to be removed or replaced
+        """
+        self._files_codecs.pop(file_path, None)
+        # Its unsynced records are not fsynced, as the file is going away
+        self._unsynced_file_paths.discard(file_path)
+        f = self._append_handles.pop(file_path, None)
+        if f is not None:
+            f.close()
+    
+    def __append_records(self, file_path, key_values):
+        """
+        Append records to a file according to the durability policy. Returns the size in
+        bytes of the appended records
+        """
+        codec = self.__get_appending_codec(file_path)
+        records = [codec.encode_record(key, value) for key, value in key_values]
+        size = sum(len(record) for record in records)
+        try:
+            f = self.__get_append_handle(file_path)
+            if f.tell() == 0:
+                f.write(codec.header)
+            if self._durability_policy == FLUSH_PER_CALL:
+                for record in records:
+                    f.write(record)
+                    f.flush()
+            else:
+                f.write(b''.join(records))
+                f.flush()
+            if self._durability_policy == FSYNC_INTERVAL:
+                self._unsynced_file_paths.add(file_path)
+                if time.monotonic() - self._last_fsync_time >= self._fsync_interval:
+                    self.__fsync_append_handles()
+        except Exception:
+            self.__forget_file(file_path)
+            raise
+        return size
 
     def append(self, file_key, key, value=None, secondary_file_key=None):
         file_path = self.__get_file_path(file_key, secondary_file_key)
         try:
-            with open(file_path, 'ab') as f:
-                f.write(self.__encode_key_value(key, value))
-                f.flush()
+            self.__append_records(file_path, [(key, value)])
             logging.debug(f"action: append_data_to_storage | result: success | key: {key} | value: {value} | file_path: {file_path}")
+        except UnencodableValueError:
+            raise
         except Exception as e:
             logging.error(f"action: append_data_to_storage | result: fail | error: {e}")
+    
+    def append_many(self, file_key, key_values, secondary_file_key=None):
+        """
+        Append several (key, value) records to a file with a single write
+        """
+        file_path = self.__get_file_path(file_key, secondary_file_key)
+        try:
+            self.__append_records(file_path, key_values)
+            logging.debug(f"action: append_many_data_to_storage | result: success | amount: {len(key_values)} | file_path: {file_path}")
+        except UnencodableValueError:
+            raise
+        except Exception as e:
+            logging.error(f"action: append_many_data_to_storage | result: fail | error: {e}")
             
-    def __load_key_values_from_file(self, file_path):
+    def __load_key_values_from_file(self, file_path, truncate_torn_record=False):
         key_values = {}
         keys = set()
         with open(file_path, 'rb') as f:
-            while True:
-                len_data_bytes = f.read(LENGTH_DATA_BYTES)
-                if not len_data_bytes:
-                    break
-                len_data = int.from_bytes(len_data_bytes, 'big')
-                data_bytes = f.read(len_data)
-                if not data_bytes:
-                    break
-                if len(data_bytes) == len_data:
-                    decoded_data = data_bytes.decode('utf-8')
-                    if KEY_VALUE_SEPARATOR in decoded_data:
-                        key, value = decoded_data.split(KEY_VALUE_SEPARATOR, 1)
-                        key_values[ast.literal_eval(key)] = ast.literal_eval(value)
-                    else:
-                        keys.add(ast.literal_eval(decoded_data))
-                else:
-                    logging.debug(f"action: load_data_from_storage | result: fail | data corruption detected | path: {file_path}")  
+            data_bytes = f.read()
+        codec = codec_of(data_bytes)
+        records_data = memoryview(data_bytes)[len(codec.header):]
+        for record in codec.decode_records(records_data):
+            if len(record) == 2:
+                key_values[record[0]] = record[1]
+            else:
+                keys.add(record[0])
+        if truncate_torn_record:
+            # A record torn by a crash is dropped, otherwise the records appended after it
+            # would be read as part of it
+            complete_size = len(codec.header) + codec.complete_records_length(records_data)
+            if complete_size < len(data_bytes):
+                os.truncate(file_path, complete_size)
+                logging.warning(f"action: truncate_torn_record | result: success | size: {complete_size} | path: {file_path}")
         logging.debug(f"action: load_data_from_storage | result: success | path: {file_path}")
         return keys if not key_values and keys else key_values
             
-    def load_key_values(self, file_key):
-        return self.__load(file_key, self.__load_key_values_from_file)
+    def load_key_values(self, file_key, secondary_file_key=None):
+        """
+        Load the records of every secondary file key of the file key, or only the ones
+        of the given secondary file key
+        """
+        if secondary_file_key is None:
+            return self.__load(file_key, self.__load_key_values_from_file)
+        file_path = self.__get_file_path(file_key, secondary_file_key)
+        if not os.path.exists(file_path):
+            return None
+        return self.__load_key_values_from_file(file_path)
+            
+    def __write_atomically(self, file_path, data):
+        encoded_data = self._codec.encode_data(data)
+        temp_file_path = self.__get_temp_file_path()
+        with open(temp_file_path, 'wb') as temp_f:
+            temp_f.write(self._codec.header + encoded_data)
+            temp_f.flush()
+        self.__forget_file(file_path)
+        os.replace(temp_file_path, file_path)
             
     def update(self, file_key, data, secondary_file_key=None):
         file_path = self.__get_file_path(file_key, secondary_file_key)
-        temp_file_path = self.__get_temp_file_path()
         try:
-            with open(temp_file_path, 'wb') as temp_f:
-                temp_f.write(str(data).encode('utf-8'))
-                temp_f.flush()
-            os.replace(temp_file_path, file_path)
+            self.__write_atomically(file_path, data)
             logging.debug(f"action: update_data_in_storage | result: success | file_path: {file_path}")
+        except UnencodableValueError:
+            raise
         except Exception as e:
             logging.error(f"action: update_data_in_storage | result: fail | error: {e} | path: {file_path}")
     
@@ -110,7 +243,8 @@ class StorageAdapter:
                 logging.debug(f"action: load_data_from_storage | result: fail | empty file | path: {file_path}")
                 return None
             try:
-                data = ast.literal_eval(data_bytes.decode('utf-8'))
+                codec = codec_of(data_bytes)
+                data = codec.decode_data(memoryview(data_bytes)[len(codec.header):])
             except Exception as e:
                 logging.error(f"action: load_data_from_storage | result: fail | error: {e} | path: {file_path}")
                 return None
@@ -119,3 +253,107 @@ class StorageAdapter:
     
     def load_data(self, file_key):
         return self.__load(file_key, self.__load_data_from_file)
+
+    def append_to_wal(self, file_key, delta, secondary_file_key=None):
+        """
+        Append a delta to the write-ahead log of the file key. Every record is tagged with a
+        sequence number so the records already included in a snapshot are skipped on replay.
+        Returns True when the log reached the configured amount of records or bytes and
+        should be compacted
+        """
+        wal_file_path = self.__get_file_path(f"{WAL_FILE_KEY_PREFIX}{file_key}", secondary_file_key)
+        sequence_number, records, size = self._wals_status.get(wal_file_path, (0, 0, 0))
+        try:
+            record_size = self.__append_records(wal_file_path, [(sequence_number + 1, delta)])
+            logging.debug(f"action: append_to_wal | result: success | sequence_number: {sequence_number + 1} | file_path: {wal_file_path}")
+        except UnencodableValueError:
+            raise
+        except Exception as e:
+            logging.error(f"action: append_to_wal | result: fail | error: {e} | path: {wal_file_path}")
+            return False
+        self._wals_status[wal_file_path] = (sequence_number + 1, records + 1, size + record_size)
+        return records + 1 >= self._wal_max_records or size + record_size >= self._wal_max_bytes
+    
+    def compact_wal(self, file_key, data, secondary_file_key=None):
+        """
+        Store a snapshot of the data, which must include every delta appended to the
+        write-ahead log, and truncate the log. If the process crashes before the log is
+        truncated, the records already in the snapshot are skipped by their sequence number
+        """
+        wal_file_path = self.__get_file_path(f"{WAL_FILE_KEY_PREFIX}{file_key}", secondary_file_key)
+        snapshot_file_path = self.__get_file_path(f"{SNAPSHOT_FILE_KEY_PREFIX}{file_key}", secondary_file_key)
+        sequence_number, _, _ = self._wals_status.get(wal_file_path, (0, 0, 0))
+        try:
+            self.__write_atomically(snapshot_file_path, (sequence_number, data))
+            self.__forget_file(wal_file_path)
+            with open(wal_file_path, 'wb'):
+                pass
+            logging.debug(f"action: compact_wal | result: success | sequence_number: {sequence_number} | file_path: {snapshot_file_path}")
+        except UnencodableValueError:
+            raise
+        except Exception as e:
+            logging.error(f"action: compact_wal | result: fail | error: {e} | path: {snapshot_file_path}")
+            return
+        self._wals_status[wal_file_path] = (sequence_number, 0, 0)
+    
+    def load_wal(self, file_key, apply_delta_function, new_data_function):
+        """
+        Rebuild the data of every secondary file key from its last snapshot and the deltas
+        of its write-ahead log appended after it
+        
+        Args:
+            file_key: The file key used to append the deltas
+            apply_delta_function: Function that applies a delta to the data in place
+            new_data_function: Function that creates the data to apply the deltas to when there is no snapshot
+        """
+        snapshots = self.__load(f"{SNAPSHOT_FILE_KEY_PREFIX}{file_key}", self.__load_data_from_file) or {}
+        wals = self.__load(f"{WAL_FILE_KEY_PREFIX}{file_key}", lambda file_path: self.__load_key_values_from_file(file_path, truncate_torn_record=True)) or {}
+        data = {}
+        for secondary_file_key in snapshots.keys() | wals.keys():
+            sequence_number, secondary_data = snapshots.get(secondary_file_key) or (0, new_data_function())
+            deltas = wals.get(secondary_file_key) or {}
+            for delta_sequence_number, delta in deltas.items():
+                if delta_sequence_number <= sequence_number:
+                    continue
+                apply_delta_function(secondary_data, delta)
+                sequence_number = delta_sequence_number
+            wal_file_path = self.__get_file_path(f"{WAL_FILE_KEY_PREFIX}{file_key}", secondary_file_key)
+            wal_size = os.path.getsize(wal_file_path) if os.path.exists(wal_file_path) else 0
+            self._wals_status[wal_file_path] = (sequence_number, len(deltas), wal_size)
+            data[secondary_file_key] = secondary_data
+        return data if data else None
+    
+    def delete_wal(self, file_key, secondary_file_key=None):
+        wal_file_path = self.__get_file_path(f"{WAL_FILE_KEY_PREFIX}{file_key}", secondary_file_key)
+        self._wals_status.pop(wal_file_path, None)
+        for prefix in (SNAPSHOT_FILE_KEY_PREFIX, WAL_FILE_KEY_PREFIX):
+            if os.path.exists(self.__get_file_path(f"{prefix}{file_key}", secondary_file_key)):
+                self.delete(f"{prefix}{file_key}", secondary_file_key=secondary_file_key)
+    
+    def open_hash_index(self, file_key, secondary_file_key=None):
+        """
+        Open the on-disk hash index of the file key, creating it if it does not exist
+        """
+        return HashIndex(self.__get_file_path(f"{HASH_INDEX_FILE_KEY_PREFIX}{file_key}", secondary_file_key))
+    
+    def load_hash_indexes(self, file_key):
+        """
+        Open the existing hash indexes of the file key by secondary file key. Their entries
+        are not read, so it takes the same time regardless of their size
+        """
+        prefix = f"{HASH_INDEX_FILE_KEY_PREFIX}{file_key}"
+        hash_indexes = {}
+        with os.scandir(self.storage_path) as files:
+            for f in files:
+                if f.name.startswith(prefix) and f.name.endswith(INDEX_FILE_EXTENSION):
+                    secondary_file_key = f.name[len(prefix):-len(INDEX_FILE_EXTENSION)]
+                    hash_indexes[secondary_file_key] = self.open_hash_index(file_key, secondary_file_key)
+                    logging.debug(f"action: load_hash_index_from_storage | result: success | entries: {len(hash_indexes[secondary_file_key])} | path: {f.name}")
+        return hash_indexes if hash_indexes else None
+    
+    def close(self):
+        """
+        Close the cached append handles, fsyncing the ones with unsynced records
+        """
+        for file_path in list(self._append_handles):
+            self.__close_append_handle(file_path)
@@ -0,0 +1,140 @@
+import os
+import shutil
+import sys
+import tempfile
+import types
+import unittest
+from collections import OrderedDict, deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from storage_adapter.codecs import BINARY_CODEC, TEXT_CODEC, UnencodableValueError, codec_of
+from storage_adapter.storage_adapter import StorageAdapter
+
+VALUES = [
+    None,
+    True,
+    False,
+    0,
+    -1,
+    2**63 - 1,
+    -2**63,
+    2**63,
+    -2**100,
+    0.0,
+    -1.5,
+    3.141592653589793,
+    float("inf"),
+    "",
+    "text with , separators and ñ",
+    b"",
+    b"\x00\xffbytes",
+    [],
+    [1, "a", None],
+    (),
+    (1, 2.5, "b"),
+    set(),
+    {1, "a", (2, 3)},
+    {},
+    {"a": 1, 2: [3, 4], (5, 6): {"nested": {7, 8}}},
+    [{"a": (1, [2, {3: None}])}, ("b", b"c")],
+]
+
+def decode(codec, value):
+    return codec.decode_data(memoryview(codec.encode_data(value)))
+
+class TestBinaryCodec(unittest.TestCase):
+    def test_round_trip(self):
+        for value in VALUES:
+            with self.subTest(value=value):
+                decoded_value = decode(BINARY_CODEC, value)
+                self.assertEqual(decoded_value, value)
+                self.assertIs(type(decoded_value), type(value))
+
+    def test_nan_round_trip(self):
+        decoded_value = decode(BINARY_CODEC, float("nan"))
+        self.assertNotEqual(decoded_value, decoded_value)
+
+    def test_abstract_containers_are_decoded_as_builtins(self):
+        cases = [
+            (types.MappingProxyType({"a": 1}), {"a": 1}),
+            (OrderedDict([("b", 2), ("a", 1)]), {"b": 2, "a": 1}),
+            (deque([1, 2, 3]), [1, 2, 3]),
+            (range(3), [0, 1, 2]),
+            (frozenset({1, 2}), {1, 2}),
+            ({"a": 1}.keys(), {"a"}),
+            (bytearray(b"ab"), b"ab"),
+            (memoryview(b"cd"), b"cd"),
+        ]
+        for value, expected_value in cases:
+            with self.subTest(value=value):
+                decoded_value = decode(BINARY_CODEC, value)
+                self.assertEqual(decoded_value, expected_value)
+                self.assertIs(type(decoded_value), type(expected_value))
+
+    def test_unencodable_value(self):
+        for value in (object(), 1j, [1, object()], {"a": object()}):
+            with self.subTest(value=value):
+                with self.assertRaises(UnencodableValueError):
+                    BINARY_CODEC.encode_data(value)
+                with self.assertRaises(UnencodableValueError):
+                    BINARY_CODEC.encode_record("key", value)
+
+    def test_unencodable_value_is_a_type_error(self):
+        self.assertTrue(issubclass(UnencodableValueError, TypeError))
+
+    def test_unknown_tag(self):
+        with self.assertRaises(ValueError):
+            BINARY_CODEC.decode_data(memoryview(b"\xff"))
+
+class TestRecords(unittest.TestCase):
+    def test_records_round_trip(self):
+        records = [("key", "value"), (1, [1, 2]), ("a", {"b": 2, "c": (3, 4)}), ("only_key",), (2, 0), (3, False)]
+        for codec in (BINARY_CODEC, TEXT_CODEC):
+            with self.subTest(codec=type(codec).__name__):
+                data = b"".join(codec.encode_record(*record) for record in records)
+                self.assertEqual(list(codec.decode_records(memoryview(data))), records)
+                self.assertEqual(codec.complete_records_length(memoryview(data)), len(data))
+
+    def test_torn_record_is_not_decoded(self):
+        for codec in (BINARY_CODEC, TEXT_CODEC):
+            with self.subTest(codec=type(codec).__name__):
+                first_record = codec.encode_record("a", 1)
+                data = first_record + codec.encode_record("b", 2)[:-1]
+                self.assertEqual(list(codec.decode_records(memoryview(data))), [("a", 1)])
+                self.assertEqual(codec.complete_records_length(memoryview(data)), len(first_record))
+
+class TestCodecDetection(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.storage_path = os.path.join(self.directory, "storage/")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_codec_of(self):
+        self.assertIs(codec_of(BINARY_CODEC.header + BINARY_CODEC.encode_record("a", 1)), BINARY_CODEC)
+        self.assertIs(codec_of(TEXT_CODEC.encode_record("a", 1)), TEXT_CODEC)
+        self.assertIs(codec_of(b""), TEXT_CODEC)
+
+    def test_files_are_read_with_the_codec_they_were_written_with(self):
+        text_storage_adapter = StorageAdapter(self.storage_path, codec=TEXT_CODEC)
+        text_storage_adapter.append("records", "a", 1, secondary_file_key="text")
+        text_storage_adapter.update("data", {"a": [1, 2]}, secondary_file_key="text")
+        text_storage_adapter.close()
+        binary_storage_adapter = StorageAdapter(self.storage_path)
+        binary_storage_adapter.append("records", "b", 2, secondary_file_key="binary")
+        binary_storage_adapter.update("data", {"b": (3, 4)}, secondary_file_key="binary")
+        # Appending to a file written by the text codec keeps using the text codec
+        binary_storage_adapter.append("records", "c", 3, secondary_file_key="text")
+        binary_storage_adapter.close()
+        with open(os.path.join(self.storage_path, "recordstext"), 'rb') as f:
+            self.assertIs(codec_of(f.read()), TEXT_CODEC)
+        with open(os.path.join(self.storage_path, "recordsbinary"), 'rb') as f:
+            self.assertIs(codec_of(f.read()), BINARY_CODEC)
+        storage_adapter = StorageAdapter(self.storage_path)
+        self.assertEqual(storage_adapter.load_key_values("records"), {"text": {"a": 1, "c": 3}, "binary": {"b": 2}})
+        self.assertEqual(storage_adapter.load_data("data"), {"text": {"a": [1, 2]}, "binary": {"b": (3, 4)}})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from storage_adapter.hash_index import HashIndex, BUCKET, HEADER, INITIAL_CAPACITY, MAX_LOAD_FACTOR, UINT64_MASK
+from storage_adapter.storage_adapter import StorageAdapter
+
+class TestHashIndex(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "index_movies")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_put_and_get(self):
+        index = HashIndex(self.path)
+        index[7] = "Toy Story"
+        index.put_many([(0, "Heat"), (42, "Amélie")])
+        self.assertEqual(len(index), 3)
+        self.assertEqual(index[7], "Toy Story")
+        self.assertEqual(index[0], "Heat")
+        self.assertEqual(index[42], "Amélie")
+        self.assertNotIn(8, index)
+        self.assertIsNone(index.get(8))
+        with self.assertRaises(KeyError):
+            index[8]
+        self.assertEqual(sorted(index.keys()), [0, 7, 42])
+        index.close()
+
+    def test_grows_and_rehashes(self):
+        index = HashIndex(self.path)
+        amount = int(INITIAL_CAPACITY * MAX_LOAD_FACTOR) * 4
+        keys = [key * 7919 for key in range(amount)]
+        index.put_many([(key, f"movie {key}") for key in keys[:amount // 2]])
+        for key in keys[amount // 2:]:
+            index[key] = f"movie {key}"
+        self.assertEqual(len(index), amount)
+        for key in keys:
+            self.assertEqual(index[key], f"movie {key}")
+        self.assertEqual(sorted(index.keys()), keys)
+        index.close()
+        self.assertEqual(os.path.getsize(f"{self.path}.idx"), HEADER.size + INITIAL_CAPACITY * 4 * BUCKET.size)
+        # Growing replaces the index file, so no temporary files are left behind
+        self.assertEqual(sorted(os.listdir(self.directory)), ["index_movies.dat", "index_movies.idx"])
+
+    def test_reopen(self):
+        index = HashIndex(self.path)
+        index.put_many([(key, f"movie {key}") for key in range(INITIAL_CAPACITY)])
+        index.close()
+        index = HashIndex(self.path)
+        self.assertEqual(len(index), INITIAL_CAPACITY)
+        self.assertEqual(index[INITIAL_CAPACITY - 1], f"movie {INITIAL_CAPACITY - 1}")
+        index[INITIAL_CAPACITY] = "new movie"
+        index.close()
+        index = HashIndex(self.path)
+        self.assertEqual(len(index), INITIAL_CAPACITY + 1)
+        self.assertEqual(index[0], "movie 0")
+        self.assertEqual(index[INITIAL_CAPACITY], "new movie")
+        index.close()
+
+    def test_duplicate_keys_keep_first_value(self):
+        index = HashIndex(self.path)
+        index.put_many([(1, "first"), (2, "other"), (1, "second")])
+        index.put_many([(1, "third")])
+        index[2] = "fourth"
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index[1], "first")
+        self.assertEqual(index[2], "other")
+        index.close()
+        self.assertEqual(os.path.getsize(f"{self.path}.dat"), len("first") + len("other"))
+
+    def test_out_of_range_keys(self):
+        index = HashIndex(self.path)
+        index[UINT64_MASK - 1] = "max"
+        for key in (-1, UINT64_MASK, 2**64, "1", 1.0, None):
+            with self.subTest(key=key):
+                with self.assertRaises(ValueError):
+                    index.put_many([(key, "value")])
+                self.assertNotIn(key, index)
+                self.assertIsNone(index.get(key))
+        self.assertEqual(index[UINT64_MASK - 1], "max")
+        # A batch with an invalid key is not stored at all
+        with self.assertRaises(ValueError):
+            index.put_many([(3, "valid"), (-1, "invalid")])
+        self.assertNotIn(3, index)
+        self.assertEqual(len(index), 1)
+        index.close()
+
+    def test_delete(self):
+        index = HashIndex(self.path)
+        index[1] = "movie"
+        index.delete()
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_storage_adapter_loads_existing_indexes(self):
+        storage_adapter = StorageAdapter(os.path.join(self.directory, "storage/"))
+        self.assertIsNone(storage_adapter.load_hash_indexes("movies"))
+        for client_id in ("client_1", "client_2"):
+            index = storage_adapter.open_hash_index("movies", secondary_file_key=client_id)
+            index[1] = client_id
+            index.close()
+        indexes = storage_adapter.load_hash_indexes("movies")
+        self.assertEqual(sorted(indexes), ["client_1", "client_2"])
+        for client_id, index in indexes.items():
+            self.assertEqual(index[1], client_id)
+            index.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from storage_adapter.storage_adapter import StorageAdapter, SNAPSHOT_FILE_KEY_PREFIX, WAL_FILE_KEY_PREFIX
+from storage_adapter.codecs import TEXT_CODEC
+
+FILE_KEY = "state"
+CLIENT_ID = "client"
+
+def apply_delta(data, delta):
+    data.append(delta)
+
+class TestWriteAheadLog(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.storage_path = os.path.join(self.directory, "storage/")
+        self.wal_path = os.path.join(self.storage_path, f"{WAL_FILE_KEY_PREFIX}{FILE_KEY}{CLIENT_ID}")
+        self.snapshot_path = os.path.join(self.storage_path, f"{SNAPSHOT_FILE_KEY_PREFIX}{FILE_KEY}{CLIENT_ID}")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def append_deltas(self, storage_adapter, deltas):
+        should_compact = False
+        for delta in deltas:
+            should_compact = storage_adapter.append_to_wal(FILE_KEY, delta, secondary_file_key=CLIENT_ID) or should_compact
+        return should_compact
+
+    def restart(self, storage_adapter, **kwargs):
+        storage_adapter.close()
+        return StorageAdapter(self.storage_path, **kwargs)
+
+    def load(self, storage_adapter):
+        return storage_adapter.load_wal(FILE_KEY, apply_delta, list)
+
+    def test_replays_log(self):
+        storage_adapter = StorageAdapter(self.storage_path)
+        self.append_deltas(storage_adapter, [1, 2, 3])
+        storage_adapter = self.restart(storage_adapter)
+        self.assertEqual(self.load(storage_adapter), {CLIENT_ID: [1, 2, 3]})
+
+    def test_replays_log_appended_after_snapshot(self):
+        storage_adapter = StorageAdapter(self.storage_path)
+        self.append_deltas(storage_adapter, [1, 2])
+        storage_adapter.compact_wal(FILE_KEY, [1, 2], secondary_file_key=CLIENT_ID)
+        self.assertEqual(os.path.getsize(self.wal_path), 0)
+        self.append_deltas(storage_adapter, [3])
+        storage_adapter = self.restart(storage_adapter)
+        self.assertEqual(self.load(storage_adapter), {CLIENT_ID: [1, 2, 3]})
+
+    def test_compaction_requested_on_max_records(self):
+        storage_adapter = StorageAdapter(self.storage_path, wal_max_records=3)
+        self.assertFalse(self.append_deltas(storage_adapter, [1, 2]))
+        self.assertTrue(self.append_deltas(storage_adapter, [3]))
+        storage_adapter.compact_wal(FILE_KEY, [1, 2, 3], secondary_file_key=CLIENT_ID)
+        self.assertFalse(self.append_deltas(storage_adapter, [4, 5]))
+        self.assertTrue(self.append_deltas(storage_adapter, [6]))
+        storage_adapter.close()
+
+    def test_compaction_requested_on_max_bytes(self):
+        storage_adapter = StorageAdapter(self.storage_path, wal_max_bytes=64)
+        self.assertFalse(self.append_deltas(storage_adapter, ["x"]))
+        self.assertTrue(self.append_deltas(storage_adapter, ["x" * 64]))
+        storage_adapter.close()
+
+    def test_restart_keeps_counting_records_to_compact(self):
+        storage_adapter = StorageAdapter(self.storage_path, wal_max_records=3)
+        self.append_deltas(storage_adapter, [1, 2])
+        storage_adapter = self.restart(storage_adapter, wal_max_records=3)
+        self.load(storage_adapter)
+        self.assertTrue(self.append_deltas(storage_adapter, [3]))
+        storage_adapter.close()
+
+    def test_skips_records_in_snapshot_when_crashed_before_truncating_log(self):
+        storage_adapter = StorageAdapter(self.storage_path)
+        self.append_deltas(storage_adapter, [1, 2])
+        storage_adapter.close()
+        with open(self.wal_path, 'rb') as f:
+            wal_data = f.read()
+        storage_adapter = StorageAdapter(self.storage_path)
+        self.load(storage_adapter)
+        storage_adapter.compact_wal(FILE_KEY, [1, 2], secondary_file_key=CLIENT_ID)
+        storage_adapter.close()
+        # The log is left as it was before the crash, after the snapshot was stored
+        with open(self.wal_path, 'wb') as f:
+            f.write(wal_data)
+        storage_adapter = StorageAdapter(self.storage_path)
+        self.assertEqual(self.load(storage_adapter), {CLIENT_ID: [1, 2]})
+        # The sequence numbers continue after the ones in the snapshot
+        self.append_deltas(storage_adapter, [3])
+        storage_adapter = self.restart(storage_adapter)
+        self.assertEqual(self.load(storage_adapter), {CLIENT_ID: [1, 2, 3]})
+
+    def test_ignores_torn_record(self):
+        for codec in (None, TEXT_CODEC):
+            kwargs = {"codec": codec} if codec else {}
+            with self.subTest(codec=codec):
+                storage_adapter = StorageAdapter(self.storage_path, **kwargs)
+                self.append_deltas(storage_adapter, [1, 2, "three"])
+                storage_adapter.close()
+                os.truncate(self.wal_path, os.path.getsize(self.wal_path) - 2)
+                storage_adapter = StorageAdapter(self.storage_path, **kwargs)
+                self.assertEqual(self.load(storage_adapter), {CLIENT_ID: [1, 2]})
+                storage_adapter.delete_wal(FILE_KEY, secondary_file_key=CLIENT_ID)
+                storage_adapter.close()
+
+    def test_ignores_torn_record_length(self):
+        storage_adapter = StorageAdapter(self.storage_path)
+        self.append_deltas(storage_adapter, [1])
+        storage_adapter.close()
+        with open(self.wal_path, 'ab') as f:
+            f.write(b'\x00\x00')
+        storage_adapter = StorageAdapter(self.storage_path)
+        self.assertEqual(self.load(storage_adapter), {CLIENT_ID: [1]})
+
+    def test_appends_after_torn_record_are_replayed(self):
+        storage_adapter = StorageAdapter(self.storage_path)
+        self.append_deltas(storage_adapter, [1, 2, 3])
+        storage_adapter.close()
+        os.truncate(self.wal_path, os.path.getsize(self.wal_path) - 3)
+        storage_adapter = StorageAdapter(self.storage_path)
+        self.assertEqual(self.load(storage_adapter), {CLIENT_ID: [1, 2]})
+        self.append_deltas(storage_adapter, [4])
+        storage_adapter = self.restart(storage_adapter)
+        self.assertEqual(self.load(storage_adapter), {CLIENT_ID: [1, 2, 4]})
+
+    def test_snapshot_without_log(self):
+        storage_adapter = StorageAdapter(self.storage_path)
+        self.append_deltas(storage_adapter, [1])
+        storage_adapter.compact_wal(FILE_KEY, [1], secondary_file_key=CLIENT_ID)
+        storage_adapter.close()
+        os.remove(self.wal_path)
+        storage_adapter = StorageAdapter(self.storage_path)
+        self.assertEqual(self.load(storage_adapter), {CLIENT_ID: [1]})
+
+    def test_delete_wal(self):
+        storage_adapter = StorageAdapter(self.storage_path)
+        self.append_deltas(storage_adapter, [1])
+        storage_adapter.compact_wal(FILE_KEY, [1], secondary_file_key=CLIENT_ID)
+        self.append_deltas(storage_adapter, [2])
+        storage_adapter.delete_wal(FILE_KEY, secondary_file_key=CLIENT_ID)
+        self.assertFalse(os.path.exists(self.wal_path))
+        self.assertFalse(os.path.exists(self.snapshot_path))
+        storage_adapter = self.restart(storage_adapter)
+        self.assertIsNone(self.load(storage_adapter))
+
+if __name__ == "__main__":
+    unittest.main()
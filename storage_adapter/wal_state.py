@@ -0,0 +1,84 @@
+MAX_PROCESSED_MESSAGE_IDS = 500
+
+def save_processed_message_id(processed_message_ids, message_id, processed_time):
+    """
+    Record a processed message id, keeping only the MAX_PROCESSED_MESSAGE_IDS most
+    recently processed ones
+    """
+    processed_message_ids[message_id] = processed_time
+    if len(processed_message_ids) > MAX_PROCESSED_MESSAGE_IDS:
+        oldest_message_id = min(processed_message_ids, key=processed_message_ids.get)
+        processed_message_ids.pop(oldest_message_id)
+
+class WalState:
+    """
+    State of every client persisted as a write-ahead log of deltas with snapshots. Every
+    change is a delta applied to the state in memory and kept until save appends it to
+    the log of its client, compacting the logs that grew too much into a snapshot. The
+    controllers pass save as the middleware's before-ack function, so the deltas of the
+    messages handled are persisted right before acking them. The same apply_delta
+    function rebuilds the state when the logs are replayed on restart
+    """
+    def __init__(self, storage_adapter, file_key, apply_delta_function, new_client_state_function, snapshot_function=None):
+        self._storage_adapter = storage_adapter
+        self._file_key = file_key
+        self._apply_delta_function = apply_delta_function
+        self._new_client_state_function = new_client_state_function
+        # Returns the part of the state of a client stored in its snapshots
+        self._snapshot_function = snapshot_function if snapshot_function is not None else lambda client_state: client_state
+        # client_id -> state of the client
+        self._states = {}
+        # client_id -> deltas applied since the last save
+        self._unsaved_deltas = {}
+
+    def __repr__(self):
+        return f"WalState(file_key={self._file_key}, clients={list(self._states.keys())})"
+
+    def __contains__(self, client_id):
+        return client_id in self._states
+
+    def __getitem__(self, client_id):
+        return self._states[client_id]
+
+    def __iter__(self):
+        return iter(list(self._states))
+
+    def load(self):
+        """
+        Rebuild the state of every client from its snapshot and log. Returns whether
+        there was any state stored
+        """
+        states = self._storage_adapter.load_wal(self._file_key, self._apply_delta_function, self._new_client_state_function)
+        if states:
+            self._states = states
+        return bool(states)
+
+    def client_state(self, client_id):
+        """
+        Return the state of a client, creating it if it does not exist
+        """
+        if client_id not in self._states:
+            self._states[client_id] = self._new_client_state_function()
+        return self._states[client_id]
+
+    def add_delta(self, client_id, delta):
+        self._apply_delta_function(self.client_state(client_id), delta)
+        self._unsaved_deltas.setdefault(client_id, []).append(delta)
+
+    def save(self):
+        for client_id, deltas in self._unsaved_deltas.items():
+            should_compact = False
+            for delta in deltas:
+                should_compact = self._storage_adapter.append_to_wal(self._file_key, delta, secondary_file_key=client_id) or should_compact
+            if should_compact:
+                self._storage_adapter.compact_wal(self._file_key, self._snapshot_function(self._states[client_id]), secondary_file_key=client_id)
+        self._unsaved_deltas.clear()
+
+    def delete(self, client_id):
+        """
+        Drop the state of a client and its unsaved deltas, and delete its log and snapshot
+        """
+        self._unsaved_deltas.pop(client_id, None)
+        if client_id in self._states:
+            self._states.pop(client_id)
+            self._storage_adapter.delete_wal(self._file_key, secondary_file_key=client_id)